@@ -1,33 +1,79 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 import models
+import schemas
+import crud
+import metrics
 import os
-from dotenv import load_dotenv
-from database import get_db
+from database import get_session, run_db, DbSession
+from hashing import HashingPool, default_workers
+from lazy import LazyModule
+from token_cache import TokenCache
+from revocation import revocation_list
 
-load_dotenv()
+# .env уже прочитан в database
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# AUTH_STATELESS=1: пользователь берется из claims токена (uid, sub) без SELECT по users,
+# отзыв проверяется по списку в памяти (revocation.py). Токены без uid по-прежнему проверяются по базе
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "0") == "1"
 
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY не нашелся")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Смена BCRYPT_ROUNDS не ломает старые хеши: deprecated="auto" помечает их устаревшими,
+# и при следующем входе пароль перехешируется с новой стоимостью
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# passlib и python-jose загружаются при первом входе или первом токене, а не при импорте (python -m serve - до fork)
+pwd_context = None
+jwt = LazyModule("jose.jwt")
+
+def password_context():
+    global pwd_context
+    if pwd_context is None:
+        from passlib.context import CryptContext
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return pwd_context
+
+def preload():
+    # Загрузить отложенные зависимости и бэкенд bcrypt заранее
+    password_context().handler("bcrypt").get_backend()
+    jwt.load()
+
+hashing_pool = HashingPool(
+    max_workers=int(os.getenv("HASH_WORKERS", default_workers())),
+    max_queue=int(os.getenv("HASH_QUEUE", "8")),
+    kind=os.getenv("HASH_EXECUTOR", "thread"),
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
+# Кэш проверенных токенов: повторный запрос с тем же токеном обходится без jwt.decode и SELECT по users.
+# AUTH_CACHE_SIZE=0 отключает кэш
+token_cache = TokenCache(maxsize=int(os.getenv("AUTH_CACHE_SIZE", "10000")), ttl=float(os.getenv("AUTH_CACHE_TTL", "300")))
+
+# При HASH_EXECUTOR=process bcrypt выполняется в дочерних процессах, и эти замеры в /metrics не попадают
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with metrics.timer(metrics.BCRYPT_SECONDS, ("hash",)):
+        return password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.timer(metrics.BCRYPT_SECONDS, ("verify",)):
+        return password_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    with metrics.timer(metrics.BCRYPT_SECONDS, ("verify",)):
+        return password_context().verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -36,29 +82,75 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user) -> dict:
+    # uid и ver нужны для проверки без базы, jti - для отзыва одного токена при выходе
+    return {"sub": user.username, "uid": user.id, "ver": user.token_version, "jti": uuid.uuid4().hex}
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: DbSession, username: str, password: str):
+    user = await run_db(db, get_user_by_username, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await hashing_pool.run(verify_and_update_password, password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash is not None:
+        await run_db(db, crud.update_password_hash, user.id, new_hash)
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def invalidate_user(username: str):
+    # Вызывать при удалении пользователя или смене пароля, чтобы его токены снова прошли полную проверку
+    token_cache.invalidate_user(username)
+
+async def revoke(db: DbSession, token: str, user: schemas.UserInfo, everywhere: bool = False):
+    # Токен уже проверен get_current_user, поэтому payload читается без повторной обработки ошибок
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    jti = payload.get("jti")
+    # У старых токенов нет jti: отозвать их можно только все сразу
+    if everywhere or jti is None:
+        version = await run_db(db, crud.bump_token_version, user.id)
+        revocation_list.revoke_user(user.id, version)
+        invalidate_user(user.username)
+    else:
+        await run_db(db, crud.revoke_token, jti, datetime.utcfromtimestamp(payload["exp"]))
+        revocation_list.revoke(jti, payload["exp"])
+        token_cache.discard(token)
+
+def token_subject(token: str) -> Optional[str]:
+    # sub проверенного токена без обращения к базе: из кэша токенов или после проверки подписи и срока
+    cached = token_cache.peek(token)
+    if cached is not None:
+        return cached.username
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.JWTError:
+        return None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DbSession = Depends(get_session)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
     if token is None:
         raise credentials_exception
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username=username)
-    if user is None:
+    if revocation_list.is_revoked(payload):
         raise credentials_exception
-    return user
\ No newline at end of file
+    if AUTH_STATELESS and payload.get("uid") is not None:
+        user_info = schemas.UserInfo(id=payload["uid"], username=username)
+    else:
+        user = await run_db(db, get_user_by_username, username)
+        if user is None or payload.get("ver", 0) < user.token_version:
+            raise credentials_exception
+        user_info = schemas.UserInfo.model_validate(user)
+    if payload.get("exp") is not None:
+        token_cache.put(token, user_info, payload["exp"])
+    return user_info
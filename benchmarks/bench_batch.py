@@ -0,0 +1,72 @@
+"""Строк в секунду: одиночные POST/PUT/DELETE /tasks против пакетных /tasks/batch.
+
+    python benchmarks/bench_batch.py --rows 2000 --batch-size 500
+    python benchmarks/bench_batch.py --url http://127.0.0.1:8001
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import auth_headers, in_process_transport
+
+
+def task(i: int) -> dict:
+    return {"title": f"Задача {i}", "description": "Импорт", "status": "в ожидании", "priority": i % 5 + 1}
+
+
+async def single(client, headers, rows: int):
+    timings = {}
+    started = time.perf_counter()
+    ids = [(await client.post("/tasks", json=task(i), headers=headers)).json()["id"] for i in range(rows)]
+    timings["create"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for task_id in ids:
+        await client.put(f"/tasks/{task_id}", json={**task(task_id), "status": "в работе"}, headers=headers)
+    timings["update"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for task_id in ids:
+        await client.delete(f"/tasks/{task_id}", headers=headers)
+    timings["delete"] = time.perf_counter() - started
+    return timings
+
+
+async def batched(client, headers, rows: int, batch_size: int):
+    timings = {"create": 0.0, "update": 0.0, "delete": 0.0}
+    for start in range(0, rows, batch_size):
+        items = [task(i) for i in range(start, min(rows, start + batch_size))]
+        started = time.perf_counter()
+        response = await client.post("/tasks/batch", json={"items": items}, headers=headers)
+        timings["create"] += time.perf_counter() - started
+        ids = [item["id"] for item in response.json()["items"]]
+        started = time.perf_counter()
+        await client.patch("/tasks/batch", json={"items": [{**task(task_id), "id": task_id, "status": "в работе"} for task_id in ids]}, headers=headers)
+        timings["update"] += time.perf_counter() - started
+        started = time.perf_counter()
+        await client.request("DELETE", "/tasks/batch", json={"ids": ids}, headers=headers)
+        timings["delete"] += time.perf_counter() - started
+    return timings
+
+
+async def main(args):
+    transport = None if args.url else in_process_transport()
+    async with httpx.AsyncClient(base_url=args.url or "http://bench", transport=transport, timeout=120) as client:
+        headers = await auth_headers(client)
+        one = await single(client, headers, args.rows)
+        many = await batched(client, headers, args.rows, args.batch_size)
+
+    print(f"{args.rows} строк, пакет по {args.batch_size}")
+    print(f"{'операция':<10}{'по одной, строк/с':>20}{'пакетом, строк/с':>20}{'ускорение':>12}")
+    for operation in ("create", "update", "delete"):
+        single_rate = args.rows / one[operation]
+        batch_rate = args.rows / many[operation]
+        print(f"{operation:<10}{single_rate:>20.0f}{batch_rate:>20.0f}{batch_rate / single_rate:>11.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервера; без него приложение поднимается в процессе")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
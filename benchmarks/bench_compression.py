@@ -0,0 +1,61 @@
+"""Сжатие ответа GET /tasks: время CPU на сжатие против сэкономленных байт для типичных размеров списка, JSON и MessagePack.
+
+    python benchmarks/bench_compression.py --rows 100 1000 10000 --repeat 5
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401 - путь к модулям приложения
+
+
+def task_rows(count: int):
+    # Как в базе: короткие заголовки, описания разной длины, у части задач описания нет
+    started = datetime(2024, 1, 1)
+    statuses = ("в ожидании", "в работе", "выполнено")
+    return [
+        (i, f"Задача {i}: подготовить отчет", ("Описание задачи с деталями и ссылками. " * (i % 4)) or None,
+         statuses[i % 3], i % 5 + 1, started + timedelta(seconds=i * 37))
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(encoder_class, level: int, body: bytes, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compressed = encoder_class(level).compress(body, True)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(compressed)
+
+
+def main(args):
+    import serialization
+    from compression import ENCODERS
+
+    codecs = [("gzip", level) for level in args.gzip_levels]
+    codecs += [("br", level) for level in args.brotli_levels if "br" in ENCODERS]
+    codecs += [("zstd", level) for level in args.zstd_levels if "zstd" in ENCODERS]
+
+    print(f"{'строк':>7} {'формат':<8} {'сжатие':<8} {'мс':>8} {'КБ':>9} {'доля':>6} {'МБ/с':>7}")
+    for count in args.rows:
+        rows = task_rows(count)
+        bodies = [("json", serialization.dump_task_rows(rows))]
+        if serialization.msgpack is not None:
+            bodies.append(("msgpack", serialization.dump_msgpack(rows)))
+        for name, body in bodies:
+            print(f"{count:>7} {name:<8} {'-':<8} {0:>8.2f} {len(body) / 1024:>9.1f} {1:>6.2f} {'':>7}")
+            for encoding, level in codecs:
+                seconds, size = measure(ENCODERS[encoding], level, body, args.repeat)
+                print(f"{count:>7} {name:<8} {f'{encoding}-{level}':<8} {seconds * 1000:>8.2f} {size / 1024:>9.1f} "
+                      f"{size / len(body):>6.2f} {len(body) / seconds / 2**20:>7.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--brotli-levels", type=int, nargs="+", default=[1, 4, 6])
+    parser.add_argument("--zstd-levels", type=int, nargs="+", default=[1, 3, 10])
+    main(parser.parse_args())
@@ -0,0 +1,52 @@
+"""GET /tasks с fields=id,title,status против полного ответа на задачах с длинными описаниями.
+
+    python benchmarks/bench_fields.py --rows 5000 --description 2000 --repeat 10
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import auth_headers, in_process_transport
+
+
+async def measure(client, params: dict, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/tasks", params=params)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(response.content)
+
+
+async def main(args):
+    import serialization
+    from response_cache import response_cache
+
+    response_cache.enabled = False
+    serialization.FAST_JSON = args.fast
+    description = ("Подробное описание задачи с контекстом и ссылками. " * (args.description // 50 + 1))[:args.description]
+
+    async with httpx.AsyncClient(base_url="http://bench", transport=in_process_transport(), timeout=120) as client:
+        headers = await auth_headers(client)
+        for start in range(0, args.rows, 1000):
+            items = [{"title": f"Задача {i}", "description": description, "priority": i % 5 + 1} for i in range(start, min(args.rows, start + 1000))]
+            await client.post("/tasks/batch", json={"items": items}, headers=headers)
+
+        results = [(name, *await measure(client, params, args.repeat)) for name, params in (("все поля", {}), ("id,title,status", {"fields": "id,title,status"}))]
+
+    print(f"{'':<18}{'мс на запрос':>14}{'КБ ответа':>12}")
+    for name, seconds, size in results:
+        print(f"{name:<18}{seconds * 1000:>14.1f}{size / 1024:>12.0f}")
+    (_, full_seconds, full_size), (_, seconds, size) = results
+    print(f"ответ меньше в {full_size / size:.1f} раз, быстрее в {full_seconds / seconds:.1f} раз")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--description", type=int, default=2000, help="длина описания задачи в символах")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--fast", action="store_true", help="с FAST_JSON=1")
+    asyncio.run(main(parser.parse_args()))
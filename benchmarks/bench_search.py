@@ -0,0 +1,74 @@
+"""Полнотекстовый поиск (FTS5) против ILIKE '%...%' на 10k / 100k / 1M задач.
+
+Запуск из корня проекта:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --sizes 10000 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from models import Base, Task
+import search
+
+SYLLABLES = ["ка", "ро", "ми", "те", "ну", "ла", "зо", "пе", "ди", "ва", "се", "бо", "ри", "жу", "но", "ты"]
+VOCABULARY = sorted({"".join(random.Random(i).choices(SYLLABLES, k=4)) for i in range(20000)})
+QUERIES = [VOCABULARY[10], VOCABULARY[20] + " " + VOCABULARY[30], VOCABULARY[40][:5], "несуществующий"]
+
+
+def seed(engine, size: int, batch: int = 10000):
+    rng = random.Random(size)
+    with engine.begin() as connection:
+        for start in range(0, size, batch):
+            rows = [{
+                "title": " ".join(rng.choices(VOCABULARY, k=3)) + f" {start + i}",
+                "description": " ".join(rng.choices(VOCABULARY, k=12)),
+                "status": "в ожидании",
+                "priority": rng.randint(1, 5),
+            } for i in range(min(batch, size - start))]
+            connection.execute(insert(Task), rows)
+
+
+def measure(session: Session, build, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        session.scalars(build()).all()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def run(size: int, repeat: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    seed(engine, size)
+    print(f"\n{size} задач, заполнение {time.perf_counter() - started:.1f} с")
+    print(f"{'запрос':<24}{'ILIKE, мс':>12}{'FTS5, мс':>12}{'FTS5 ранж., мс':>16}")
+    with Session(engine) as session:
+        for text in QUERIES:
+            ilike = measure(session, lambda: search.apply_ilike(select(Task), text), repeat)
+            fts = measure(session, lambda: search.apply_search(select(Task), "sqlite", text), repeat)
+            ranked = measure(session, lambda: search.apply_search(select(Task), "sqlite", text, ranked=True), repeat)
+            print(f"{text:<24}{ilike:>12.2f}{fts:>12.2f}{ranked:>16.2f}")
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
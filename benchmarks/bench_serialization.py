@@ -0,0 +1,52 @@
+"""GET /tasks на 10k строк: ORM + response_model против FAST_JSON (кортежи колонок + orjson).
+
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 10
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import auth_headers, in_process_transport
+
+
+async def measure(client, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/tasks")
+        timings.append(time.perf_counter() - started)
+    return min(timings), response.content
+
+
+async def main(args):
+    import serialization
+    from response_cache import response_cache
+
+    # Иначе повторные запросы отдаст кэш ответов и сериализация не будет видна
+    response_cache.enabled = False
+
+    async with httpx.AsyncClient(base_url="http://bench", transport=in_process_transport(), timeout=120) as client:
+        headers = await auth_headers(client)
+        for start in range(0, args.rows, 1000):
+            items = [{"title": f"Задача {i}", "description": "Описание задачи", "priority": i % 5 + 1} for i in range(start, min(args.rows, start + 1000))]
+            await client.post("/tasks/batch", json={"items": items}, headers=headers)
+
+        serialization.FAST_JSON = False
+        slow, slow_body = await measure(client, args.repeat)
+        serialization.FAST_JSON = True
+        fast, fast_body = await measure(client, args.repeat)
+
+    assert fast_body == slow_body, "ответы различаются"
+    print(f"{'':<16}{'мс на запрос':>14}{'мс на 10k строк':>18}")
+    for name, value in (("response_model", slow), ("FAST_JSON", fast)):
+        print(f"{name:<16}{value * 1000:>14.1f}{value * 1000 * 10000 / args.rows:>18.1f}")
+    print(f"ускорение: {slow / fast:.1f}x, тела совпадают байт в байт")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
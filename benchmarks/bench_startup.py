@@ -0,0 +1,78 @@
+"""Время старта: импорт main в чистом интерпретаторе и python -m serve с импортом до fork и без него.
+
+    python benchmarks/bench_startup.py --workers 4 --repeat 3
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(env: dict) -> float:
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    return float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def serve_time(env: dict, workers: int, preload: bool):
+    # До момента, когда ответили все воркеры (разные pid в /health/ready), и время мягкой остановки по SIGTERM
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "serve", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+         "--preload" if preload else "--no-preload"],
+        cwd=ROOT, env=env,
+    )
+    pids = set()
+    first = None
+    try:
+        while len(pids) < workers:
+            if time.perf_counter() - started > 60:
+                raise SystemExit(f"Ответили только {len(pids)} воркеров из {workers}")
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/health/ready", headers={"Connection": "close"}, timeout=1)
+            except httpx.TransportError:
+                time.sleep(0.01)
+                continue
+            pids.add(response.json()["pid"])
+            first = first or time.perf_counter() - started
+        ready = time.perf_counter() - started
+    finally:
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return first, ready, time.perf_counter() - stopping
+
+
+def main(args):
+    directory = tempfile.mkdtemp()
+    env = {**os.environ, "DATABASE_URL": "sqlite:///" + os.path.join(directory, "startup.db"), "AUTO_MIGRATE": "1"}
+    # Схема создается один раз, дальше при старте она только сверяется
+    subprocess.run([sys.executable, "-m", "migrations", "upgrade", "head"], cwd=ROOT, env=env, check=True, capture_output=True)
+    env["AUTO_MIGRATE"] = "0"
+
+    print(f"import main: {min(import_time(env) for _ in range(args.repeat)) * 1000:.0f} мс")
+    print(f"{'':<14}{'первый, мс':>12}{'все, мс':>10}{'остановка, мс':>15}")
+    for preload in (True, False):
+        first, ready, stop = min(serve_time(env, args.workers, preload) for _ in range(args.repeat))
+        print(f"{'preload' if preload else 'no-preload':<14}{first * 1000:>12.0f}{ready * 1000:>10.0f}{stop * 1000:>15.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,49 @@
+"""Общие помощники для скриптов из benchmarks/."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def in_process_transport():
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, get_db, create_db_engine, DB_ASYNC
+    from main import app
+    from rate_limit import rate_limiter
+
+    if DB_ASYNC:
+        raise SystemExit("Встроенный режим работает только с синхронной сессией, для DB_ASYNC=1 используйте --url")
+    # BENCH_DATABASE_URL - пустая база другого бэкенда (например, MySQL) для сравнения пропускной способности
+    url = os.getenv("BENCH_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "load.db")
+    engine = create_db_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Как в tests/conftest.py: скрипты шлют сотни запросов от одного клиента и мерят приложение, а не лимиты RATE_LIMIT
+    rate_limiter.enabled = False
+    return httpx.ASGITransport(app=app)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def auth_headers(client, username: str = "bench_user", password: str = "bench_password") -> dict:
+    await client.post("/register", json={"username": username, "password": password})
+    token = (await client.post("/login", data={"username": username, "password": password})).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
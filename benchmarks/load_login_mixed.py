@@ -0,0 +1,66 @@
+"""Смешанная нагрузка: поток /login (bcrypt) параллельно с GET /tasks.
+
+Показывает p50/p99 для входа и для чтения задач, а также число отказов 429,
+чтобы было видно, что вход не выедает пул и не замедляет дешевые чтения.
+
+По умолчанию приложение поднимается в этом же процессе на временной SQLite базе:
+    python benchmarks/load_login_mixed.py --duration 10 --logins 32 --readers 16
+Против запущенного сервера:
+    python benchmarks/load_login_mixed.py --url http://127.0.0.1:8001
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import in_process_transport, percentile
+
+USERNAME = "load_user"
+PASSWORD = "load_password"
+
+
+async def worker(client, deadline, request, latencies, statuses):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await request(client)
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def main(args):
+    transport = None if args.url else in_process_transport()
+    async with httpx.AsyncClient(base_url=args.url or "http://bench", transport=transport, timeout=60) as client:
+        await client.post("/register", json={"username": USERNAME, "password": PASSWORD})
+        token = (await client.post("/login", data={"username": USERNAME, "password": PASSWORD})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for i in range(args.tasks):
+            await client.post("/tasks", json={"title": f"Задача {i}", "priority": i % 5 + 1}, headers=headers)
+
+        async def login(c):
+            return await c.post("/login", data={"username": USERNAME, "password": PASSWORD})
+
+        async def read(c):
+            return await c.get("/tasks", params={"top_n": 20})
+
+        login_latencies, read_latencies = [], []
+        login_statuses, read_statuses = {}, {}
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *[worker(client, deadline, login, login_latencies, login_statuses) for _ in range(args.logins)],
+            *[worker(client, deadline, read, read_latencies, read_statuses) for _ in range(args.readers)],
+        )
+
+    print(f"{'':<12}{'запросов':>10}{'p50, мс':>10}{'p99, мс':>10}  статусы")
+    print(f"{'/login':<12}{len(login_latencies):>10}{percentile(login_latencies, 0.5):>10.1f}{percentile(login_latencies, 0.99):>10.1f}  {login_statuses}")
+    print(f"{'GET /tasks':<12}{len(read_latencies):>10}{percentile(read_latencies, 0.5):>10.1f}{percentile(read_latencies, 0.99):>10.1f}  {read_statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервера; без него приложение поднимается в процессе")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--logins", type=int, default=32, help="параллельных клиентов, выполняющих вход")
+    parser.add_argument("--readers", type=int, default=16, help="параллельных клиентов, читающих задачи")
+    parser.add_argument("--tasks", type=int, default=200, help="сколько задач создать перед замером")
+    asyncio.run(main(parser.parse_args()))
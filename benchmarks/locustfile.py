@@ -0,0 +1,108 @@
+"""Нагрузочный тест всего API на locust.
+
+Смесь пользователей повторяет реальный трафик: большинство читает списки (каждая сортировка, top_n,
+поиск, страницы по курсору), часть правит задачи, немногие регистрируются и входят.
+Перед запуском заполните базу: python benchmarks/seed.py --count 100000
+Сервер запускайте с RATE_LIMIT=0: все пользователи locust входят под одним USERNAME с одного адреса и делят одно
+ведро ограничения частоты, так что иначе измеряются ответы 429, а не приложение.
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 --headless -u 200 -r 20 -t 2m --csv results/run
+"""
+import random
+import time
+import uuid
+
+from locust import HttpUser, between, task
+from locust.exception import StopUser
+
+from seed import PASSWORD, STATUSES, USERNAME, WORDS
+
+
+class ApiUser(HttpUser):
+    abstract = True
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        # При старте все пользователи входят одновременно, и пул bcrypt отвечает 429 - повторяем после паузы
+        while True:
+            response = self.client.post("/login", data={"username": USERNAME, "password": PASSWORD}, name="/login")
+            if response.status_code != 429:
+                break
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+        if not response.ok:
+            raise StopUser()
+        self.client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+class Reader(ApiUser):
+    weight = 8
+
+    @task(4)
+    def list_sorted(self):
+        sort_by = random.choice(["title", "status", "creation_time"])
+        order = random.choice(["asc", "desc"])
+        self.client.get("/tasks", params={"sort_by": sort_by, "order": order, "limit": 100}, name=f"/tasks?sort_by={sort_by}")
+
+    @task(3)
+    def top_n(self):
+        self.client.get("/tasks", params={"top_n": random.choice([10, 20, 50])}, name="/tasks?top_n")
+
+    @task(3)
+    def search(self):
+        self.client.get("/tasks", params={"search": random.choice(WORDS)}, name="/tasks?search")
+
+    @task(2)
+    def walk_pages(self):
+        params = {"sort_by": "creation_time", "order": "desc", "limit": 50}
+        for _ in range(3):
+            response = self.client.get("/tasks", params=params, name="/tasks?cursor")
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params["cursor"] = cursor
+
+    @task(1)
+    def read_one(self):
+        # id берутся наугад из диапазона сидера, часть задач уже удалена редакторами - 404 тут не ошибка
+        with self.client.get(f"/tasks/{random.randint(1, 10000)}", name="/tasks/{id}", catch_response=True) as response:
+            if response.status_code == 404:
+                response.success()
+
+
+class Editor(ApiUser):
+    weight = 2
+
+    def on_start(self):
+        super().on_start()
+        self.task_ids = []
+
+    @task(3)
+    def create(self):
+        response = self.client.post("/tasks", json={"title": " ".join(random.sample(WORDS, 3)), "description": " ".join(random.choices(WORDS, k=6)), "priority": random.randint(1, 5)}, name="/tasks [create]")
+        if response.ok:
+            self.task_ids.append(response.json()["id"])
+
+    @task(2)
+    def update(self):
+        if self.task_ids:
+            task_id = random.choice(self.task_ids)
+            self.client.put(f"/tasks/{task_id}", json={"title": " ".join(random.sample(WORDS, 3)), "status": random.choice(STATUSES)}, name="/tasks/{id} [update]")
+
+    @task(1)
+    def delete(self):
+        if self.task_ids:
+            task_id = self.task_ids.pop(random.randrange(len(self.task_ids)))
+            self.client.delete(f"/tasks/{task_id}", name="/tasks/{id} [delete]")
+
+
+class Newcomer(HttpUser):
+    # Регистрация и вход: каждый запрос - bcrypt, поэтому таких пользователей мало
+    weight = 1
+    wait_time = between(2, 5)
+
+    @task
+    def register_and_login(self):
+        username = f"user_{uuid.uuid4().hex[:12]}"
+        password = uuid.uuid4().hex
+        self.client.post("/register", json={"username": username, "password": password}, name="/register")
+        self.client.post("/login", data={"username": username, "password": password}, name="/login")
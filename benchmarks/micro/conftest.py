@@ -0,0 +1,27 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from models import Task
+from serialization import TASK_FIELDS
+
+
+@pytest.fixture(scope="session")
+def orm_tasks():
+    # Непривязанные к сессии объекты Task: сериализация меряется без обращений к базе
+    start = datetime(2024, 1, 1, 9, 30)
+    return [
+        Task(id=i, title=f"Задача {i}", description="Подготовить отчет по проекту" if i % 2 else None, status=["в ожидании", "в работе"][i % 2],
+             priority=i % 5 + 1, creation_time=start + timedelta(minutes=i, microseconds=i))
+        for i in range(1, 10001)
+    ]
+
+
+@pytest.fixture(scope="session")
+def task_rows(orm_tasks):
+    # Те же задачи в виде кортежей колонок, как их возвращает выборка при FAST_JSON=1
+    return [tuple(getattr(task, field) for field in TASK_FIELDS) for task in orm_tasks]
@@ -0,0 +1,38 @@
+import pytest
+
+import metrics
+
+SCOPE = {"type": "http", "method": "GET", "path": "/tasks"}
+
+
+class Route:
+    path = "/tasks"
+
+
+async def app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def send(message):
+    pass
+
+
+def call(asgi):
+    # Ни одно await здесь не уходит в цикл событий, поэтому корутина завершается за один send(None)
+    coroutine = asgi(dict(SCOPE), receive, send)
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        pass
+
+
+@pytest.mark.parametrize("mode", ["bare", "off", "basic", "full"])
+def test_middleware_overhead(benchmark, mode):
+    asgi = app if mode == "bare" else metrics.MetricsMiddleware(app, mode)
+    benchmark(call, asgi)
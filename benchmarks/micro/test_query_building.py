@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy.dialects import sqlite
+
+import pagination
+from main import build_tasks_query
+
+SORTS = [(None, "asc"), ("title", "asc"), ("status", "desc"), ("creation_time", "desc"), (pagination.TOP_N_KEY, "asc")]
+
+
+def build_and_compile(sort_key, order, search=None, after=None):
+    columns = pagination.ordering(sort_key, order)
+    query = build_tasks_query("sqlite", columns, search, after=after)
+    return str(query.compile(dialect=sqlite.dialect()))
+
+
+@pytest.mark.parametrize("sort_key,order", SORTS)
+def test_build_query(benchmark, sort_key, order):
+    benchmark(build_and_compile, sort_key, order)
+
+
+@pytest.mark.parametrize("sort_key,order", SORTS)
+def test_build_keyset_query(benchmark, orm_tasks, sort_key, order):
+    columns = pagination.ordering(sort_key, order)
+    token = pagination.encode_cursor(sort_key, order, columns, pagination.cursor_values(columns, orm_tasks[500]), 100)
+
+    def run():
+        values, _ = pagination.decode_cursor(token, sort_key, order, columns)
+        return build_and_compile(sort_key, order, after=values)
+
+    benchmark(run)
+
+
+def test_build_search_query(benchmark):
+    benchmark(build_and_compile, None, "asc", "отчет проект")
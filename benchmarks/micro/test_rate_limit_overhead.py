@@ -0,0 +1,36 @@
+import pytest
+
+from rate_limit import MemoryBackend, Policy, RateLimiter, RateLimitMiddleware
+
+SCOPE = {"type": "http", "method": "GET", "path": "/tasks", "query_string": b"", "client": ("10.0.0.1", 5000)}
+TOKEN_HEADERS = [(b"authorization", b"Bearer cached-token")]
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def send(message):
+    pass
+
+
+def call(asgi, headers):
+    # Корутина не уходит в цикл событий и завершается за один send(None)
+    coroutine = asgi({**SCOPE, "headers": headers}, receive, send)
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        pass
+
+
+@pytest.mark.parametrize("mode", ["bare", "disabled", "anonymous", "token"])
+def test_rate_limit_overhead(benchmark, mode):
+    # Бюджет огромный, чтобы замер шел по пути "разрешено"; sub токена отдается сразу, как из кэша токенов
+    limiter = RateLimiter(MemoryBackend(), {name: Policy(10**9, 1) for name in ("auth", "search", "write", "read")}, enabled=mode != "disabled", concurrency=16)
+    asgi = app if mode == "bare" else RateLimitMiddleware(app, limiter, identify=lambda token: "user")
+    benchmark(call, asgi, TOKEN_HEADERS if mode == "token" else [])
@@ -0,0 +1,27 @@
+import json
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import schemas
+from serialization import dump_task_list, dump_task_rows
+
+
+def via_models(tasks):
+    # Путь FastAPI по умолчанию: модель на каждую строку, jsonable_encoder, json.dumps
+    return json.dumps(jsonable_encoder([schemas.TaskInfo.model_validate(task) for task in tasks]), ensure_ascii=False).encode()
+
+
+@pytest.mark.parametrize("size", [100, 1000, 10000])
+def test_taskinfo_models(benchmark, orm_tasks, size):
+    benchmark(via_models, orm_tasks[:size])
+
+
+@pytest.mark.parametrize("size", [100, 1000, 10000])
+def test_taskinfo_type_adapter(benchmark, orm_tasks, size):
+    benchmark(dump_task_list, orm_tasks[:size])
+
+
+@pytest.mark.parametrize("size", [100, 1000, 10000])
+def test_task_rows_fast_json(benchmark, task_rows, size):
+    benchmark(dump_task_rows, task_rows[:size])
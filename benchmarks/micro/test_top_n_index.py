@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+import pagination
+import top_n
+from database import Base
+from events import TaskChange
+from models import Task
+from serialization import TASK_COLUMNS, TASK_FIELDS
+
+
+@pytest.fixture(scope="module")
+def db(task_rows):
+    # 10 тысяч задач в SQLite в памяти с индексом ix_tasks_top_n, как после миграций
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Task), [dict(zip(TASK_FIELDS, row)) for row in task_rows])
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(scope="module")
+def index(db):
+    index = top_n.TopIndex(capacity=1000, mode=top_n.LOCAL)
+    index.rebuild(db)
+    return index
+
+
+@pytest.mark.parametrize("k", [10, 100])
+def test_top_n_sql(benchmark, db, k):
+    query = select(*TASK_COLUMNS).order_by(*pagination.order_by(top_n.COLUMNS)).limit(k)
+    benchmark(lambda: db.execute(query).all())
+
+
+@pytest.mark.parametrize("k", [10, 100])
+def test_top_n_index(benchmark, index, k):
+    benchmark(index.top, k)
+
+
+def test_top_n_index_update(benchmark, index, task_rows):
+    # Обновление задачи из середины индекса: удаление и вставка по bisect
+    row = dict(zip(TASK_FIELDS, task_rows[2500]))
+    changes = [[TaskChange("updated", row["id"], before=row, after={**row, "priority": 1})], [TaskChange("updated", row["id"], before={**row, "priority": 1}, after=row)]]
+    state = [0]
+
+    def update():
+        index.apply(changes[state[0] % 2])
+        state[0] += 1
+
+    benchmark(update)
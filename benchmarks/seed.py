@@ -0,0 +1,78 @@
+"""Наполнение базы задачами для нагрузочных тестов (от 10k до 1M строк).
+
+Пишет прямо в базу из .env (или в --url) пачками по --chunk строк, схему создает миграциями.
+Заголовки и описания собираются из словаря WORDS, поэтому поисковые запросы locust всегда что-то находят.
+    python benchmarks/seed.py --count 100000
+    python benchmarks/seed.py --count 1000000 --url sqlite:///./load.db --truncate
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+import common  # noqa: F401  (добавляет корень репозитория в sys.path)
+
+from sqlalchemy import create_engine, delete, insert
+
+WORDS = [
+    "отчет", "проект", "клиент", "встреча", "договор", "релиз", "ошибка", "счет", "план", "бюджет",
+    "звонок", "письмо", "макет", "тест", "сервер", "база", "документ", "презентация", "задача", "ревью",
+]
+STATUSES = ["в ожидании", "в работе", "завершено"]
+USERNAME = "locust_user"
+PASSWORD = "locust_password"
+
+
+def rows(start: int, count: int, rng: random.Random, now):
+    for i in range(start, start + count):
+        yield {
+            "title": " ".join(rng.sample(WORDS, 3)).capitalize() + f" {i}",
+            "description": " ".join(rng.choices(WORDS, k=8)),
+            "status": rng.choice(STATUSES),
+            "priority": rng.randint(1, 5),
+            "creation_time": now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600), microseconds=rng.randint(0, 999999)),
+        }
+
+
+def seed(engine, count: int, chunk: int = 10000, truncate: bool = False, seed_value: int = 0, log=print):
+    import crud
+    import migrations
+    import stats
+    from auth import hash_password, get_user_by_username
+    from database import SessionLocal
+    from models import Task, utcnow
+
+    migrations.upgrade(engine, log=lambda message: None)
+    if truncate:
+        with engine.begin() as connection:
+            connection.execute(delete(Task))
+    rng = random.Random(seed_value)
+    now = utcnow()
+    started = time.perf_counter()
+    for offset in range(0, count, chunk):
+        with engine.begin() as connection:
+            connection.execute(insert(Task), list(rows(offset, min(chunk, count - offset), rng, now)))
+        log(f"{offset + min(chunk, count - offset)}/{count} задач, {time.perf_counter() - started:.1f} с")
+    with SessionLocal(bind=engine) as db:
+        # Данные записаны в обход crud, поэтому версию коллекции (ETag списка) поднимаем, а счетчики task_stats пересчитываем вручную
+        crud.bump_collection_version(db)
+        db.commit()
+        stats.reconcile(db)
+        if get_user_by_username(db, USERNAME) is None:
+            crud.create_user(db, USERNAME, hash_password(PASSWORD))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="сколько задач добавить")
+    parser.add_argument("--chunk", type=int, default=10000, help="строк в одной транзакции")
+    parser.add_argument("--url", help="URL базы; по умолчанию DATABASE_URL из database.py")
+    parser.add_argument("--truncate", action="store_true", help="удалить существующие задачи перед заполнением")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора, чтобы данные были воспроизводимы")
+    args = parser.parse_args()
+
+    if args.url:
+        target = create_engine(args.url)
+    else:
+        from database import engine as target
+    seed(target, args.count, args.chunk, args.truncate, args.seed)
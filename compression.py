@@ -0,0 +1,177 @@
+import os
+import zlib
+from collections import Counter
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+import http_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Сжатие ответов по Accept-Encoding: gzip всегда, br и zstd - если установлены brotli и zstandard.
+# Из принимаемых клиентом кодировок с наибольшим q выбирается первая в порядке zstd, br, gzip.
+# COMPRESSION=0 отключает сжатие, COMPRESSION_MIN_SIZE - ответы меньше стольких байт отдаются как есть
+# (потоковые ответы, размер которых заранее неизвестен, сжимаются всегда). Уровни: COMPRESSION_LEVEL для gzip (1-9),
+# COMPRESSION_BROTLI_LEVEL (0-11), COMPRESSION_ZSTD_LEVEL (1-22)
+COMPRESSION = os.getenv("COMPRESSION", "1") != "0"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# text/event-stream не сжимается: прокси и браузеры буферизуют сжатую ленту и задерживают события
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "application/msgpack", "text/plain", "text/html")
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31 - формат gzip (заголовок и CRC), а не голый zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Z_SYNC_FLUSH после каждого куска: клиент потокового ответа может разжать все полученное, не дожидаясь конца
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+PREFERENCE = tuple(name for name in ("zstd", "br", "gzip") if name in ENCODERS)
+DEFAULT_LEVELS = {"gzip": COMPRESSION_LEVEL, "br": COMPRESSION_BROTLI_LEVEL, "zstd": COMPRESSION_ZSTD_LEVEL}
+
+
+def negotiate(accept_encoding: Optional[str], available: tuple = PREFERENCE) -> Optional[str]:
+    # None - клиент не принимает ни одну из доступных кодировок
+    accepted = http_cache.preferences(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in available:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class Totals:
+    # Счетчики для метрик: сжатые ответы и байты до и после сжатия по кодировкам
+    def __init__(self):
+        self.responses = Counter()
+        self.bytes_in = Counter()
+        self.bytes_out = Counter()
+
+    def add(self, encoding: str, size_in: int, size_out: int):
+        self.bytes_in[encoding] += size_in
+        self.bytes_out[encoding] += size_out
+
+    def bytes(self) -> dict:
+        return {**{(encoding, "in"): size for encoding, size in self.bytes_in.items()},
+                **{(encoding, "out"): size for encoding, size in self.bytes_out.items()}}
+
+    def clear(self):
+        self.responses.clear()
+        self.bytes_in.clear()
+        self.bytes_out.clear()
+
+
+totals = Totals()
+
+
+class CompressionMiddleware:
+    # Чистый ASGI: заголовки ответа придерживаются до первого куска тела. Тело целиком меньше порога уходит как есть,
+    # иначе каждый кусок сжимается по мере прихода - StreamingResponse (NDJSON) остается потоковым
+    def __init__(self, app, minimum_size: int = None, levels: dict = None, enabled: bool = None, available: tuple = PREFERENCE):
+        self.app = app
+        self.minimum_size = COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.enabled = COMPRESSION if enabled is None else enabled
+        self.available = available
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if _compressible(message):
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding](self.levels[encoding])
+                totals.responses[encoding] += 1
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag is not None and not etag.startswith("W/"):
+                    # Сжатое представление побайтно другое, поэтому тег становится слабым (If-None-Match сравнивает слабо)
+                    headers["ETag"] = "W/" + etag
+                compressed = encoder.compress(body, not more)
+                if more:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start)
+            else:
+                compressed = encoder.compress(body, not more)
+            totals.add(encoding, len(body), len(compressed))
+            if compressed or not more:
+                await send({"type": "http.response.body", "body": compressed, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _compressible(start) -> bool:
+    if start["status"] < 200 or start["status"] in (204, 304):
+        return False
+    headers = MutableHeaders(scope=start)
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE
@@ -0,0 +1,172 @@
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlalchemy.orm import Session
+from models import User, Task, CollectionVersion, RevokedToken, IdBlock, utcnow
+from events import TaskChange, publish, snapshot
+import stats
+
+
+def create_user(db: Session, username: str, hashed_password: str):
+    db_user = User(username=username, hashed_password=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db_user = db.get(User, user_id)
+    db_user.hashed_password = hashed_password
+    db.commit()
+
+
+def revoke_token(db: Session, jti: str, expires_at):
+    # Заодно чистятся записи об уже истекших токенах: таблица остается размером с число действующих отзывов
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= utcnow()))
+    db.merge(RevokedToken(jti=jti, expires_at=expires_at))
+    db.commit()
+
+
+def bump_token_version(db: Session, user_id: int) -> int:
+    db_user = db.get(User, user_id)
+    db_user.token_version += 1
+    db.commit()
+    return db_user.token_version
+
+
+def ping(db: Session):
+    db.execute(text("SELECT 1"))
+
+
+def fetch_all(db: Session, statement):
+    return db.scalars(statement).all()
+
+
+def fetch_rows(db: Session, statement):
+    return db.execute(statement).all()
+
+
+def get_task(db: Session, task_id: int):
+    return db.get(Task, task_id)
+
+
+def get_collection_version(db: Session, name: str = "tasks"):
+    row = db.get(CollectionVersion, name)
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def bump_collection_version(db: Session, name: str = "tasks"):
+    # Вызывается перед commit каждой записи, поэтому версия коллекции меняется атомарно вместе с данными
+    now = utcnow()
+    bumped = db.execute(update(CollectionVersion).where(CollectionVersion.name == name).values(version=CollectionVersion.version + 1, updated_at=now)).rowcount
+    if not bumped:
+        db.add(CollectionVersion(name=name, version=1, updated_at=now))
+
+
+def create_task(db: Session, data: dict):
+    db_task = Task(**data)
+    db.add(db_task)
+    db.flush()
+    change = TaskChange("created", db_task.id, after=snapshot(db_task))
+    stats.apply(db, [change])
+    bump_collection_version(db)
+    db.commit()
+    db.refresh(db_task)
+    publish([change])
+    return db_task
+
+
+def update_task(db: Session, task_id: int, data: dict):
+    db_task = db.get(Task, task_id)
+    if db_task is None:
+        return None
+    before = snapshot(db_task)
+    for key, value in data.items():
+        setattr(db_task, key, value)
+    db_task.version = Task.version + 1
+    stats.apply(db, [TaskChange("updated", task_id, before=before, after={**before, **data})])
+    bump_collection_version(db)
+    db.commit()
+    db.refresh(db_task)
+    publish([TaskChange("updated", task_id, before=before, after=snapshot(db_task))])
+    return db_task
+
+
+def delete_task(db: Session, task_id: int) -> bool:
+    db_task = db.get(Task, task_id)
+    if db_task is None:
+        return False
+    change = TaskChange("deleted", task_id, before=snapshot(db_task))
+    db.delete(db_task)
+    stats.apply(db, [change])
+    bump_collection_version(db)
+    db.commit()
+    publish([change])
+    return True
+
+
+def allocate_ids(db: Session, size: int, name: str = "tasks") -> int:
+    # Первый id блока из size штук. Блок всегда выше максимального id в таблице, поэтому не пересекается
+    # с задачами, созданными обычным автоинкрементом, пока выдача блоками была выключена
+    block = db.get(IdBlock, name, with_for_update=True)
+    start = (db.scalar(select(func.max(Task.id))) or 0) + 1
+    if block is None:
+        db.add(IdBlock(name=name, next_id=start + size))
+    else:
+        start = max(start, block.next_id)
+        block.next_id = start + size
+    db.commit()
+    return start
+
+
+def existing_task_ids(db: Session, ids) -> set:
+    return set(db.scalars(select(Task.id).where(Task.id.in_(set(ids)))))
+
+
+def create_tasks(db: Session, rows: list[dict]) -> list[int]:
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        generated = db.execute(insert(Task).returning(Task.id, Task.creation_time, sort_by_parameter_order=True), rows).all()
+    else:
+        db_tasks = [Task(**row) for row in rows]
+        db.add_all(db_tasks)
+        db.flush()
+        generated = [(db_task.id, db_task.creation_time) for db_task in db_tasks]
+    changes = [TaskChange("created", task_id, after={**row, "id": task_id, "creation_time": creation_time}) for row, (task_id, creation_time) in zip(rows, generated)]
+    stats.apply(db, changes)
+    bump_collection_version(db)
+    db.commit()
+    publish(changes)
+    return [task_id for task_id, _ in generated]
+
+
+def _snapshots(db: Session, ids) -> dict:
+    return {task.id: snapshot(task) for task in db.scalars(select(Task).where(Task.id.in_(set(ids))))}
+
+
+def update_tasks(db: Session, rows: list[dict]):
+    before = _snapshots(db, [row["id"] for row in rows])
+    # В строках только переданные поля. Строки с одинаковым набором полей идут одним executemany
+    # UPDATE ... WHERE id = ?; версия каждой задачи увеличивается в самом запросе
+    table = Task.__table__
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(key for key in row if key != "id")), []).append(row)
+    for fields, group in groups.items():
+        statement = update(table).where(table.c.id == bindparam("_id")).values({**{field: bindparam(field) for field in fields}, "version": table.c.version + 1})
+        db.execute(statement, [{**{field: row[field] for field in fields}, "_id": row["id"]} for row in group])
+    changes = [TaskChange("updated", row["id"], before=before[row["id"]], after={**before[row["id"]], **row}) for row in rows]
+    stats.apply(db, changes)
+    bump_collection_version(db)
+    db.commit()
+    publish(changes)
+
+
+def delete_tasks(db: Session, ids: list[int]):
+    before = _snapshots(db, ids)
+    db.execute(delete(Task).where(Task.id.in_(ids)))
+    changes = [TaskChange("deleted", task_id, before=row) for task_id, row in before.items()]
+    stats.apply(db, changes)
+    bump_collection_version(db)
+    db.commit()
+    publish(changes)
@@ -1,16 +1,148 @@
-from sqlalchemy import create_engine
+import os
+from typing import Union
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-DATABASE_URL = "sqlite:///./tasks.db"
+load_dotenv()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# sqlite (по умолчанию) или mysql с настройками MYSQL_* из .env; DATABASE_URL задает адрес целиком
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+# Асинхронный режим: эндпоинты получают AsyncSession (aiosqlite / aiomysql) вместо Session
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# Пул соединений (для SQLite в памяти не применяется: там одно соединение на процесс)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# MySQL закрывает простаивающие соединения через wait_timeout (8 часов), поэтому пересоздаем их раньше
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+# SQLite: WAL пускает читателей параллельно с писателем, synchronous=NORMAL в WAL безопасен
+# и не делает fsync на каждый commit, busy_timeout ждет блокировку вместо ошибки "database is locked"
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1").lower() in ("1", "true", "yes")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+
+def _mysql_url(driver: str) -> URL:
+    return URL.create(
+        f"mysql+{driver}",
+        username=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        database=os.getenv("MYSQL_DATABASE"),
+        query={"charset": "utf8mb4"},
+    )
+
+
+def async_url(url):
+    # Тот же адрес с асинхронным драйвером: sqlite -> sqlite+aiosqlite, mysql(+pymysql) -> mysql+aiomysql
+    url = make_url(url)
+    driver = {"sqlite": "aiosqlite", "mysql": "aiomysql"}[url.get_backend_name()]
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def engine_options(url, pooled: bool = True) -> dict:
+    # pooled=False - для движков с явно заданным poolclass (NullPool, StaticPool), которым размеры пула не нужны
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT / 1000}}
+        if url.database in (None, "", ":memory:"):
+            return options
+    else:
+        options = {"connect_args": {"connect_timeout": DB_CONNECT_TIMEOUT}}
+    if not pooled:
+        return options
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+                   pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING)
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url, **kwargs):
+    engine = create_engine(url, **{**engine_options(url, "poolclass" not in kwargs), **kwargs})
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def create_async_db_engine(url, **kwargs):
+    engine = create_async_engine(url, **{**engine_options(url, "poolclass" not in kwargs), **kwargs})
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+if os.getenv("DATABASE_URL"):
+    DATABASE_URL = make_url(os.getenv("DATABASE_URL"))
+    ASYNC_DATABASE_URL = make_url(os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL))
+elif DB_BACKEND == "mysql":
+    DATABASE_URL = _mysql_url("pymysql")
+    ASYNC_DATABASE_URL = _mysql_url("aiomysql")
+else:
+    DATABASE_URL = "sqlite:///./tasks.db"
+    ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./tasks.db"
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL) if DB_ASYNC else None
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if DB_ASYNC else None
+
+DbSession = Union[Session, AsyncSession]
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Зависимость, которую используют эндпоинты: выбирается режимом DB_ASYNC
+get_session = get_async_db if DB_ASYNC else get_db
+
+
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    # fn пишется один раз в синхронном стиле и получает Session:
+    # для AsyncSession она выполняется через run_sync без потоков, для Session — в пуле потоков
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def stream_partitions(db: DbSession, statement, size: int, scalars: bool = True):
+    statement = statement.execution_options(yield_per=size)
+    if isinstance(db, AsyncSession):
+        result = await (db.stream_scalars if scalars else db.stream)(statement)
+        async for partition in result.partitions():
+            yield partition
+    else:
+        result = await run_in_threadpool(db.scalars if scalars else db.execute, statement)
+        async for partition in iterate_in_threadpool(result.partitions()):
+            yield partition
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Optional
+import schemas
+
+# Изменения задач после успешного commit. Подписчики (кэш ответов и т.п.) вызываются синхронно
+# в том потоке, где прошла запись, поэтому они должны быть быстрыми и потокобезопасными
+
+
+@dataclass(frozen=True)
+class TaskChange:
+    kind: str
+    task_id: int
+    before: Optional[dict] = None
+    after: Optional[dict] = None
+
+
+_listeners = []
+
+
+def subscribe(listener):
+    _listeners.append(listener)
+    return listener
+
+
+def unsubscribe(listener):
+    _listeners.remove(listener)
+
+
+def publish(changes: list[TaskChange]):
+    if not changes:
+        return
+    for listener in list(_listeners):
+        listener(changes)
+
+
+def snapshot(task) -> dict:
+    return {field: getattr(task, field) for field in schemas.TaskInfo.model_fields}
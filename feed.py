@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional
+import events
+
+# Лента изменений задач для SSE (GET /tasks/feed) и WebSocket (/tasks/feed/ws).
+# Каждому изменению присваивается номер; последние FEED_BUFFER событий хранятся в кольцевом буфере,
+# и переподключившийся клиент с since=<номер> получает пропущенное без полной перезагрузки списка.
+# У подписчика очередь на FEED_QUEUE_SIZE событий: кто не успевает читать, отключается (evicted)
+FEED_BUFFER = int(os.getenv("FEED_BUFFER", "1000"))
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+FEED_HEARTBEAT = float(os.getenv("FEED_HEARTBEAT", "15"))
+
+# Служебные события: reset - пропущенного уже нет в буфере (или сервер перезапущен), клиенту нужно
+# перечитать список; evicted - подписчик отключен из-за переполнения очереди
+RESET = "reset"
+EVICTED = "evicted"
+
+
+class Subscriber:
+    def __init__(self, loop, maxsize: int, status: Optional[str] = None, priority: Optional[int] = None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.status = status
+        self.priority = priority
+        self.evicted = False
+
+    def matches(self, event: dict) -> bool:
+        if self.status is None and self.priority is None:
+            return True
+        # Событие нужно, если задача подходила под фильтр до изменения или подходит после:
+        # так клиент узнает и о задачах, которые из выборки ушли
+        return any(
+            row is not None and (self.status is None or row["status"] == self.status) and (self.priority is None or row["priority"] == self.priority)
+            for row in (event["before"], event["after"])
+        )
+
+    def offer(self, event: dict):
+        # Вызывается в потоке цикла событий подписчика
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.evicted = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Номера у evicted нет: продолжать нужно с последнего полученного события
+            self.queue.put_nowait({"seq": None, "kind": EVICTED})
+
+
+class ChangeFeed:
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.seq = 0
+        self.evictions = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, changes):
+        # Подписчик events: вызывается в потоке, где прошла запись, поэтому в очереди подписчиков
+        # события попадают через call_soon_threadsafe их цикла событий
+        with self._lock:
+            for change in changes:
+                self.seq += 1
+                event = {"seq": self.seq, "kind": change.kind, "task_id": change.task_id, "before": change.before, "after": change.after}
+                self._buffer.append(event)
+                for subscriber in list(self._subscribers):
+                    if subscriber.matches(event):
+                        try:
+                            subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+                        except RuntimeError:
+                            # Цикл событий подписчика уже закрыт - запись не должна из-за этого падать
+                            self._subscribers.discard(subscriber)
+
+    def subscribe(self, since: Optional[int] = None, status: Optional[str] = None, priority: Optional[int] = None):
+        # Возвращает подписчика и пропущенные события (или одно событие reset, если их уже не восстановить)
+        subscriber = Subscriber(asyncio.get_running_loop(), self.queue_size, status, priority)
+        with self._lock:
+            backlog = []
+            if since is not None:
+                oldest = self._buffer[0]["seq"] if self._buffer else self.seq + 1
+                if since > self.seq or since < oldest - 1:
+                    backlog = [{"seq": self.seq, "kind": RESET}]
+                else:
+                    backlog = [event for event in self._buffer if event["seq"] > since and subscriber.matches(event)]
+            self._subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        if subscriber.evicted:
+            self.evictions += 1
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self._subscribers.clear()
+            self.seq = 0
+            self.evictions = 0
+
+
+def message(event: dict) -> dict:
+    # То, что уходит клиенту: для удаленной задачи task - последнее известное состояние
+    if event["kind"] in (RESET, EVICTED):
+        return {"seq": event["seq"], "kind": event["kind"]}
+    return {"seq": event["seq"], "kind": event["kind"], "task_id": event["task_id"], "task": event["after"] if event["after"] is not None else event["before"]}
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def sse(event: dict) -> str:
+    # id задает Last-Event-ID, с которым браузер сам переподключится
+    event_id = f"id: {event['seq']}\n" if event["seq"] is not None else ""
+    return f"{event_id}event: {event['kind']}\ndata: {dumps(message(event))}\n\n"
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def events_stream(feed: ChangeFeed, since: Optional[int], status: Optional[str], priority: Optional[int], heartbeat: float):
+    # Общий цикл для SSE и WebSocket: сначала пропущенное, затем новые события; None - пора отправить heartbeat.
+    # Подписка оформляется внутри генератора: если клиент ушел раньше первой итерации, подписчик не повиснет
+    subscriber, backlog = feed.subscribe(since, status, priority)
+    try:
+        for event in backlog:
+            yield event
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event["kind"] == EVICTED:
+                return
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+change_feed = ChangeFeed(buffer_size=FEED_BUFFER, queue_size=FEED_QUEUE_SIZE)
+events.subscribe(change_feed.publish)
@@ -0,0 +1,74 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def task_etag(task) -> str:
+    # id и версии мало: SQLite отдает id удаленной последней задачи новой, и у нее снова version=1.
+    # Время изменения в микросекундах отличает такую задачу от прежней
+    stamp = (task.updated_at or task.creation_time).replace(tzinfo=None)
+    return f'"task-{task.id}-{task.version}-{(stamp - EPOCH) // timedelta(microseconds=1)}"'
+
+
+def collection_etag(version: int, params: dict) -> str:
+    # Один и тот же номер версии дает разные теги для разных выборок (сортировка, поиск, страница)
+    query = "&".join(f"{key}={value}" for key, value in sorted(params.items()) if value is not None)
+    digest = hashlib.blake2b(query.encode(), digest_size=6).hexdigest()
+    return f'"tasks-{version}-{digest}"'
+
+
+def preferences(header: str) -> dict:
+    # Accept и Accept-Encoding: "gzip;q=0.5, br" -> {"gzip": 0.5, "br": 1.0}; значение с кривым q считается q=0
+    result = {}
+    for item in (header or "").split(","):
+        value, _, params = item.partition(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        result[value] = quality
+    return result
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified) -> bool:
+    # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2); теги сравниваются слабо
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def validators(etag: str, last_modified) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: str, last_modified) -> Response:
+    return Response(status_code=304, headers=validators(etag, last_modified))
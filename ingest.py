@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError, InterfaceError, OperationalError
+from starlette.concurrency import run_in_threadpool
+import crud
+from database import SessionLocal
+from models import utcnow
+
+# Буферизованная запись POST /tasks (INGEST=1): задача проверяется, получает id из заранее выделенного блока
+# и creation_time, ответ - 202 сразу. В базу задачи пишет фоновый писатель пакетами по INGEST_BATCH_SIZE строк
+# или раз в INGEST_FLUSH_MS миллисекунд, одним commit на пакет. До записи задача не видна в GET.
+# INGEST_QUEUE_SIZE - предел очереди (дальше 503), INGEST_ID_BLOCK - размер блока id.
+# INGEST_JOURNAL - путь к журналу: каждая принятая задача дописывается в него до ответа и переписывается
+# в базу при следующем старте, если процесс упал раньше записи. INGEST_FSYNC=1 - fsync на каждую задачу
+# (переживает и сбой ОС, но медленнее); без журнала принятые и еще не записанные задачи при падении теряются.
+# После каждого пакета в журнал дописываются id записанных задач: при проигрывании они пропускаются, даже если их уже
+# удалили из базы. Журнал больше INGEST_JOURNAL_MAX_BYTES переписывается заново только с еще не записанными задачами.
+# Пакет, который база не принимает из-за нескольких строк, делится пополам, пока они не найдутся: эти задачи
+# пропускаются (метрика ingest_tasks_total{result="dropped"}), остальные пишутся. Пакет повторяется только при недоступной
+# базе; остановка ждет запись очереди не дольше INGEST_STOP_TIMEOUT секунд, недописанное остается в журнале
+INGEST = os.getenv("INGEST", "0") == "1"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "20"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_ID_BLOCK = int(os.getenv("INGEST_ID_BLOCK", "1000"))
+INGEST_JOURNAL = os.getenv("INGEST_JOURNAL")
+INGEST_FSYNC = os.getenv("INGEST_FSYNC", "0") == "1"
+INGEST_JOURNAL_MAX_BYTES = int(os.getenv("INGEST_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+INGEST_STOP_TIMEOUT = float(os.getenv("INGEST_STOP_TIMEOUT", "10"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IdAllocator:
+    # id выдаются из блока в памяти; за новым блоком - один короткий запрос к базе. Недоданные id блока
+    # при остановке пропадают, в нумерации остаются пропуски
+    def __init__(self, sessions, block_size: int = 1000):
+        self.sessions = sessions
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    async def next(self) -> int:
+        if self._next >= self._end:
+            await run_in_threadpool(self._refill)
+        task_id = self._next
+        self._next += 1
+        return task_id
+
+    def reset(self):
+        with self._lock:
+            self._next = self._end = 0
+
+    def _refill(self):
+        with self._lock:
+            if self._next < self._end:
+                return
+            for attempt in range(3):
+                try:
+                    with self.sessions() as db:
+                        start = crud.allocate_ids(db, self.block_size)
+                    break
+                except IntegrityError:
+                    # Два процесса одновременно создали строку счетчика - второй просто повторяет
+                    if attempt == 2:
+                        raise
+            self._next, self._end = start, start + self.block_size
+
+
+class Ingestor:
+    def __init__(self, sessions, batch_size: int = 100, flush_ms: float = 20, max_queue: int = 10000,
+                 id_block: int = 1000, journal_path: str = None, fsync: bool = False, enabled: bool = False,
+                 journal_max_bytes: int = 4 * 1024 * 1024, stop_timeout: float = 10):
+        self.sessions = sessions
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.max_queue = max_queue
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self.journal_max_bytes = journal_max_bytes
+        self.stop_timeout = stop_timeout
+        self.enabled = enabled
+        self.allocator = IdAllocator(sessions, id_block)
+        self.in_flight = 0
+        self.accepted = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.errors = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.retry_delay = 0.5
+        self._pending = deque()
+        self._batch = []
+        self._journal = None
+        self._draining = False
+        # Писатель и его события живут в цикле событий, где пришла первая задача
+        self._loop = None
+        self._writer = None
+        self._wakeup = None
+        self._full = None
+
+    @property
+    def depth(self) -> int:
+        # Принятые, но еще не записанные задачи, включая пакет, который пишется сейчас
+        return len(self._pending) + self.in_flight
+
+    async def submit(self, data: dict) -> dict:
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise IngestQueueFull()
+        row = {"id": await self.allocator.next(), **data, "creation_time": utcnow()}
+        self._append_journal(row)
+        self._pending.append(row)
+        self.accepted += 1
+        self._ensure_writer()
+        self._kick()
+        return row
+
+    async def drain(self, timeout: float = None) -> bool:
+        # Записать все принятое сейчас, не дожидаясь таймера пакета. False - не успели за timeout секунд
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._draining = True
+        try:
+            while self.depth:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+                self._ensure_writer()
+                self._kick()
+                await asyncio.sleep(0.005)
+            return True
+        finally:
+            self._draining = False
+
+    async def stop(self):
+        if not await self.drain(self.stop_timeout):
+            logger.warning("Очередь записи не дописана за %s с: %s задач %s", self.stop_timeout, self.depth,
+                           "остались в журнале" if self.journal_path else "потеряны")
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def replay(self) -> int:
+        # При старте, до приема запросов: задачи из журнала, которых нет в базе, записываются, журнал очищается
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        rows, flushed = {}, set()
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Недописанная последняя строка: на эту задачу ответ 202 не уходил
+                    continue
+                if "flushed" in row:
+                    flushed.update(row["flushed"])
+                    continue
+                row["creation_time"] = datetime.fromisoformat(row["creation_time"])
+                rows[row["id"]] = row
+        for task_id in flushed:
+            rows.pop(task_id, None)
+        written = 0
+        ids = sorted(rows)
+        for start in range(0, len(ids), self.batch_size):
+            # Строка, которую база не принимает, иначе роняла бы каждый старт, и журнал не очистился бы никогда
+            chunk_written, dropped = self._write_isolated([rows[task_id] for task_id in ids[start:start + self.batch_size]])
+            written += chunk_written
+            self.dropped += dropped
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+        return written
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._writer is not None and self._loop is loop and not self._writer.done():
+            return
+        self._loop = loop
+        # Пакет, который прежний писатель не успел записать, возвращается в начало очереди
+        self._pending.extendleft(reversed(self._batch))
+        self._batch = []
+        self.in_flight = 0
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._writer = loop.create_task(self._run())
+
+    def _kick(self):
+        self._wakeup.set()
+        if len(self._pending) >= self.batch_size or self._draining:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self._pending) < self.batch_size and not self._draining:
+                # Пакет копится не дольше flush_interval от пробуждения
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self.in_flight = len(batch)
+            while True:
+                try:
+                    _, dropped = await run_in_threadpool(self._write_isolated, batch)
+                    break
+                except Exception:
+                    # База недоступна или занята: пакет не теряется, попытка повторяется
+                    self.errors += 1
+                    await asyncio.sleep(self.retry_delay)
+            self._batch = []
+            self._journal_flushed(batch)
+            self.in_flight = 0
+            self.dropped += dropped
+            self.flushed += len(batch) - dropped
+            self.flushes += 1
+
+    def _write(self, rows: list) -> int:
+        # Уже записанные id пропускаются: повтор после сбоя и повторное проигрывание журнала безопасны
+        with self.sessions() as db:
+            existing = crud.existing_task_ids(db, [row["id"] for row in rows])
+            missing = [row for row in rows if row["id"] not in existing]
+            if missing:
+                crud.create_tasks(db, missing)
+        return len(missing)
+
+    def _write_isolated(self, rows: list) -> tuple:
+        # (записано, пропущено). Ошибки соединения уходят наверх: такой пакет повторяется целиком
+        try:
+            return self._write(rows), 0
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception:
+            self.errors += 1
+            if len(rows) == 1:
+                logger.exception("Задача %s не записана и пропущена: %s", rows[0]["id"], rows[0])
+                return 0, 1
+        middle = len(rows) // 2
+        first, second = self._write_isolated(rows[:middle]), self._write_isolated(rows[middle:])
+        return first[0] + second[0], first[1] + second[1]
+
+    def _append_journal(self, row: dict):
+        if not self.journal_path:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._write_journal(self._journal, [_journal_line(row)])
+
+    def _journal_flushed(self, batch: list):
+        # Вызывается в цикле событий, как и _append_journal, поэтому строки двух методов не перемешиваются
+        if self._journal is None:
+            return
+        if not self._pending:
+            # Все из журнала уже в базе - журнал можно начать заново
+            self._journal.seek(0)
+            self._journal.truncate()
+        elif self._journal.tell() + 64 > self.journal_max_bytes:
+            # Записанные задачи и отметки о них больше не нужны: остаются только ждущие записи
+            partial = f"{self.journal_path}.tmp"
+            with open(partial, "w", encoding="utf-8") as journal:
+                self._write_journal(journal, [_journal_line(row) for row in self._pending])
+            self._journal.close()
+            os.replace(partial, self.journal_path)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        else:
+            self._write_journal(self._journal, [json.dumps({"flushed": [row["id"] for row in batch]}) + "\n"])
+
+    def _write_journal(self, journal, lines: list):
+        journal.writelines(lines)
+        journal.flush()
+        if self.fsync:
+            os.fsync(journal.fileno())
+
+
+def _journal_line(row: dict) -> str:
+    return json.dumps({**row, "creation_time": row["creation_time"].isoformat()}, ensure_ascii=False) + "\n"
+
+
+ingestor = Ingestor(SessionLocal, batch_size=INGEST_BATCH_SIZE, flush_ms=INGEST_FLUSH_MS, max_queue=INGEST_QUEUE_SIZE,
+                    id_block=INGEST_ID_BLOCK, journal_path=INGEST_JOURNAL, fsync=INGEST_FSYNC, enabled=INGEST,
+                    journal_max_bytes=INGEST_JOURNAL_MAX_BYTES, stop_timeout=INGEST_STOP_TIMEOUT)
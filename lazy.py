@@ -0,0 +1,20 @@
+import importlib
+
+
+class LazyModule:
+    # Модуль загружается при первом обращении к любому его атрибуту. Так тяжелые зависимости, нужные не каждому
+    # процессу (python-jose с rsa, ecdsa и pyasn1), не замедляют импорт main. Загруженный атрибут запоминается,
+    # и дальше берется без __getattr__
+    def __init__(self, name: str):
+        self._name = name
+
+    def load(self):
+        return importlib.import_module(self._name)
+
+    def __getattr__(self, attr):
+        value = getattr(self.load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f"<LazyModule {self._name}>"
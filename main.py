@@ -1,104 +1,508 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc, or_
-from models import Base, User, Task
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from models import Task
 import schemas
-from database import engine, get_db
-from auth import hash_password, authenticate_user, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+import pagination
+import http_cache
+import feed
+import asyncio
+import metrics
+from response_cache import response_cache, describe, CachedResponse
+import serialization
+import search as fulltext
+import stats
+import top_n as topn
+from top_n import top_index
+import migrations
+import os
+import crud
+from database import engine, async_engine, DB_ASYNC, SessionLocal, get_session, run_db, stream_partitions, DbSession
+from auth import hash_password_async, authenticate_user, create_access_token, get_current_user, get_user_by_username, hashing_pool, oauth2_scheme, revoke, token_cache, token_claims, token_subject, ACCESS_TOKEN_EXPIRE_MINUTES
+from revocation import revocation_list, AUTH_REVOCATION_LOAD, AUTH_REVOCATION_REFRESH
+from hashing import HashingPoolBusy
+from ingest import IngestQueueFull, ingestor
+from rate_limit import RateLimitMiddleware, rate_limiter
+from compression import CompressionMiddleware, totals as compression_totals
+from replicas import replica_set, get_read_session, get_writer, DB_REPLICA_CHECK_INTERVAL
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 
-app = FastAPI()
 
-Base.metadata.create_all(bind=engine)
+# Схема создается и обновляется командой python -m migrations upgrade head, при старте только сверяется версия.
+# AUTO_MIGRATE=1 применяет миграции при старте (удобно для локальной разработки), SCHEMA_CHECK=0 отключает проверку
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "1") != "0"
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_MIGRATE:
+        migrations.upgrade(engine)
+    elif SCHEMA_CHECK:
+        migrations.check_schema(engine)
+    health_checks = asyncio.create_task(replica_set.run_health_checks(DB_REPLICA_CHECK_INTERVAL)) if replica_set.replicas else None
+    revocations = None
+    if AUTH_REVOCATION_LOAD:
+        primary = async_engine if DB_ASYNC else engine
+        # Отозванные jti есть только в списке (а без базы пользователей в AUTH_STATELESS - и выход на всех устройствах),
+        # поэтому список загружается до приема запросов, даже если дальше он не перечитывается
+        await revocation_list.refresh(primary)
+        if AUTH_REVOCATION_REFRESH > 0:
+            # Изменившийся список сбрасывает кэш токенов: отозванный в другом процессе токен мог в нем остаться
+            revocations = asyncio.create_task(revocation_list.run_refresh(primary, AUTH_REVOCATION_REFRESH, token_cache.clear))
+    if ingestor.enabled:
+        # Задачи, принятые до падения, но не записанные, попадают в базу раньше новых запросов
+        await run_in_threadpool(ingestor.replay)
+    if top_index.enabled:
+        await run_in_threadpool(topn.warm, SessionLocal)
+    reconcile = asyncio.create_task(stats.run_reconcile(SessionLocal, stats.STATS_RECONCILE_INTERVAL)) if stats.STATS_RECONCILE_INTERVAL > 0 else None
+    yield
+    if health_checks is not None:
+        health_checks.cancel()
+    if revocations is not None:
+        revocations.cancel()
+    if reconcile is not None:
+        reconcile.cancel()
+    # Очередь записи дописывается до конца, пока база еще доступна
+    await ingestor.stop()
+    hashing_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+# Последний добавленный middleware - внешний: метрики видят и отказы 429 от ограничителя,
+# сжатие - внутренний, его время входит во время запроса
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, identify=token_subject)
+app.add_middleware(metrics.MetricsMiddleware)
+
+if metrics.METRICS == "full":
+    metrics.instrument_engine(engine)
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine)
+
+metrics.collected("token_cache_requests_total", "Обращения к кэшу токенов", lambda: {("hit",): token_cache.hits, ("miss",): token_cache.misses}, ("result",), kind="counter")
+metrics.collected("token_cache_size", "Записей в кэше токенов", lambda: {(): token_cache.stats()["size"]})
+metrics.collected("response_cache_requests_total", "Обращения к кэшу ответов GET /tasks", lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}, ("result",), kind="counter")
+metrics.collected("response_cache_invalidations_total", "Записи кэша ответов, сброшенные изменениями задач", lambda: {(): response_cache.invalidations}, kind="counter")
+metrics.collected("response_cache_evictions_total", "Записи кэша ответов, вытесненные по LRU", lambda: {(): response_cache.evictions}, kind="counter")
+metrics.collected("response_cache_size", "Записей в кэше ответов", lambda: {(): len(response_cache.backend)})
+metrics.collected("db_replica_healthy", "Доступность реплик для чтения", lambda: {(replica.name,): int(replica.healthy) for replica in replica_set.replicas}, ("replica",))
+metrics.collected("rate_limit_rejected_total", "Запросы, отклоненные ограничителем частоты", lambda: {(): rate_limiter.rejected}, kind="counter")
+metrics.collected("feed_subscribers", "Подписчики ленты изменений", lambda: {(): feed.change_feed.subscribers})
+metrics.collected("feed_evictions_total", "Подписчики ленты, отключенные из-за переполнения очереди", lambda: {(): feed.change_feed.evictions}, kind="counter")
+metrics.collected("auth_revoked_tokens", "Отозванные токены в списке отзыва", lambda: {(): revocation_list.stats()["tokens"]})
+metrics.collected("top_n_index_requests_total", "Запросы top_n к индексу в памяти", lambda: {("hit",): top_index.hits, ("miss",): top_index.misses}, ("result",), kind="counter")
+metrics.collected("top_n_index_size", "Задач в индексе top_n", lambda: {(): len(top_index)})
+metrics.collected("ingest_queue_depth", "Принятые, но еще не записанные задачи", lambda: {(): ingestor.depth})
+metrics.collected("ingest_tasks_total", "Задачи в очереди записи", lambda: {("accepted",): ingestor.accepted, ("flushed",): ingestor.flushed, ("rejected",): ingestor.rejected, ("dropped",): ingestor.dropped}, ("result",), kind="counter")
+metrics.collected("ingest_flushes_total", "Пакетные commit очереди записи", lambda: {("ok",): ingestor.flushes, ("error",): ingestor.errors}, ("result",), kind="counter")
+metrics.collected("compression_responses_total", "Сжатые ответы по кодировкам", lambda: {(encoding,): count for encoding, count in compression_totals.responses.items()}, ("encoding",), kind="counter")
+metrics.collected("compression_bytes_total", "Байты тел сжатых ответов до (in) и после (out) сжатия", compression_totals.bytes, ("encoding", "direction"), kind="counter")
+metrics.collected("hashing_pool_in_flight", "Операции bcrypt в работе и в очереди", lambda: {(): hashing_pool.in_flight})
+metrics.collected("hashing_pool_rejected_total", "Отказы 429 из-за заполненного пула bcrypt", lambda: {(): hashing_pool.rejected}, kind="counter")
+
+
+@app.exception_handler(IngestQueueFull)
+async def ingest_queue_full_handler(request: Request, exc: IngestQueueFull):
+    return JSONResponse(status_code=503, content={"detail": "Очередь записи переполнена, попробуйте позже"}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    return JSONResponse(status_code=429, content={"detail": "Слишком много запросов, попробуйте позже"}, headers={"Retry-After": "1"})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    # Процесс жив и его цикл событий отвечает; база не проверяется, чтобы сбой базы не приводил к перезапуску воркеров
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready(db: DbSession = Depends(get_session)):
+    # Готов принимать запросы, если из пула основной базы берется соединение и выполняется запрос
+    try:
+        await run_db(db, crud.ping)
+    except SQLAlchemyError:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": "База данных недоступна"})
+    return {"status": "ok", "pid": os.getpid()}
+
 
 @app.post("/register", response_model=schemas.UserInfo)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: schemas.UserCreate, db: DbSession = Depends(get_session)):
+    db_user = await run_db(db, get_user_by_username, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed_password = hash_password(user.password)
-    db_user = User(username=user.username, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    hashed_password = await hash_password_async(user.password)
+    return await run_db(db, crud.create_user, user.username, hashed_password)
 
 
 @app.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: DbSession = Depends(get_session)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
+    access_token = create_access_token(data=token_claims(user), expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
+
+@app.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+        everywhere: bool = Query(False, description="Отозвать все токены пользователя, а не только текущий"),
+        token: str = Depends(oauth2_scheme),
+        db: DbSession = Depends(get_session),
+        current_user: schemas.UserInfo = Depends(get_current_user)):
+    await revoke(db, token, current_user, everywhere)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @app.post("/tasks", response_model=schemas.TaskInfo)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: schemas.UserInfo = Depends(get_current_user)):
-    db_task = Task(**task.model_dump())
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+async def create_task(task: schemas.TaskCreate, response: Response, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    if ingestor.enabled:
+        # Принято в очередь записи (ingest.py): id и creation_time уже окончательные, в GET задача появится после записи
+        response.status_code = status.HTTP_202_ACCEPTED
+        return await ingestor.submit(task.model_dump())
+    return await run_db(db, crud.create_task, task.model_dump())
 
 
 @app.get("/tasks", response_model=list[schemas.TaskInfo])
-def get_tasks(
-        db: Session = Depends(get_db),
+async def get_tasks(
+        request: Request,
+        response: Response,
+        db: DbSession = Depends(get_read_session),
         sort_by: str = Query(None, description="Сортировать по: title, status, creation_time"),
         order: str = Query("asc", description="Порядок сортировки: asc(в порядке возрастания) или desc(в порядке убывания)"),
         top_n: int = Query(None, description="Вернуть топ-N задач (сортировка по возрастанию приоритета, при равенстве — по убыванию времени)"),
-        search: str = Query(None, description="Поиск задач по тексту в title или description")):
-    query = db.query(Task)
-
-    if search:
-        query = query.filter(or_(Task.title.ilike("%" + search + "%"), Task.description.ilike("%" + search + "%")))
+        search: str = Query(None, description="Полнотекстовый поиск задач по словам в title или description"),
+        prefix: bool = Query(True, description="Искать слова поиска как префиксы (проект → проекты, проектом)"),
+        limit: int = Query(None, description="Размер страницы; следующая страница запрашивается по курсору из заголовка X-Next-Cursor"),
+        cursor: str = Query(None, description="Курсор следующей страницы"),
+        stream: bool = Query(False, description="Отдавать задачи потоком в формате NDJSON"),
+        fields: str = Query(None, description="Только эти поля задач через запятую, например id,title,status")):
     if top_n is not None:
         if top_n <= 0:
             raise HTTPException(status_code=400, detail="top_n должен быть положительным числом")
-        query = query.order_by(asc(Task.priority), desc(Task.creation_time)).limit(top_n)
+        sort_key = pagination.TOP_N_KEY
     else:
         if sort_by:
             if sort_by not in ["title", "status", "creation_time"]:
                 raise HTTPException(status_code=400, detail="Недопустимый критерий сортировки. Используйте: title, status, creation_time")
-            sort_order = asc if order == "asc" else desc
-            if sort_by == "title":
-                query = query.order_by(sort_order(Task.title))
-            elif sort_by == "status":
-                query = query.order_by(sort_order(Task.status))
-            elif sort_by == "creation_time":
-                query = query.order_by(sort_order(Task.creation_time))
-    tasks = query.all()
-    return tasks
+        sort_key = sort_by
+    if limit is not None and not 0 < limit <= pagination.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit должен быть от 1 до {pagination.MAX_PAGE_SIZE}")
+    selected = None
+    if fields is not None:
+        selected = serialization.select_fields(fields)
+        if selected is None:
+            raise HTTPException(status_code=400, detail=f"Недопустимые поля. Используйте: {', '.join(serialization.TASK_FIELDS)}")
+        if selected == serialization.TASK_FIELDS:
+            selected = None
+
+    columns = pagination.ordering(sort_key, order)
+    values, served = pagination.decode_cursor(cursor, sort_key, order, columns) if cursor is not None else (None, 0)
+    # Без явной сортировки и пагинации результаты поиска упорядочены по релевантности
+    ranked = sort_key is None and limit is None and cursor is None
+    fast = serialization.FAST_JSON
+    # С fields выбираются только нужные колонки (и колонки сортировки для курсора), а не вся строка с description
+    if selected:
+        entities = serialization.projection_columns(selected, columns)
+    else:
+        entities = serialization.TASK_COLUMNS if fast else (Task,)
+    query = build_tasks_query(db.bind.dialect.name, columns, search, prefix, ranked, values, entities=entities)
+    fetch = crud.fetch_rows if fast or selected else crud.fetch_all
+
+    remaining = top_n - served if top_n is not None else None
+    if remaining is not None and remaining <= 0:
+        return []
+
+    # top_n без поиска и пагинации может ответить индекс в памяти (top_n.py)
+    indexed = top_n is not None and top_index.enabled and not (search or limit or cursor or stream)
+    # Accept: application/msgpack - тот же список в MessagePack (кроме stream=true, там всегда NDJSON)
+    binary = serialization.accepts_msgpack(request.headers.get("accept"))
+    media_type = serialization.MSGPACK if binary else "application/json"
+    if indexed and top_index.mode == topn.LOCAL:
+        rows = await _indexed_top(db, top_n)
+        if rows is not None:
+            return Response(_dump_index_rows(rows, selected, binary), media_type=media_type, headers={"Vary": "Accept"})
+
+    if stream:
+        caps = [x for x in (remaining, limit) if x is not None]
+        if caps:
+            query = query.limit(min(caps))
+        return StreamingResponse(_stream_tasks(db, query, fast, selected), media_type="application/x-ndjson")
+
+    # Версия коллекции читается до выборки: если между ними случится запись, клиент просто получит 200 повторно
+    generation, writes = response_cache.generation, response_cache.writes()
+    version, last_modified = await run_db(db, crud.get_collection_version)
+    etag = http_cache.collection_etag(version, {**request.query_params, "format": "msgpack" if binary else None})
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    headers = {**http_cache.validators(etag, last_modified), "Vary": "Accept"}
+    if indexed and top_index.mode == topn.VERIFIED:
+        rows = await _indexed_top(db, top_n, version)
+        if rows is not None:
+            return Response(_dump_index_rows(rows, selected, binary), media_type=media_type, headers=headers)
+
+    cache_key = response_cache.key(sort_key=sort_key, order=order if sort_key in pagination.SORT_COLUMNS else None, top_n=top_n,
+                                   search=search, prefix=prefix if search else None, limit=limit, cursor=cursor, fields=selected,
+                                   format="msgpack" if binary else None)
+    cached = response_cache.get(cache_key, version)
+    if cached is not None:
+        return Response(cached.body, media_type=media_type, headers={**headers, **cached.headers})
+
+    page_headers = {}
+    if limit is None and cursor is None:
+        if remaining is not None:
+            query = query.limit(remaining)
+        tasks = await run_db(db, fetch, query)
+        bounded = remaining is not None and len(tasks) >= remaining
+    else:
+        page_size = limit or pagination.DEFAULT_PAGE_SIZE
+        if remaining is not None:
+            page_size = min(page_size, remaining)
+        tasks = await run_db(db, fetch, query.limit(page_size + 1))
+        has_more = len(tasks) > page_size and (remaining is None or page_size < remaining)
+        bounded = len(tasks) > page_size
+        tasks = tasks[:page_size]
+        if has_more:
+            last_values = pagination.cursor_values(columns, tasks[-1])
+            page_headers["X-Next-Cursor"] = pagination.encode_cursor(sort_key, order, columns, last_values, served + len(tasks))
+
+    if not response_cache.enabled and not fast and not selected and not binary:
+        response.headers.update(headers)
+        response.headers.update(page_headers)
+        return tasks
+    if binary:
+        body = serialization.dump_msgpack(tasks if fast or selected else serialization.task_rows(tasks), selected or serialization.TASK_FIELDS)
+    elif selected:
+        body = serialization.dump_projection(tasks, selected)
+    else:
+        body = serialization.dump_task_rows(tasks) if fast else serialization.dump_task_list(tasks)
+    if not response_cache.enabled:
+        return Response(body, media_type=media_type, headers={**headers, **page_headers})
+    # Строковые сортировки вне SQLite зависят от collation базы, их границы в Python не сравнить - такие записи сбрасываются при любой подходящей записи
+    ordered = db.bind.dialect.name == "sqlite" or sort_key not in ("title", "status")
+    meta = describe(sort_key, order, search, columns, tasks, after=values, bounded=bounded, ordered=ordered)
+    # Реплика может еще не видеть недавнюю запись: такой ответ отдаем, но в кэш не кладем
+    if not (db.info.get("replica") and replica_set.recently_written()):
+        response_cache.put(cache_key, CachedResponse(body, page_headers, meta), generation, version, writes)
+    return Response(body, media_type=media_type, headers={**headers, **page_headers})
+
+
+def _dump_index_rows(rows, selected, binary: bool = False):
+    # Строки индекса - полные кортежи в порядке TASK_FIELDS
+    if not selected:
+        return serialization.dump_msgpack(rows) if binary else serialization.dump_task_rows(rows)
+    positions = [serialization.TASK_FIELDS.index(field) for field in selected]
+    rows = [[row[position] for position in positions] for row in rows]
+    return serialization.dump_msgpack(rows, selected) if binary else serialization.dump_projection(rows, selected)
+
+
+async def _indexed_top(db: DbSession, k: int, version: int = None):
+    rows = top_index.top(k, version)
+    if rows is None and k <= top_index.capacity:
+        # Индекс не заполнен или отстал: перестраивается здесь же, запрос получает уже свежий ответ
+        await run_db(db, top_index.rebuild)
+        rows = top_index.top(k, version)
+    return rows
+
+
+def build_tasks_query(dialect: str, columns, search: str = None, prefix: bool = True, ranked: bool = False, after=None, entities=(Task,)):
+    query = select(*entities)
+    if search:
+        query = fulltext.apply_search(query, dialect, search, prefix=prefix, ranked=ranked)
+    query = query.order_by(*pagination.order_by(columns))
+    if after is not None:
+        query = query.filter(pagination.keyset_filter(columns, after))
+    return query
+
+
+async def _stream_tasks(db: DbSession, query, fast: bool = False, selected: tuple = None):
+    async for partition in stream_partitions(db, query, pagination.STREAM_CHUNK_SIZE, scalars=not (fast or selected)):
+        if selected:
+            yield serialization.dump_projection_lines(partition, selected)
+        elif fast:
+            yield serialization.dump_task_lines(partition)
+        else:
+            yield "".join(schemas.TaskInfo.model_validate(task).model_dump_json() + "\n" for task in partition)
+
+
+@app.get("/tasks/stats", response_model=schemas.TaskStats)
+async def get_task_stats(db: DbSession = Depends(get_read_session)):
+    # Готовые счетчики из task_stats вместо подсчета по всей таблице
+    return await run_db(db, stats.read)
+
+
+@app.get("/tasks/feed")
+async def task_feed(
+        request: Request,
+        status_filter: str = Query(None, alias="status", description="Только события задач с этим статусом"),
+        priority: int = Query(None, description="Только события задач с этим приоритетом"),
+        since: int = Query(None, description="Продолжить после события с этим номером (по умолчанию берется из Last-Event-ID)")):
+    last_event_id = request.headers.get("Last-Event-ID")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    stream = feed.events_stream(feed.change_feed, since, status_filter, priority, feed.FEED_HEARTBEAT)
+    return StreamingResponse(_sse(stream), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def _sse(stream):
+    async for event in stream:
+        yield ": ping\n\n" if event is None else feed.sse(event)
+
+
+@app.websocket("/tasks/feed/ws")
+async def task_feed_ws(
+        websocket: WebSocket,
+        status_filter: str = Query(None, alias="status"),
+        priority: int = Query(None),
+        since: int = Query(None)):
+    await websocket.accept()
+    stream = feed.events_stream(feed.change_feed, since, status_filter, priority, feed.FEED_HEARTBEAT)
+    try:
+        async for event in stream:
+            if event is None:
+                await websocket.send_text(feed.dumps({"kind": "ping"}))
+                continue
+            await websocket.send_text(feed.dumps(feed.message(event)))
+            if event["kind"] == feed.EVICTED:
+                # 1013 - "попробуйте позже": клиент переподключается с since последнего полученного события
+                await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await stream.aclose()
+
+
+MAX_BATCH_SIZE = 1000
+
+
+def _check_batch_size(size: int):
+    if not 0 < size <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"В пакете должно быть от 1 до {MAX_BATCH_SIZE} элементов")
+
+
+def _validate_items(items, model):
+    valid, failed = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as exc:
+            detail = "; ".join(".".join(map(str, error["loc"])) + ": " + error["msg"] for error in exc.errors())
+            # id из невалидного элемента может быть чем угодно, в ответ попадает только целое
+            item_id = item.get("id")
+            item_id = item_id if isinstance(item_id, int) and not isinstance(item_id, bool) else None
+            failed.append(schemas.BatchItemResult(index=index, id=item_id, status="invalid", detail=detail))
+    return valid, failed
+
+
+def _batch_response(results, atomic: bool, skipped=()):
+    results = sorted(results, key=lambda result: result.index)
+    failed = sum(1 for result in results if result.status in ("invalid", "not_found"))
+    if failed and atomic:
+        # В режиме atomic любая ошибка отменяет весь пакет: ничего не записано, остальные элементы помечены skipped
+        results = sorted(results + [schemas.BatchItemResult(index=index, id=item_id, status="skipped") for index, item_id in skipped], key=lambda result: result.index)
+        return JSONResponse(status_code=400, content=schemas.BatchResult(succeeded=0, failed=failed, items=results).model_dump())
+    return schemas.BatchResult(succeeded=len(results) - failed, failed=failed, items=results)
+
+
+@app.post("/tasks/batch", response_model=schemas.BatchResult)
+async def create_tasks_batch(batch: schemas.TaskBatchCreate, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    _check_batch_size(len(batch.items))
+    valid, failed = _validate_items(batch.items, schemas.TaskCreate)
+    if failed and batch.atomic:
+        return _batch_response(failed, batch.atomic, skipped=[(index, None) for index, _ in valid])
+    rows = [task.model_dump() for _, task in valid]
+    if ingestor.enabled:
+        # id из тех же блоков, что и у очереди записи, иначе автоинкремент займет уже выданные ей id
+        rows = [{**row, "id": await ingestor.allocator.next()} for row in rows]
+    ids = await run_db(db, crud.create_tasks, rows) if rows else []
+    created = [schemas.BatchItemResult(index=index, id=task_id, status="created") for (index, _), task_id in zip(valid, ids)]
+    return _batch_response(failed + created, batch.atomic)
+
+
+@app.patch("/tasks/batch", response_model=schemas.BatchResult)
+async def update_tasks_batch(batch: schemas.TaskBatchUpdate, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    _check_batch_size(len(batch.items))
+    valid, failed = _validate_items(batch.items, schemas.TaskBatchUpdateItem)
+    existing = await run_db(db, crud.existing_task_ids, [task.id for _, task in valid]) if valid else set()
+    found, first = [], {}
+    for index, task in valid:
+        if task.id in first:
+            # Два изменения одной задачи в одном UPDATE посчитались бы в статистике дважды
+            failed.append(schemas.BatchItemResult(index=index, id=task.id, status="invalid", detail=f"id уже есть в пакете (элемент {first[task.id]})"))
+            continue
+        first[task.id] = index
+        if task.id in existing:
+            found.append((index, task))
+        else:
+            failed.append(schemas.BatchItemResult(index=index, id=task.id, status="not_found", detail="Задачи с данным id не существует, эхб"))
+    if failed and batch.atomic:
+        return _batch_response(failed, batch.atomic, skipped=[(index, task.id) for index, task in found])
+    if found:
+        # Поля, которых нет в элементе, не меняются (в отличие от PUT /tasks/{id}, где они сбрасываются к умолчаниям)
+        await run_db(db, crud.update_tasks, [task.model_dump(exclude_unset=True) for _, task in found])
+    updated = [schemas.BatchItemResult(index=index, id=task.id, status="updated") for index, task in found]
+    return _batch_response(failed + updated, batch.atomic)
+
+
+@app.delete("/tasks/batch", response_model=schemas.BatchResult)
+async def delete_tasks_batch(batch: schemas.TaskBatchDelete, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    _check_batch_size(len(batch.ids))
+    existing = await run_db(db, crud.existing_task_ids, batch.ids)
+    failed, found, first = [], [], {}
+    for index, task_id in enumerate(batch.ids):
+        if task_id in first:
+            # Как в PATCH: повтор удалил бы ту же строку и дважды попал бы в succeeded
+            failed.append(schemas.BatchItemResult(index=index, id=task_id, status="invalid", detail=f"id уже есть в пакете (элемент {first[task_id]})"))
+            continue
+        first[task_id] = index
+        if task_id in existing:
+            found.append((index, task_id))
+        else:
+            failed.append(schemas.BatchItemResult(index=index, id=task_id, status="not_found", detail="Задачи с данным id не существует, эхб"))
+    if failed and batch.atomic:
+        return _batch_response(failed, batch.atomic, skipped=found)
+    if found:
+        await run_db(db, crud.delete_tasks, [task_id for _, task_id in found])
+    deleted = [schemas.BatchItemResult(index=index, id=task_id, status="deleted") for index, task_id in found]
+    return _batch_response(failed + deleted, batch.atomic)
 
 
 @app.get("/tasks/{task_id}", response_model=schemas.TaskInfo)
-def get_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
+async def get_task(task_id: int, request: Request, response: Response, db: DbSession = Depends(get_read_session)):
+    task = await run_db(db, crud.get_task, task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Задачи с данным id не существует, эхб")
+    etag = http_cache.task_etag(task)
+    last_modified = task.updated_at or task.creation_time
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    response.headers.update(http_cache.validators(etag, last_modified))
     return task
 
 
 @app.put("/tasks/{task_id}", response_model=schemas.TaskInfo)
-def update_task(task_id: int, task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: schemas.UserInfo = Depends(get_current_user)):
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+async def update_task(task_id: int, task: schemas.TaskCreate, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    db_task = await run_db(db, crud.update_task, task_id, task.model_dump())
     if db_task is None:
         raise HTTPException(status_code=400, detail="Задачи с данным id не существует, эхб")
-    for key, value in task.model_dump().items():
-        setattr(db_task, key, value)
-    db.commit()
-    db.refresh(db_task)
     return db_task
 
 
 @app.delete("/tasks/{task_id}")
-def delete_task(task_id: int, db: Session = Depends(get_db), current_user: schemas.UserInfo = Depends(get_current_user)):
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if db_task is None:
+async def delete_task(task_id: int, db: DbSession = Depends(get_session), current_user: schemas.UserInfo = Depends(get_writer)):
+    if not await run_db(db, crud.delete_task, task_id):
         raise HTTPException(status_code=404, detail="Задачи с данным id не существует, эхб")
-    db.delete(db_task)
-    db.commit()
-    return {"message": f"Задача с id {task_id} удалена"}
\ No newline at end of file
+    return {"message": f"Задача с id {task_id} удалена"}
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Метрики в текстовом формате Prometheus на /metrics.
+# METRICS=full (по умолчанию) - задержка запросов, SQL по запросам, ожидание пула, bcrypt;
+# METRICS=basic - только число и задержка запросов по маршрутам (единицы микросекунд на запрос);
+# METRICS=off - middleware не считает ничего
+METRICS = os.getenv("METRICS", "full")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счетчики по корзинам (без накопления) + корзина +Inf, сумма, количество]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, labels=()):
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def sum(self, labels=()):
+        state = self._values.get(labels)
+        return state[1] if state else 0.0
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = [(labels, list(state[0]), state[1], state[2]) for labels, state in self._values.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                result.append((self.name + "_bucket", labels + (_format_value(bound),), cumulative))
+            result.append((self.name + "_sum", labels, total))
+            result.append((self.name + "_count", labels, count))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Collected:
+    # Значение читается в момент опроса /metrics из функции, возвращающей {метки: значение}.
+    # Так отдаются счетчики, которые уже ведут сами компоненты (кэши, пул bcrypt)
+    def __init__(self, name: str, documentation: str, labelnames=(), collect=None, kind: str = "gauge"):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in self.collect().items()]
+
+    def clear(self):
+        pass
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                names = metric.labelnames + ("le",) if name.endswith("_bucket") else metric.labelnames
+                lines.append(name + _format_labels(names, labels) + " " + _format_value(value))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(names, labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in zip(names, labels):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram("http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")))
+REQUEST_SQL_QUERIES = registry.register(Histogram("http_request_sql_queries", "Число SQL-запросов на один HTTP-запрос", ("method", "route"), COUNT_BUCKETS))
+REQUEST_SQL_SECONDS = registry.register(Histogram("http_request_sql_seconds", "Суммарное время SQL на один HTTP-запрос", ("method", "route"), SQL_BUCKETS + (2.5, 5.0)))
+SQL_QUERIES = registry.register(Counter("sql_queries_total", "Выполненные SQL-запросы", ("statement",)))
+SQL_SECONDS = registry.register(Histogram("sql_query_duration_seconds", "Время выполнения SQL-запроса", ("statement",), SQL_BUCKETS))
+POOL_WAIT_SECONDS = registry.register(Histogram("db_pool_checkout_wait_seconds", "Ожидание соединения из пула", buckets=SQL_BUCKETS))
+BCRYPT_SECONDS = registry.register(Histogram("bcrypt_duration_seconds", "Время bcrypt", ("operation",), (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+
+# Счетчики SQL текущего HTTP-запроса: [число запросов, секунды]. Список изменяемый, поэтому запросы
+# из пула потоков (run_in_threadpool копирует контекст) и из run_sync попадают в тот же объект
+_request_sql = ContextVar("request_sql", default=None)
+
+
+class MetricsMiddleware:
+    # Чистый ASGI без BaseHTTPMiddleware: на горячем пути два perf_counter и одна запись в гистограмму
+    def __init__(self, app, mode: str = None):
+        self.app = app
+        self.mode = mode or METRICS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        sql = None
+        if self.mode == "full":
+            sql = [0, 0.0]
+            token = _request_sql.set(sql)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # Шаблон маршрута вместо пути, иначе /tasks/1, /tasks/2... раздуют число рядов
+            path = route.path if route is not None else "other"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(elapsed, (method, path, status[0]))
+            if sql is not None:
+                _request_sql.reset(token)
+                REQUEST_SQL_QUERIES.observe(sql[0], (method, path))
+                REQUEST_SQL_SECONDS.observe(sql[1], (method, path))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала хранится в соединении: в асинхронном режиме запросы разных корутин идут в одном потоке
+    conn.info.setdefault("query_started", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()[1]
+    kind = statement.lstrip()[:6].upper()
+    kind = kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+    SQL_QUERIES.inc((kind,))
+    SQL_SECONDS.observe(elapsed, (kind,))
+    sql = _request_sql.get()
+    if sql is not None:
+        sql[0] += 1
+        sql[1] += elapsed
+
+
+def _handle_error(exception_context):
+    # Упавший запрос не доходит до after_cursor_execute - его время начала снимается здесь, иначе список растет.
+    # Ошибки до before_cursor_execute (компиляция, соединение) ничего не добавляли, их запись в списке чужая
+    started = exception_context.connection.info.get("query_started") if exception_context.connection is not None else None
+    if started and started[-1][0] is exception_context.execution_context:
+        started.pop()
+
+
+def instrument_engine(engine):
+    # engine - синхронный Engine; для AsyncEngine передается async_engine.sync_engine
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    # dispose() заменяет пул новым объектом (python -m serve делает это перед fork), обертка остается на старом
+    event.listen(engine, "engine_disposed", _engine_disposed)
+    instrument_pool(engine.pool)
+
+
+def _engine_disposed(engine):
+    instrument_pool(engine.pool)
+
+
+def instrument_pool(pool):
+    # У пула нет события "начали ждать соединение", поэтому оборачивается _do_get - то место,
+    # где QueuePool ждет свободное соединение (или открывает новое)
+    do_get = pool._do_get
+    if getattr(do_get, "_timed", False):
+        return
+
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    timed_do_get._timed = True
+    pool._do_get = timed_do_get
+
+
+@contextmanager
+def timer(histogram: Histogram, labels=()):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, labels)
+
+
+def collected(name: str, documentation: str, collect, labelnames=(), kind: str = "gauge"):
+    return registry.register(Collected(name, documentation, labelnames, collect, kind))
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,108 @@
+import importlib
+import pkgutil
+from sqlalchemy import Column, MetaData, String, Table, inspect, select
+from migrations import versions
+
+VERSION_TABLE = "schema_version"
+
+version_table = Table(VERSION_TABLE, MetaData(), Column("version_num", String(32), primary_key=True))
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+def load_migrations():
+    # Миграции лежат в migrations/versions и связаны цепочкой revision -> down_revision
+    modules = [importlib.import_module(f"{versions.__name__}.{info.name}") for info in pkgutil.iter_modules(versions.__path__)]
+    by_parent = {module.down_revision: module for module in modules}
+    chain, parent = [], None
+    while parent in by_parent:
+        module = by_parent.pop(parent)
+        chain.append(module)
+        parent = module.revision
+    if by_parent:
+        raise RuntimeError(f"Миграции не складываются в одну цепочку: {sorted(m.revision for m in by_parent.values())}")
+    return chain
+
+
+def head():
+    chain = load_migrations()
+    return chain[-1].revision if chain else None
+
+
+def current(connection):
+    if not inspect(connection).has_table(VERSION_TABLE):
+        return None
+    return connection.execute(select(version_table.c.version_num)).scalar()
+
+
+def _set_version(connection, revision):
+    connection.execute(version_table.delete())
+    if revision is not None:
+        connection.execute(version_table.insert().values(version_num=revision))
+
+
+def _resolve(chain, target):
+    revisions = [None] + [module.revision for module in chain]
+    if target == "head":
+        return len(revisions) - 1
+    if target == "base":
+        return 0
+    if target not in revisions:
+        raise ValueError(f"Неизвестная ревизия: {target}")
+    return revisions.index(target)
+
+
+def upgrade(engine, target: str = "head", log=print):
+    chain = load_migrations()
+    with engine.begin() as connection:
+        version_table.create(connection, checkfirst=True)
+        position = _resolve(chain, current(connection))
+    end = _resolve(chain, target)
+    for module in chain[position:end]:
+        # Каждая ревизия в своей транзакции: упавшая миграция не откатывает уже примененные
+        with engine.begin() as connection:
+            log(f"upgrade {module.down_revision or 'base'} -> {module.revision}: {module.message}")
+            module.upgrade(connection)
+            _set_version(connection, module.revision)
+
+
+def downgrade(engine, target: str, log=print):
+    chain = load_migrations()
+    with engine.connect() as connection:
+        position = _resolve(chain, current(connection))
+    end = position + int(target) if target.lstrip("-").isdigit() else _resolve(chain, target)
+    if not 0 <= end <= position:
+        raise ValueError(f"Нельзя откатиться к {target} с текущей ревизии")
+    for module in reversed(chain[end:position]):
+        with engine.begin() as connection:
+            log(f"downgrade {module.revision} -> {module.down_revision or 'base'}: {module.message}")
+            module.downgrade(connection)
+            _set_version(connection, module.down_revision)
+
+
+def check_schema(engine):
+    # Проверка при старте: один SELECT версии, без DDL
+    with engine.connect() as connection:
+        version = current(connection)
+    expected = head()
+    if version != expected:
+        raise SchemaOutdated(f"Версия схемы базы {version or 'base'}, ожидается {expected}. Выполните: python -m migrations upgrade head")
+
+
+def create_index(connection, name: str, table: str, columns: str):
+    # Индекс строится без блокировки записи: в MySQL через online DDL,
+    # в SQLite (WAL) читатели и так не блокируются на время построения
+    if connection.dialect.name == "mysql":
+        if name not in {index["name"] for index in inspect(connection).get_indexes(table)}:
+            connection.exec_driver_sql(f"CREATE INDEX {name} ON {table} ({columns}) ALGORITHM=INPLACE LOCK=NONE")
+    else:
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def drop_index(connection, name: str, table: str):
+    if connection.dialect.name == "mysql":
+        connection.exec_driver_sql(f"DROP INDEX {name} ON {table}")
+    else:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
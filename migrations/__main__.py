@@ -0,0 +1,31 @@
+import argparse
+import migrations
+from database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Версионные миграции схемы базы задач")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade = commands.add_parser("upgrade", help="применить миграции до ревизии (по умолчанию head)")
+    upgrade.add_argument("revision", nargs="?", default="head")
+    downgrade = commands.add_parser("downgrade", help="откатить миграции до ревизии, base или на -N шагов")
+    downgrade.add_argument("revision")
+    commands.add_parser("current", help="показать текущую ревизию базы")
+    commands.add_parser("history", help="показать список миграций")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        migrations.upgrade(engine, args.revision)
+    elif args.command == "downgrade":
+        migrations.downgrade(engine, args.revision)
+    elif args.command == "current":
+        with engine.connect() as connection:
+            print(migrations.current(connection) or "base")
+    elif args.command == "history":
+        head = migrations.head()
+        for module in migrations.load_migrations():
+            print(f"{module.down_revision or 'base'} -> {module.revision}{' (head)' if module.revision == head else ''}: {module.message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+message = "таблицы tasks и users"
+
+metadata = sa.MetaData()
+
+sa.Table(
+    "tasks", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("title", sa.String(255), index=True),
+    sa.Column("description", sa.Text, nullable=True),
+    sa.Column("status", sa.String(64)),
+    sa.Column("creation_time", sa.DateTime),
+    sa.Column("priority", sa.Integer),
+)
+
+sa.Table(
+    "users", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("username", sa.String(255), unique=True, index=True),
+    sa.Column("hashed_password", sa.String(255)),
+)
+
+
+def upgrade(connection):
+    # checkfirst: tasks.db, созданный раньше через create_all, просто получает номер версии
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection):
+    metadata.drop_all(connection)
@@ -0,0 +1,13 @@
+import search
+
+revision = "0002"
+down_revision = "0001"
+message = "полнотекстовый индекс по title и description"
+
+
+def upgrade(connection):
+    search.install_fulltext(connection)
+
+
+def downgrade(connection):
+    search.drop_fulltext(connection)
@@ -0,0 +1,21 @@
+from migrations import create_index, drop_index
+
+revision = "0003"
+down_revision = "0002"
+message = "составные индексы под сортировки GET /tasks"
+
+INDEXES = [
+    ("ix_tasks_status_id", "status, id"),
+    ("ix_tasks_creation_time_id", "creation_time, id"),
+    ("ix_tasks_top_n", "priority, creation_time DESC, id"),
+]
+
+
+def upgrade(connection):
+    for name, columns in INDEXES:
+        create_index(connection, name, "tasks", columns)
+
+
+def downgrade(connection):
+    for name, _ in reversed(INDEXES):
+        drop_index(connection, name, "tasks")
@@ -0,0 +1,29 @@
+import sqlalchemy as sa
+from models import utcnow
+
+revision = "0004"
+down_revision = "0003"
+message = "версии задач и коллекции для ETag/Last-Modified"
+
+metadata = sa.MetaData()
+
+collection_versions = sa.Table(
+    "collection_versions", metadata,
+    sa.Column("name", sa.String(64), primary_key=True),
+    sa.Column("version", sa.Integer, nullable=False, default=0),
+    sa.Column("updated_at", sa.DateTime),
+)
+
+
+def upgrade(connection):
+    connection.exec_driver_sql("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    connection.exec_driver_sql("ALTER TABLE tasks ADD COLUMN updated_at DATETIME")
+    connection.exec_driver_sql("UPDATE tasks SET updated_at = creation_time")
+    collection_versions.create(connection)
+    connection.execute(collection_versions.insert().values(name="tasks", version=1, updated_at=utcnow()))
+
+
+def downgrade(connection):
+    collection_versions.drop(connection)
+    connection.exec_driver_sql("ALTER TABLE tasks DROP COLUMN updated_at")
+    connection.exec_driver_sql("ALTER TABLE tasks DROP COLUMN version")
@@ -0,0 +1,23 @@
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+message = "версия токенов пользователя и отозванные токены"
+
+metadata = sa.MetaData()
+
+revoked_tokens = sa.Table(
+    "revoked_tokens", metadata,
+    sa.Column("jti", sa.String(64), primary_key=True),
+    sa.Column("expires_at", sa.DateTime, nullable=False, index=True),
+)
+
+
+def upgrade(connection):
+    connection.exec_driver_sql("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+    revoked_tokens.create(connection)
+
+
+def downgrade(connection):
+    revoked_tokens.drop(connection)
+    connection.exec_driver_sql("ALTER TABLE users DROP COLUMN token_version")
@@ -0,0 +1,27 @@
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+message = "счетчики задач для /tasks/stats"
+
+metadata = sa.MetaData()
+
+task_stats = sa.Table(
+    "task_stats", metadata,
+    sa.Column("dimension", sa.String(16), primary_key=True),
+    sa.Column("bucket", sa.String(64), primary_key=True),
+    sa.Column("count", sa.Integer, nullable=False, default=0),
+)
+
+
+def upgrade(connection):
+    task_stats.create(connection)
+    # Начальные значения из уже существующих задач; дальше счетчики ведут сами записи
+    connection.exec_driver_sql("INSERT INTO task_stats (dimension, bucket, count) SELECT 'total', 'all', COUNT(*) FROM tasks")
+    connection.exec_driver_sql("INSERT INTO task_stats (dimension, bucket, count) SELECT 'status', status, COUNT(*) FROM tasks WHERE status IS NOT NULL GROUP BY status")
+    connection.exec_driver_sql("INSERT INTO task_stats (dimension, bucket, count) SELECT 'priority', CAST(priority AS CHAR), COUNT(*) FROM tasks WHERE priority IS NOT NULL GROUP BY priority")
+    connection.exec_driver_sql("INSERT INTO task_stats (dimension, bucket, count) SELECT 'day', DATE(creation_time), COUNT(*) FROM tasks WHERE creation_time IS NOT NULL GROUP BY DATE(creation_time)")
+
+
+def downgrade(connection):
+    task_stats.drop(connection)
@@ -0,0 +1,21 @@
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+message = "выдача id задач блоками для буферизованной записи"
+
+metadata = sa.MetaData()
+
+id_blocks = sa.Table(
+    "id_blocks", metadata,
+    sa.Column("name", sa.String(64), primary_key=True),
+    sa.Column("next_id", sa.Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    id_blocks.create(connection)
+
+
+def downgrade(connection):
+    id_blocks.drop(connection)
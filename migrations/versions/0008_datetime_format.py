@@ -0,0 +1,28 @@
+from datetime import datetime
+
+revision = "0008"
+down_revision = "0007"
+message = "creation_time и updated_at в одном формате с микросекундами"
+
+# SQLite хранит даты строками и сравнивает их как текст. Старые строки (DEFAULT CURRENT_TIMESTAMP и копия в updated_at
+# из 0004) записаны без дробной части: '2025-05-21 20:19:25' меньше '2025-05-21 20:19:25.000000', поэтому курсор
+# по creation_time на таких строках зацикливается или пропускает задачи. Приводим к формату, который пишет SQLAlchemy
+FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+CANONICAL = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9][0-9][0-9][0-9][0-9]"
+COLUMNS = ("creation_time", "updated_at")
+
+
+def upgrade(connection):
+    # В MySQL это DATETIME, формат хранения от строки не зависит
+    if connection.dialect.name != "sqlite":
+        return
+    for column in COLUMNS:
+        rows = connection.exec_driver_sql(f"SELECT id, {column} FROM tasks WHERE {column} IS NOT NULL AND {column} NOT GLOB '{CANONICAL}'").all()
+        if rows:
+            connection.exec_driver_sql(f"UPDATE tasks SET {column} = ? WHERE id = ?",
+                                       [(datetime.fromisoformat(value).strftime(FORMAT), task_id) for task_id, value in rows])
+
+
+def downgrade(connection):
+    # Новый формат читается и прежним кодом - возвращать секунды незачем
+    pass
@@ -1,20 +1,76 @@
-from sqlalchemy import Column, Integer, String, DateTime
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime, timezone
 from database import Base
 
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    description = Column(String, nullable=True)
-    status = Column(String, default="в ожидании")
-    creation_time = Column(DateTime, default=func.now())
+    # Длины как в миграции 0001: MySQL не создаст VARCHAR без длины
+    title = Column(String(255), index=True)
+    description = Column(Text, nullable=True)
+    status = Column(String(64), default="в ожидании")
+    creation_time = Column(DateTime, default=utcnow)
     priority = Column(Integer, default=1)
+    # version и updated_at — валидаторы для ETag/Last-Modified, меняются при каждом изменении задачи
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
+# Индексы под каждый порядок из GET /tasks (id в конце совпадает с тай-брейком курсорной пагинации),
+# чтобы сортировка шла обходом индекса, а не полным сканированием с временным B-деревом.
+# Схема рабочей базы меняется только миграциями (migrations/versions), модели должны им соответствовать
+Index("ix_tasks_status_id", Task.status, Task.id)
+Index("ix_tasks_creation_time_id", Task.creation_time, Task.id)
+Index("ix_tasks_top_n", Task.priority, Task.creation_time.desc(), Task.id)
+
+
+class CollectionVersion(Base):
+    # Версия всей коллекции: растет в той же транзакции, что и любая запись в таблицу
+    __tablename__ = "collection_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=utcnow)
+
+
+class TaskStat(Base):
+    # Счетчики для GET /tasks/stats: (dimension, bucket) -> число задач. dimension - total, status, priority или day.
+    # Меняются в той же транзакции, что и задачи, поэтому чтение статистики не зависит от размера tasks
+    __tablename__ = "task_stats"
+
+    dimension = Column(String(16), primary_key=True)
+    bucket = Column(String(64), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class IdBlock(Base):
+    # Счетчик для выдачи id блоками (ingest.py): процесс забирает next_id..next_id+размер-1 одним UPDATE
+    __tablename__ = "id_blocks"
+
+    name = Column(String(64), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
\ No newline at end of file
+    username = Column(String(255), unique=True, index=True)
+    hashed_password = Column(String(255))
+    # Токены с ver меньше token_version отозваны (выход на всех устройствах)
+    token_version = Column(Integer, nullable=False, default=0)
+
+
+class RevokedToken(Base):
+    # Отозванные токены по jti; строка нужна только до истечения самого токена
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
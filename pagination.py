@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, or_, asc, desc
+from models import Task
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+
+SORT_COLUMNS = {"title": Task.title, "status": Task.status, "creation_time": Task.creation_time}
+TOP_N_KEY = "top_n"
+
+
+def ordering(sort_key: str, order: str = "asc"):
+    # Список (колонка, направление); id в конце делает порядок строгим, без него курсор неоднозначен
+    if sort_key == TOP_N_KEY:
+        return [(Task.priority, asc), (Task.creation_time, desc), (Task.id, asc)]
+    direction = asc if order == "asc" else desc
+    if sort_key in SORT_COLUMNS:
+        return [(SORT_COLUMNS[sort_key], direction), (Task.id, direction)]
+    return [(Task.id, asc)]
+
+
+def order_by(columns):
+    return [direction(column) for column, direction in columns]
+
+
+def keyset_filter(columns, values):
+    # (a, b, c) "после" (va, vb, vc) с учетом направления каждой колонки:
+    # a > va OR (a = va AND (b > vb OR (b = vb AND c > vc)))
+    # Первая колонка дополнительно ограничена диапазоном, чтобы база могла начать с поиска по индексу
+    def after(column, direction, value):
+        return column > value if direction is asc else column < value
+
+    def at_or_after(column, direction, value):
+        return column >= value if direction is asc else column <= value
+
+    condition = None
+    for (column, direction), value in reversed(list(zip(columns, values))):
+        strictly_after = after(column, direction, value)
+        condition = strictly_after if condition is None else or_(strictly_after, and_(column == value, condition))
+    first_column, first_direction = columns[0]
+    return and_(at_or_after(first_column, first_direction, values[0]), condition)
+
+
+def cursor_values(columns, row):
+    return [getattr(row, column.key) for column, _ in columns]
+
+
+class _Descending:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def position(columns, values):
+    # Кортеж, который сравнивается в Python так же, как строки упорядочены в ORDER BY
+    return tuple(value if direction is asc else _Descending(value) for (_, direction), value in zip(columns, values))
+
+
+def encode_cursor(sort_key: str, order: str, columns, values, served: int = 0) -> str:
+    payload = {"k": sort_key, "o": order, "v": dump_values(values), "n": served}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, sort_key: str, order: str, columns):
+    invalid = HTTPException(status_code=400, detail="Недопустимый курсор")
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        served = int(payload.get("n", 0))
+        if served >= 2 ** 63:
+            raise OverflowError("served is out of range")
+    except (binascii.Error, ValueError, TypeError, KeyError, OverflowError):
+        raise invalid
+    if payload.get("k") != sort_key or payload.get("o") != order or not isinstance(values, list) or len(values) != len(columns) or served < 0:
+        raise HTTPException(status_code=400, detail="Курсор не соответствует параметрам сортировки")
+    try:
+        values = load_values(columns, values)
+    except (ValueError, TypeError, OverflowError):
+        raise invalid
+    return values, served
+
+
+def dump_values(values):
+    return [value.isoformat() if isinstance(value, datetime) else value for value in values]
+
+
+def load_values(columns, values):
+    return [_load_value(column, value) for (column, _), value in zip(columns, values)]
+
+
+def _load_value(column, value):
+    if value is None:
+        raise ValueError("cursor value is empty")
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    value = column.type.python_type(value)
+    # 1e999 в JSON - бесконечность (int() дает OverflowError), слишком большое целое база не примет в параметр
+    if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+        raise OverflowError("cursor value is out of range")
+    return value
@@ -0,0 +1,266 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# Ограничение частоты запросов (token bucket) и числа одновременных запросов на клиента.
+# Клиент - sub из проверенного JWT, без токена - IP. У каждого класса маршрутов свой бюджет:
+# RATE_LIMIT_AUTH, RATE_LIMIT_SEARCH, RATE_LIMIT_WRITE, RATE_LIMIT_READ, RATE_LIMIT_FEED (подключения к ленте) в виде "запросов/секунд"
+# (емкость ведра / время полного восполнения). RATE_LIMIT=0 отключает ограничения,
+# RATE_LIMIT_REDIS_URL - общие ведра для нескольких процессов, RATE_LIMIT_CONCURRENCY - одновременных запросов на клиента
+RATE_LIMIT = os.getenv("RATE_LIMIT", "1") != "0"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_CONCURRENCY = int(os.getenv("RATE_LIMIT_CONCURRENCY", "16"))
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+DEFAULT_POLICIES = {"auth": "10/60", "search": "30/10", "write": "60/10", "read": "200/10", "feed": "10/60"}
+
+
+@dataclass(frozen=True)
+class Policy:
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Policy":
+        capacity, _, period = value.partition("/")
+        return cls(int(capacity), float(period or 1))
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: int
+    retry_after: float
+    reset_after: float
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int = 100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, policy: Policy) -> Decision:
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (policy.capacity, now))
+            tokens = min(policy.capacity, tokens + (now - updated) * policy.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return _decision(allowed, tokens, policy)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    # Ведро хранится в хеше {tokens, updated}; чтение, пополнение и списание - один Lua-скрипт, поэтому атомарно
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = "tasks:ratelimit"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key: str, policy: Policy) -> Decision:
+        # Время берется с часов Redis, чтобы процессы на разных машинах не расходились
+        seconds, microseconds = self._redis.time()
+        allowed, tokens = self._script(keys=[f"{self._prefix}:{key}"], args=[policy.capacity, policy.rate, seconds + microseconds / 1e6])
+        return _decision(bool(allowed), float(tokens), policy)
+
+    def clear(self):
+        for key in self._redis.scan_iter(f"{self._prefix}:*"):
+            self._redis.delete(key)
+
+
+def _decision(allowed: bool, tokens: float, policy: Policy) -> Decision:
+    return Decision(
+        allowed=allowed,
+        remaining=int(tokens),
+        retry_after=0.0 if allowed else (1 - tokens) / policy.rate,
+        reset_after=(policy.capacity - tokens) / policy.rate,
+    )
+
+
+class RateLimiter:
+    def __init__(self, backend, policies: dict, enabled: bool = True, concurrency: int = 0):
+        self.backend = backend
+        self.policies = policies
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.rejected = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def take(self, route_class: str, key: str) -> Decision:
+        decision = self.backend.take(f"{route_class}:{key}", self.policies[route_class])
+        if not decision.allowed:
+            self.rejected += 1
+        return decision
+
+    def acquire(self, key: str) -> bool:
+        # Одновременные запросы считаются в памяти процесса и для общего бэкенда тоже
+        if self.concurrency <= 0:
+            return True
+        with self._lock:
+            in_flight = self._in_flight.get(key, 0)
+            if in_flight >= self.concurrency:
+                self.rejected += 1
+                return False
+            self._in_flight[key] = in_flight + 1
+            return True
+
+    def release(self, key: str):
+        if self.concurrency <= 0:
+            return
+        with self._lock:
+            in_flight = self._in_flight.get(key, 1) - 1
+            if in_flight:
+                self._in_flight[key] = in_flight
+            else:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self._in_flight.clear()
+        self.rejected = 0
+
+
+def route_class(method: str, path: str, query_string: bytes) -> Optional[str]:
+    if path in ("/login", "/register"):
+        return "auth"
+    if not path.startswith("/tasks"):
+        return None
+    if path == "/tasks/feed":
+        return "feed"
+    if method != "GET":
+        return "write"
+    if path == "/tasks" and b"search=" in query_string:
+        return "search"
+    return "read"
+
+
+def headers(policy: Policy, decision: Decision) -> list:
+    result = [
+        (b"ratelimit-limit", str(policy.capacity).encode()),
+        (b"ratelimit-remaining", str(decision.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+        (b"ratelimit-policy", f"{policy.capacity};w={math.ceil(policy.period)}".encode()),
+    ]
+    if not decision.allowed:
+        result.append((b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode()))
+    return result
+
+
+class RateLimitMiddleware:
+    # Чистый ASGI: решение принимается до маршрутизации и разбора тела, отказ не доходит до базы и bcrypt
+    def __init__(self, app, limiter: RateLimiter, identify):
+        self.app = app
+        self.limiter = limiter
+        # identify(token) -> sub проверенного токена или None
+        self.identify = identify
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter
+        if scope["type"] != "http" or not limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        route = route_class(scope["method"], scope["path"], scope["query_string"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        key = self._client_key(scope)
+        policy = limiter.policies[route]
+        decision = limiter.take(route, key)
+        if not decision.allowed:
+            await _reject(send, headers(policy, decision))
+            return
+        # Подключение к ленте живет долго и не должно занимать место в лимите одновременных запросов
+        concurrent = route != "feed"
+        if concurrent and not limiter.acquire(key):
+            await _reject(send, [(b"retry-after", b"1")])
+            return
+        extra = headers(policy, decision)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if concurrent:
+                limiter.release(key)
+
+    def _client_key(self, scope) -> str:
+        request_headers = dict(scope["headers"])
+        authorization = request_headers.get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            sub = self.identify(token)
+            if sub is not None:
+                return "user:" + sub
+        if RATE_LIMIT_TRUST_PROXY and b"x-forwarded-for" in request_headers:
+            return "ip:" + request_headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, extra_headers):
+    body = json.dumps({"detail": "Слишком много запросов, попробуйте позже"}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + extra_headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _backend():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBackend(RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+
+rate_limiter = RateLimiter(
+    _backend(),
+    {name: Policy.parse(os.getenv(f"RATE_LIMIT_{name.upper()}", default)) for name, default in DEFAULT_POLICIES.items()},
+    enabled=RATE_LIMIT,
+    concurrency=RATE_LIMIT_CONCURRENCY,
+)
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+import events
+import schemas
+from auth import get_current_user, jwt
+from database import DB_ASYNC, async_url, create_async_db_engine, create_db_engine, get_async_db, get_db
+
+# Чтения (GET /tasks, GET /tasks/{id}) уходят на реплики по кругу, записи - на основную базу.
+# DB_REPLICA_URLS - адреса реплик через запятую (пусто - все идет в основную базу).
+# После записи пользователь DB_REPLICA_STICKY_SECONDS секунд читает с основной базы, чтобы видеть свои изменения
+# несмотря на отставание реплик. Недоступная реплика исключается до следующей успешной проверки
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: object
+    sessions: object
+    healthy: bool = True
+
+
+class ReplicaSet:
+    def __init__(self, sticky_seconds: float = 5.0, clock=time.monotonic):
+        self.sticky_seconds = sticky_seconds
+        self.replicas = []
+        self._clock = clock
+        self._counter = itertools.count()
+        self._writes = {}
+        self._last_write = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, engine):
+        if isinstance(engine, AsyncEngine):
+            sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        else:
+            sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        replica = Replica(name, engine, sessions)
+        self.replicas.append(replica)
+        return replica
+
+    def clear(self):
+        self.replicas = []
+        self.reset_writes()
+
+    def reset_writes(self):
+        with self._lock:
+            self._writes.clear()
+            self._last_write = None
+
+    def note_write(self, username: Optional[str] = None):
+        now = self._clock()
+        with self._lock:
+            self._last_write = now
+            if username is not None:
+                self._writes[username] = now
+                # Старые отметки чистятся по ходу, чтобы словарь не рос бесконечно
+                if len(self._writes) > 10000:
+                    deadline = now - self.sticky_seconds
+                    self._writes = {name: at for name, at in self._writes.items() if at > deadline}
+
+    @property
+    def has_writers(self) -> bool:
+        return bool(self._writes)
+
+    def is_sticky(self, username: Optional[str]) -> bool:
+        if username is None or not self._writes:
+            return False
+        at = self._writes.get(username)
+        return at is not None and self._clock() - at < self.sticky_seconds
+
+    def recently_written(self) -> bool:
+        # Запись была недавно, и реплика еще может ее не видеть
+        return self._last_write is not None and self._clock() - self._last_write < self.sticky_seconds
+
+    def route(self, username: Optional[str] = None) -> Optional[Replica]:
+        # None - читать с основной базы
+        if not self.replicas or self.is_sticky(username):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check(self):
+        for replica in self.replicas:
+            try:
+                if isinstance(replica.engine, AsyncEngine):
+                    async with replica.engine.connect() as connection:
+                        await connection.execute(text("SELECT 1"))
+                else:
+                    await run_in_threadpool(_ping, replica.engine)
+                replica.healthy = True
+            except Exception:
+                replica.healthy = False
+
+    async def run_health_checks(self, interval: float):
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+
+def _ping(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+replica_set = ReplicaSet(sticky_seconds=DB_REPLICA_STICKY_SECONDS)
+for index, url in enumerate(DB_REPLICA_URLS):
+    replica_set.add(f"replica{index}", create_async_db_engine(async_url(url)) if DB_ASYNC else create_db_engine(url))
+events.subscribe(lambda changes: replica_set.note_write())
+
+
+def _reader(request: Request) -> Optional[str]:
+    # Подпись не проверяется: имя нужно только для выбора базы, чужое имя в токене даст лишь чтение с основной
+    if not replica_set.has_writers:
+        return None
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except jwt.JWTError:
+        return None
+
+
+# Сессия основной базы берется через Depends: она создается лениво (соединение - только при первом запросе),
+# а подмены get_db/get_async_db в тестах действуют и на чтения
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    replica = replica_set.route(_reader(request))
+    if replica is None:
+        yield primary
+        return
+    db = replica.sessions()
+    db.info["replica"] = replica.name
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request, primary: AsyncSession = Depends(get_async_db)):
+    replica = replica_set.route(_reader(request))
+    if replica is None:
+        yield primary
+        return
+    async with replica.sessions() as db:
+        db.info["replica"] = replica.name
+        yield db
+
+
+# Зависимость для читающих эндпоинтов, как get_session для остальных
+get_read_session = get_async_read_db if DB_ASYNC else get_read_db
+
+
+async def get_writer(user: schemas.UserInfo = Depends(get_current_user)) -> schemas.UserInfo:
+    # Пишущие эндпоинты получают пользователя через эту зависимость: с этого момента его чтения идут на основную базу
+    replica_set.note_write(user.username)
+    return user
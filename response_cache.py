@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+import events
+import pagination
+import search as fulltext
+
+# Кэш готовых JSON-ответов GET /tasks. Ключ - нормализованные параметры запроса, значение - байты тела,
+# заголовки и описание выборки (сортировка, поиск, границы страницы, id строк). По описанию запись
+# сбрасывается только теми изменениями задач, которые действительно могли поменять ответ.
+# Запись помнит версию коллекции и счетчик записей, которые кэш видел, на момент выборки: если версия с тех пор выросла
+# больше, чем на число увиденных записей, базу менял кто-то мимо кэша (другой процесс, правка руками) и запись не отдается.
+#
+# RESPONSE_CACHE=0 отключает кэш, RESPONSE_CACHE_SIZE - число записей,
+# RESPONSE_CACHE_REDIS_URL - общий кэш в Redis для нескольких процессов (иначе кэш в памяти процесса)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: dict = field(default_factory=dict)
+    meta: dict = field(default_factory=dict)
+
+
+class LocalBackend:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse) -> int:
+        # Возвращает число вытесненных записей
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def metas(self):
+        with self._lock:
+            return [(key, entry.meta) for key, entry in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def written(self):
+        with self._lock:
+            self._writes += 1
+
+    def writes(self) -> int:
+        return self._writes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    # Тот же интерфейс поверх Redis: тела и описания в двух хешах, порядок LRU - в sorted set
+    def __init__(self, url: str, maxsize: int, prefix: str = "tasks:response-cache"):
+        import redis
+
+        self.maxsize = maxsize
+        self._redis = redis.Redis.from_url(url)
+        self._bodies = f"{prefix}:bodies"
+        self._metas = f"{prefix}:metas"
+        self._lru = f"{prefix}:lru"
+        self._tick = f"{prefix}:tick"
+        # Общий для процессов счетчик записей, прошедших через invalidate
+        self._writes = f"{prefix}:writes"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        body, meta = self._redis.pipeline().hget(self._bodies, key).hget(self._metas, key).execute()
+        if body is None or meta is None:
+            return None
+        self._redis.zadd(self._lru, {key: self._redis.incr(self._tick)})
+        meta = json.loads(meta)
+        return CachedResponse(body, meta.pop("headers"), meta)
+
+    def set(self, key: str, entry: CachedResponse) -> int:
+        meta = json.dumps({**entry.meta, "headers": entry.headers}, ensure_ascii=False)
+        tick = self._redis.incr(self._tick)
+        self._redis.pipeline().hset(self._bodies, key, entry.body).hset(self._metas, key, meta).zadd(self._lru, {key: tick}).execute()
+        overflow = self._redis.zcard(self._lru) - self.maxsize
+        if overflow <= 0:
+            return 0
+        stale = [key.decode() for key in self._redis.zrange(self._lru, 0, overflow - 1)]
+        self.delete(stale)
+        return len(stale)
+
+    def delete(self, keys):
+        keys = list(keys)
+        if keys:
+            self._redis.pipeline().hdel(self._bodies, *keys).hdel(self._metas, *keys).zrem(self._lru, *keys).execute()
+
+    def metas(self):
+        return [(key.decode(), json.loads(meta)) for key, meta in self._redis.hgetall(self._metas).items()]
+
+    def clear(self):
+        self._redis.delete(self._bodies, self._metas, self._lru)
+
+    def written(self):
+        self._redis.incr(self._writes)
+
+    def writes(self) -> int:
+        return int(self._redis.get(self._writes) or 0)
+
+    def __len__(self):
+        return self._redis.zcard(self._lru)
+
+
+class ResponseCache:
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(**params) -> str:
+        return json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+    def writes(self) -> int:
+        return self.backend.writes() if self.enabled else 0
+
+    def get(self, key: str, version: int) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        entry = self.backend.get(key)
+        if entry is not None and version - entry.meta["version"] != self.backend.writes() - entry.meta["writes"]:
+            # Коллекцию меняли мимо invalidate - что именно поменялось, неизвестно
+            self.backend.delete([key])
+            self.invalidations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedResponse, generation: int, version: int, writes: int):
+        # Если за время выборки была запись, результат мог устареть еще до сохранения - не кэшируем его.
+        # version и writes читаются до выборки, generation - тоже
+        if not self.enabled or generation != self.generation:
+            return
+        entry.meta.update(version=version, writes=writes)
+        self.evictions += self.backend.set(key, entry)
+
+    def invalidate(self, changes):
+        self.generation += 1
+        stale = [key for key, meta in self.backend.metas() if any(affects(meta, change) for change in changes)]
+        self.backend.delete(stale)
+        self.invalidations += len(stale)
+        # Счетчик растет после удаления: пока его не увеличили, версия обогнала его и все записи считаются устаревшими
+        self.backend.written()
+
+    def clear(self):
+        self.backend.clear()
+        self.generation += 1
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "size": len(self.backend),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def describe(sort_key, order, search, columns, tasks, after=None, bounded=False, ordered=True) -> dict:
+    # after - ключ строки перед страницей (курсор), last - ключ последней строки, если выборка обрезана
+    return {
+        "sort_key": sort_key,
+        "order": order,
+        "search": search,
+        "ids": [task.id for task in tasks],
+        "after": pagination.dump_values(after) if after is not None else None,
+        "last": pagination.dump_values(pagination.cursor_values(columns, tasks[-1])) if bounded and tasks else None,
+        "ordered": ordered,
+    }
+
+
+def affects(meta: dict, change) -> bool:
+    if change.task_id in meta["ids"]:
+        return True
+    columns = pagination.ordering(meta["sort_key"], meta["order"])
+    for row in (change.before, change.after):
+        if row is None or not _matches_search(meta["search"], row):
+            continue
+        values = [row[column.key] for column, _ in columns]
+        if not meta["ordered"] or None in values:
+            return True
+        key = pagination.position(columns, values)
+        if meta["after"] is not None and not pagination.position(columns, pagination.load_values(columns, meta["after"])) < key:
+            continue
+        if meta["last"] is not None and pagination.position(columns, pagination.load_values(columns, meta["last"])) < key:
+            continue
+        return True
+    return False
+
+
+def _matches_search(search, row) -> bool:
+    # Грубее полнотекстового поиска: строка, в которой есть все слова как подстроки, считается подходящей.
+    # Лишний сброс допустим, пропущенный - нет
+    if not search:
+        return True
+    text = f"{row['title']} {row['description'] or ''}".casefold()
+    return all(term.casefold() in text for term in fulltext.terms(search))
+
+
+def _backend():
+    if RESPONSE_CACHE_REDIS_URL:
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL, RESPONSE_CACHE_SIZE)
+    return LocalBackend(RESPONSE_CACHE_SIZE)
+
+
+response_cache = ResponseCache(_backend(), enabled=RESPONSE_CACHE)
+events.subscribe(response_cache.invalidate)
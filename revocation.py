@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+from datetime import timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
+from models import RevokedToken, User, utcnow
+
+# Список отзыва для AUTH_STATELESS: отозванные jti и минимальные версии токенов пользователей,
+# которые хотя бы раз выходили на всех устройствах. Хранится в памяти и перечитывается из базы
+# раз в AUTH_REVOCATION_REFRESH секунд (0 - не перечитывать), так что выход в другом процессе
+# начинает действовать здесь не позже чем через этот интервал
+AUTH_REVOCATION_REFRESH = float(os.getenv("AUTH_REVOCATION_REFRESH", "30"))
+# Первая загрузка при старте идет при любом интервале, иначе выходы, сделанные до перезапуска, забываются.
+# AUTH_REVOCATION_LOAD=0 отключает обращения к базе за списком совсем (тесты не трогают рабочую базу)
+AUTH_REVOCATION_LOAD = os.getenv("AUTH_REVOCATION_LOAD", "1") != "0"
+
+
+class RevocationList:
+    def __init__(self):
+        # jti -> exp токена (unix time); uid -> минимальная действующая версия
+        self._tokens = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is not None and jti in self._tokens:
+            return True
+        version = self._versions.get(payload.get("uid"))
+        return version is not None and payload.get("ver", 0) < version
+
+    def revoke(self, jti: str, exp: float):
+        with self._lock:
+            self._tokens[jti] = exp
+
+    def revoke_user(self, user_id: int, version: int):
+        with self._lock:
+            self._versions[user_id] = max(self._versions.get(user_id, 0), version)
+
+    def load(self, connection) -> bool:
+        # Полная перезагрузка; True - если список изменился. Истекшие jti сюда уже не попадают
+        now = utcnow()
+        rows = connection.execute(select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now))
+        tokens = {jti: expires_at.replace(tzinfo=timezone.utc).timestamp() for jti, expires_at in rows}
+        versions = dict(connection.execute(select(User.id, User.token_version).where(User.token_version > 0)).all())
+        with self._lock:
+            changed = tokens.keys() != self._tokens.keys() or versions != self._versions
+            self._tokens, self._versions = tokens, versions
+        return changed
+
+    async def refresh(self, engine) -> bool:
+        if isinstance(engine, AsyncEngine):
+            async with engine.connect() as connection:
+                return await connection.run_sync(self.load)
+        return await run_in_threadpool(self._load_from, engine)
+
+    async def run_refresh(self, engine, interval: float, on_change=None):
+        # Сначала загрузка, потом пауза: новый процесс не должен interval секунд принимать отозванные токены
+        while True:
+            try:
+                changed = await self.refresh(engine)
+            except Exception:
+                # База недоступна - остается прежний список, попробуем в следующий раз
+                changed = False
+            if changed and on_change is not None:
+                on_change()
+            await asyncio.sleep(interval)
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+            self._versions = {}
+
+    def stats(self) -> dict:
+        return {"tokens": len(self._tokens), "users": len(self._versions)}
+
+    def _load_from(self, engine) -> bool:
+        with engine.connect() as connection:
+            return self.load(connection)
+
+
+revocation_list = RevocationList()
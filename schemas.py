@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Union
+from typing import Any, Union
 
 class TaskCreate(BaseModel):
     title: str
@@ -30,4 +30,38 @@ class UserInfo(BaseModel):
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+class TaskBatchUpdateItem(TaskCreate):
+    id: int
+
+class TaskBatchCreate(BaseModel):
+    # Элементы проверяются по одному (как TaskCreate), чтобы в режиме atomic=false
+    # невалидный элемент отклонялся отдельно, а не ронял весь запрос
+    items: list[dict[str, Any]]
+    atomic: bool = True
+
+class TaskBatchUpdate(BaseModel):
+    items: list[dict[str, Any]]
+    atomic: bool = True
+
+class TaskBatchDelete(BaseModel):
+    ids: list[int]
+    atomic: bool = True
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: Union[int, None] = None
+    status: str
+    detail: Union[str, None] = None
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    items: list[BatchItemResult]
+
+class TaskStats(BaseModel):
+    total: int
+    by_status: dict[str, int]
+    by_priority: dict[str, int]
+    by_day: dict[str, int]
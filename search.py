@@ -0,0 +1,80 @@
+import re
+from sqlalchemy import event, false, inspect, or_
+from sqlalchemy.sql import column, table
+from models import Task
+
+FTS_TABLE = "tasks_fts"
+MYSQL_FULLTEXT_INDEX = "ix_tasks_fulltext"
+
+# Внешний контент: в индексе хранятся только токены, сами строки остаются в tasks.
+# Триггеры держат индекс в актуальном состоянии при любых insert/update/delete, включая массовые.
+SQLITE_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, description, content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 0', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+fts = table(FTS_TABLE, column("rowid"), column("rank"), column(FTS_TABLE))
+
+
+def install_fulltext(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        if not inspect(connection).has_table(FTS_TABLE):
+            for statement in SQLITE_FTS_DDL:
+                connection.exec_driver_sql(statement)
+    elif dialect == "mysql":
+        indexes = {index["name"] for index in inspect(connection).get_indexes("tasks")}
+        if MYSQL_FULLTEXT_INDEX not in indexes:
+            connection.exec_driver_sql(f"ALTER TABLE tasks ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} (title, description)")
+
+
+def drop_fulltext(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for trigger in ("tasks_fts_ai", "tasks_fts_ad", "tasks_fts_au"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif dialect == "mysql":
+        indexes = {index["name"] for index in inspect(connection).get_indexes("tasks")}
+        if MYSQL_FULLTEXT_INDEX in indexes:
+            connection.exec_driver_sql(f"ALTER TABLE tasks DROP INDEX {MYSQL_FULLTEXT_INDEX}")
+
+
+event.listen(Task.__table__, "after_create", lambda target, connection, **kw: install_fulltext(connection))
+event.listen(Task.__table__, "before_drop", lambda target, connection, **kw: drop_fulltext(connection))
+
+
+def terms(search: str):
+    return re.findall(r"\w+", search)
+
+
+def apply_search(query, dialect: str, search: str, prefix: bool = True, ranked: bool = False):
+    words = terms(search)
+    if not words:
+        return query.filter(false())
+    if dialect == "sqlite":
+        expression = " ".join('"' + word + '"' + ("*" if prefix else "") for word in words)
+        query = query.join(fts, fts.c.rowid == Task.id).filter(fts.c[FTS_TABLE].match(expression))
+        return query.order_by(fts.c.rank) if ranked else query
+    if dialect == "mysql":
+        # Диалект MySQL импортируется только при работе с MySQL
+        from sqlalchemy.dialects.mysql import match
+        expression = " ".join("+" + word + ("*" if prefix else "") for word in words)
+        relevance = match(Task.title, Task.description, against=expression).in_boolean_mode()
+        query = query.filter(relevance)
+        return query.order_by(relevance.desc()) if ranked else query
+    return apply_ilike(query, search)
+
+
+def apply_ilike(query, search: str):
+    return query.filter(or_(Task.title.ilike("%" + search + "%"), Task.description.ilike("%" + search + "%")))
@@ -0,0 +1,118 @@
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from pydantic import TypeAdapter, create_model
+from models import Task
+import http_cache
+import schemas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# FAST_JSON=1: GET /tasks выбирает только колонки TaskInfo кортежами и собирает JSON напрямую,
+# минуя модели Pydantic. Вывод совпадает с обычным путем байт в байт
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+TASK_FIELDS = tuple(schemas.TaskInfo.model_fields)
+TASK_COLUMNS = tuple(getattr(Task, field) for field in TASK_FIELDS)
+
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+task_list_adapter = TypeAdapter(list[schemas.TaskInfo])
+
+
+def dump_task_list(tasks) -> bytes:
+    return task_list_adapter.dump_json(task_list_adapter.validate_python(tasks, from_attributes=True))
+
+
+def dump_task_rows(rows) -> bytes:
+    # Строки - кортежи в порядке TASK_FIELDS. Даты без часового пояса, как их отдает Pydantic:
+    # 2024-01-02T03:04:05 или 2024-01-02T03:04:05.120000
+    items = [dict(zip(TASK_FIELDS, row)) for row in rows]
+    if orjson is not None:
+        return orjson.dumps(items)
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def dump_task_lines(rows) -> bytes:
+    # NDJSON для stream=true: по объекту на строку
+    if orjson is not None:
+        return b"".join(orjson.dumps(dict(zip(TASK_FIELDS, row))) + b"\n" for row in rows)
+    return "".join(json.dumps(dict(zip(TASK_FIELDS, row)), ensure_ascii=False, separators=(",", ":"), default=_default) + "\n" for row in rows).encode()
+
+
+def select_fields(fields: str) -> Optional[tuple]:
+    # fields=id,title,status -> поля в порядке TaskInfo, чтобы id,title и title,id давали один ответ и один ключ кэша.
+    # None - в списке есть неизвестное поле или он пуст
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if not requested or not requested <= set(TASK_FIELDS):
+        return None
+    return tuple(field for field in TASK_FIELDS if field in requested)
+
+
+def projection_columns(fields: tuple, ordering) -> list:
+    # Сначала запрошенные колонки, за ними колонки сортировки: по ним строится курсор и метаданные кэша
+    extra = [column for column, _ in ordering if column.key not in fields]
+    return [getattr(Task, field) for field in fields] + extra
+
+
+@lru_cache(maxsize=None)
+def projection_model(fields: tuple):
+    # Урезанная TaskInfo на каждый набор полей; наборов не больше 2^6, поэтому кэш не ограничен
+    return create_model("TaskInfo_" + "_".join(fields), **{field: (schemas.TaskInfo.model_fields[field].annotation, ...) for field in fields})
+
+
+@lru_cache(maxsize=None)
+def projection_adapter(fields: tuple) -> TypeAdapter:
+    return TypeAdapter(list[projection_model(fields)])
+
+
+def dump_projection(rows, fields: tuple) -> bytes:
+    # Строки - кортежи, первые len(fields) значений которых - запрошенные поля (лишние колонки сортировки отбрасываются)
+    items = [dict(zip(fields, row)) for row in rows]
+    if FAST_JSON and orjson is not None:
+        return orjson.dumps(items)
+    adapter = projection_adapter(fields)
+    return adapter.dump_json(adapter.validate_python(items))
+
+
+def dump_projection_lines(rows, fields: tuple) -> bytes:
+    if FAST_JSON and orjson is not None:
+        return b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+    model = projection_model(fields)
+    return b"".join(model.model_validate(dict(zip(fields, row))).model_dump_json().encode() + b"\n" for row in rows)
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    # MessagePack, если клиент просит его в Accept не ниже JSON; без библиотеки msgpack всегда JSON
+    if msgpack is None or not accept:
+        return False
+    accepted = http_cache.preferences(accept)
+    binary = max(accepted.get(media_type, 0.0) for media_type in MSGPACK_TYPES)
+    json_quality = max(accepted.get(media_type, 0.0) for media_type in ("application/json", "application/*", "*/*"))
+    return binary > 0 and binary >= json_quality
+
+
+def task_rows(tasks) -> list:
+    return [tuple(getattr(task, field) for field in TASK_FIELDS) for task in tasks]
+
+
+def dump_msgpack(rows, fields: tuple = TASK_FIELDS) -> bytes:
+    # Тот же массив объектов, что и в JSON, даты - такие же строки ISO 8601. Лишние колонки сортировки отбрасываются
+    return msgpack.packb([dict(zip(fields, row)) for row in rows], default=_default)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,191 @@
+import argparse
+import logging
+import os
+import signal
+import time
+import uvicorn
+
+# Запуск в несколько процессов (только Unix): python -m serve --workers 4 --port 8000.
+# Родитель один раз импортирует приложение (main, модели, схемы, passlib с бэкендом bcrypt, jose), сверяет схему базы
+# и форкает воркеров: они получают все это готовым и только запускают свой цикл событий на общем сокете.
+# Воркер после SERVE_MAX_REQUESTS запросов (плюс случайные до SERVE_MAX_REQUESTS_JITTER, чтобы воркеры не уходили разом)
+# мягко завершается, родитель запускает вместо него новый. SIGTERM/SIGINT: воркеры перестают принимать соединения,
+# дожидаются текущих запросов (не дольше SERVE_GRACEFUL_TIMEOUT секунд) и выполняют остановку приложения
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+# 0 - по числу ядер, доступных процессу
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))
+# 0 - воркеры не перезапускаются
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "10000"))
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "1000"))
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def default_workers() -> int:
+    # В контейнере процессу может быть доступно меньше ядер, чем есть на машине
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def preload():
+    # Все, что одинаково для воркеров, делается один раз до fork
+    import auth
+    import main
+    import migrations
+    from database import engine
+
+    # passlib и python-jose в приложении загружаются при первом обращении - здесь это делается один раз на всех
+    auth.preload()
+    if main.AUTO_MIGRATE:
+        migrations.upgrade(engine)
+    elif main.SCHEMA_CHECK:
+        migrations.check_schema(engine)
+    main.AUTO_MIGRATE = main.SCHEMA_CHECK = False
+    # Соединения родителя не должны достаться воркерам: одно соединение в нескольких процессах ломает протокол
+    engine.dispose()
+    return main.app
+
+
+def local_state_warnings() -> list:
+    # Состояние в памяти процесса: у каждого воркера свое, и с несколькими воркерами оно расходится
+    import rate_limit
+    import replicas
+    import top_n
+
+    warnings = ["Лента изменений (GET /tasks/feed, /tasks/feed/ws) видит только записи своего воркера, "
+                "номера событий у воркеров разные: since после переподключения к другому воркеру ненадежен"]
+    if replicas.DB_REPLICA_URLS:
+        warnings.append("Чтение своих записей с основной базы (DB_REPLICA_STICKY_SECONDS) работает, "
+                        "только если следующий запрос попал в тот же воркер")
+    if rate_limit.RATE_LIMIT and not rate_limit.RATE_LIMIT_REDIS_URL:
+        warnings.append("Ведра ограничения запросов в памяти воркера: клиент получает лимит на каждый воркер "
+                        "(общие ведра - RATE_LIMIT_REDIS_URL)")
+    if top_n.TOP_N_INDEX == top_n.LOCAL:
+        warnings.append("TOP_N_INDEX=local не видит записи других воркеров и отдает устаревший top_n (нужен TOP_N_INDEX=verified)")
+    return warnings
+
+
+class Supervisor:
+    # Держит workers процессов: упавший или отслуживший свое воркер заменяется новым в том же слоте
+    def __init__(self, target, workers: int, graceful_timeout: float):
+        # target(slot) выполняется в дочернем процессе и возвращается, когда воркер остановлен
+        self.target = target
+        self.count = workers
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.count):
+            self.spawn(slot)
+        while not self.stopping:
+            self.reap()
+            time.sleep(0.1)
+        self.shutdown()
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # Обработчики родителя не нужны: uvicorn ставит свои
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self.target(slot)
+            except BaseException:
+                logger.exception("Воркер %s завершился с ошибкой", slot)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (slot, time.monotonic())
+        logger.info("Запущен воркер %s (pid %s)", slot, pid)
+
+    def reap(self):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            slot, started = self.workers.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            logger.info("Воркер %s (pid %s) завершился с кодом %s, запускается новый", slot, pid, code)
+            if code != 0 and time.monotonic() - started < 1:
+                # Воркер падает сразу после старта (например, нет базы) - не перезапускать его в цикле без паузы
+                time.sleep(1)
+            self.spawn(slot)
+
+    def shutdown(self):
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        # Воркер ждет текущие запросы graceful_timeout секунд, после этого еще идет остановка приложения
+        deadline = time.monotonic() + self.graceful_timeout + 10
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in self.workers:
+            logger.warning("Воркер pid %s не остановился вовремя и будет убит", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m serve", description="Запуск приложения в нескольких процессах")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS or default_workers())
+    parser.add_argument("--max-requests", type=int, default=SERVE_MAX_REQUESTS, help="0 - не перезапускать воркеры")
+    parser.add_argument("--max-requests-jitter", type=int, default=SERVE_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=SERVE_GRACEFUL_TIMEOUT)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True,
+                        help="Импортировать приложение до fork (--no-preload: каждый воркер импортирует его сам)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--import-profile", action="store_true", help="Вывести время импорта приложения по модулям и выйти")
+    args = parser.parse_args(argv)
+
+    if args.import_profile:
+        import startup
+        print(startup.report(startup.measure()))
+        return
+
+    # Config настраивает логирование uvicorn и открывает общий для всех воркеров сокет
+    sock = uvicorn.Config("main:app", host=args.host, port=args.port, log_level=args.log_level).bind_socket()
+    app = preload() if args.preload else "main:app"
+    journal = os.getenv("INGEST_JOURNAL")
+
+    def worker(slot: int):
+        if journal:
+            # Журнал очереди записи у каждого слота свой: новый воркер слота дописывает в базу то, что не успел прежний
+            os.environ["INGEST_JOURNAL"] = f"{journal}.{slot}"
+            from ingest import ingestor
+            ingestor.journal_path = os.environ["INGEST_JOURNAL"]
+        config = uvicorn.Config(
+            app,
+            lifespan="on",
+            log_level=args.log_level,
+            limit_max_requests=args.max_requests or None,
+            limit_max_requests_jitter=args.max_requests_jitter if args.max_requests else 0,
+            timeout_graceful_shutdown=args.graceful_timeout,
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+
+    logger.info("Сервер на http://%s:%s, воркеров: %s", args.host, args.port, args.workers)
+    if args.workers > 1:
+        for warning in local_state_warnings():
+            logger.warning(warning)
+    Supervisor(worker, args.workers, args.graceful_timeout).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+# Отчет о времени импорта по модулям: python -m serve --import-profile.
+# Импорт идет в отдельном интерпретаторе с -X importtime: в текущем процессе модули уже загружены и их время не видно
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str = "main", env: dict = None) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return subtree(parse(result.stderr), module)
+
+
+def parse(text: str) -> list:
+    # [(модуль, собственное время, время с зависимостями, глубина)], время в микросекундах.
+    # -X importtime пишет модуль после всех его зависимостей
+    rows = []
+    for line in text.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return rows
+
+
+def subtree(rows: list, module: str) -> list:
+    # Только то, что загрузил import module (без site и encodings, которые грузятся при старте интерпретатора)
+    end = next(index for index, (name, _, _, depth) in enumerate(rows) if name == module and depth == 0)
+    start = max((index for index in range(end) if rows[index][3] == 0), default=-1) + 1
+    return rows[start:end + 1]
+
+
+def app_modules() -> set:
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")} | \
+        {name for name in os.listdir(ROOT) if os.path.isfile(os.path.join(ROOT, name, "__init__.py"))}
+
+
+def total(rows: list) -> int:
+    return rows[-1][2]
+
+
+def report(rows: list, top: int = 15) -> str:
+    elapsed = total(rows)
+    packages = Counter()
+    for name, own, _, _ in rows:
+        packages[name.partition(".")[0]] += own
+    local = app_modules()
+    lines = [f"import {rows[-1][0]}: {elapsed / 1000:.0f} мс", "", "Пакеты (собственное время всех модулей пакета):"]
+    lines += [f"  {package:<32}{own / 1000:>8.1f} мс {own / elapsed:>7.1%}" for package, own in packages.most_common(top)]
+    lines += ["", "Модули приложения (с зависимостями, которые они загрузили первыми):"]
+    application = sorted((row for row in rows if row[0].partition(".")[0] in local), key=lambda row: row[2], reverse=True)
+    lines += [f"  {name:<32}{cumulative / 1000:>8.1f} мс   свое {own / 1000:.1f} мс" for name, own, cumulative, _ in application]
+    lines += ["", "Самые медленные модули (собственное время):"]
+    lines += [f"  {name:<32}{own / 1000:>8.1f} мс" for name, own, _, _ in sorted(rows, key=lambda row: row[1], reverse=True)[:top]]
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+import asyncio
+import os
+from collections import Counter
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from models import Task, TaskStat
+
+# Статистика задач для GET /tasks/stats. Счетчики в task_stats меняются инкрементально в транзакциях записи (crud),
+# а сверка раз в STATS_RECONCILE_INTERVAL секунд (0 - отключена) пересчитывает их по tasks и чинит расхождения,
+# например после правок базы в обход API. Вручную: python -m stats
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))
+
+DIMENSIONS = ("status", "priority", "day")
+
+
+def buckets(row: dict):
+    yield "total", "all"
+    if row.get("status") is not None:
+        yield "status", row["status"]
+    if row.get("priority") is not None:
+        yield "priority", str(row["priority"])
+    if row.get("creation_time") is not None:
+        yield "day", row["creation_time"].date().isoformat()
+
+
+def deltas(changes) -> dict:
+    result = Counter()
+    for change in changes:
+        for row, sign in ((change.before, -1), (change.after, 1)):
+            if row is not None:
+                for key in buckets(row):
+                    result[key] += sign
+    # Обновление без смены статуса и приоритета дает нули - такие счетчики не трогаются
+    return {key: delta for key, delta in result.items() if delta}
+
+
+def apply(db: Session, changes):
+    # Вызывается до commit записи. Ключи по порядку, чтобы параллельные транзакции MySQL брали блокировки одинаково
+    for (dimension, bucket), delta in sorted(deltas(changes).items()):
+        _add(db, dimension, bucket, delta)
+
+
+def read(db: Session) -> dict:
+    result = {"total": 0, "by_status": {}, "by_priority": {}, "by_day": {}}
+    for dimension, bucket, count in db.execute(select(TaskStat.dimension, TaskStat.bucket, TaskStat.count).where(TaskStat.count != 0)):
+        if dimension == "total":
+            result["total"] = count
+        elif dimension in DIMENSIONS:
+            result["by_" + dimension][bucket] = count
+    result["by_day"] = dict(sorted(result["by_day"].items()))
+    return result
+
+
+def actual(db: Session) -> dict:
+    # Полный пересчет по tasks: GROUP BY по каждому измерению
+    counts = {("total", "all"): db.scalar(select(func.count()).select_from(Task))}
+    day = func.date(Task.creation_time)
+    queries = {
+        "status": select(Task.status, func.count()).where(Task.status.isnot(None)).group_by(Task.status),
+        "priority": select(Task.priority, func.count()).where(Task.priority.isnot(None)).group_by(Task.priority),
+        "day": select(day, func.count()).where(Task.creation_time.isnot(None)).group_by(day),
+    }
+    for dimension, query in queries.items():
+        for value, count in db.execute(query):
+            # SQLite возвращает date() строкой, MySQL - датой
+            counts[dimension, str(value)] = count
+    return counts
+
+
+def reconcile(db: Session) -> int:
+    # Возвращает число исправленных счетчиков. Строки счетчиков блокируются до пересчета (в MySQL),
+    # чтобы записи, идущие в это время, не потерялись между подсчетом и исправлением
+    stored = {(dimension, bucket): count for dimension, bucket, count in db.execute(select(TaskStat.dimension, TaskStat.bucket, TaskStat.count).with_for_update())}
+    expected = actual(db)
+    fixed = 0
+    for key in sorted(stored.keys() | expected.keys()):
+        difference = expected.get(key, 0) - stored.get(key, 0)
+        if difference:
+            _add(db, *key, difference)
+            fixed += 1
+    db.commit()
+    return fixed
+
+
+async def run_reconcile(sessions, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(_reconcile_with, sessions)
+        except Exception:
+            # Сверка не должна ронять приложение: счетчики починятся следующим проходом
+            continue
+
+
+def _reconcile_with(sessions) -> int:
+    with sessions() as db:
+        return reconcile(db)
+
+
+def _add(db: Session, dimension: str, bucket: str, delta: int):
+    statement = upsert(db.get_bind().dialect.name, dimension, bucket, delta)
+    if statement is not None:
+        db.execute(statement)
+        return
+    updated = db.execute(update(TaskStat).where(TaskStat.dimension == dimension, TaskStat.bucket == bucket).values(count=TaskStat.count + delta)).rowcount
+    if not updated:
+        db.add(TaskStat(dimension=dimension, bucket=bucket, count=delta))
+
+
+def upsert(dialect: str, dimension: str, bucket: str, delta: int):
+    # Одна команда вместо UPDATE и INSERT при rowcount=0: две транзакции MySQL, впервые увидевшие счетчик,
+    # обе вставили бы его, и вторая упала бы на дубликате ключа
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(TaskStat).values(dimension=dimension, bucket=bucket, count=delta)
+        return statement.on_duplicate_key_update(count=TaskStat.count + statement.inserted.count)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(TaskStat).values(dimension=dimension, bucket=bucket, count=delta)
+        return statement.on_conflict_do_update(index_elements=[TaskStat.dimension, TaskStat.bucket], set_={"count": TaskStat.count + statement.excluded.count})
+    return None
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    fixed = _reconcile_with(SessionLocal)
+    print(f"Исправлено счетчиков: {fixed}")
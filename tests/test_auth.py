@@ -1,7 +1,16 @@
 import pytest
+from datetime import datetime, timedelta
+from passlib.context import CryptContext
+from sqlalchemy import event
+import auth
 from fastapi import status
 from jose import jwt
-from auth import SECRET_KEY, ALGORITHM
+from auth import SECRET_KEY, ALGORITHM, token_cache, invalidate_user
+from revocation import revocation_list
+from tests.conftest import engine
+from models import User
+from schemas import UserInfo
+from token_cache import TokenCache
 
 def test_create_user(client):
     user_data = {"username": "new_user", "password": "new_password"}
@@ -46,4 +55,200 @@ def test_login_nonexistent_user(client):
     response = client.post("/login", data={"username": "non_existent_user", "password": "password123"})
 
     assert response.status_code == 401
-    assert response.json()["detail"] == "Incorrect username or password"
\ No newline at end of file
+    assert response.json()["detail"] == "Incorrect username or password"
+
+
+def test_current_user_cached_by_token(authorized_client):
+    task = {"title": "Задача", "description": None, "status": "в ожидании", "priority": 1}
+    authorized_client.post("/tasks", json=task)
+    authorized_client.post("/tasks", json=task)
+
+    assert token_cache.stats()["misses"] == 1
+    assert token_cache.stats()["hits"] == 1
+
+
+def test_invalidate_user_drops_cached_tokens(authorized_client, test_user):
+    authorized_client.post("/tasks", json={"title": "Задача"})
+    assert token_cache.stats()["size"] == 1
+
+    invalidate_user(test_user["username"])
+
+    assert token_cache.stats()["size"] == 0
+
+
+def test_token_cache_never_outlives_exp():
+    now = [1000.0]
+    cache = TokenCache(maxsize=10, ttl=300, clock=lambda: now[0], wall_clock=lambda: now[0])
+    user = UserInfo(id=1, username="user")
+
+    cache.put("token", user, exp=now[0] + 5)
+    assert cache.get("token") == user
+    now[0] += 6
+
+    assert cache.get("token") is None
+    cache.put("expired", user, exp=now[0] - 1)
+    assert cache.get("expired") is None
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2, ttl=300)
+    exp = 2 ** 40
+    cache.put("a", UserInfo(id=1, username="a"), exp)
+    cache.put("b", UserInfo(id=2, username="b"), exp)
+    cache.get("a")
+    cache.put("c", UserInfo(id=3, username="c"), exp)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_login_rehashes_when_rounds_change(client, test_user, test_db, monkeypatch):
+    monkeypatch.setattr(auth, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    response = client.post("/login", data={"username": test_user["username"], "password": test_user["password"]})
+
+    assert response.status_code == 200
+    user = test_db.query(User).filter(User.username == test_user["username"]).first()
+    test_db.refresh(user)
+    assert user.hashed_password.startswith("$2b$05$")
+    assert client.post("/login", data={"username": test_user["username"], "password": test_user["password"]}).status_code == 200
+
+
+def test_login_rejected_when_hashing_pool_full(client, test_user, monkeypatch):
+    monkeypatch.setattr(auth.hashing_pool, "in_flight", auth.hashing_pool.capacity)
+
+    response = client.post("/login", data={"username": test_user["username"], "password": test_user["password"]})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+def login(client, user):
+    return client.post("/login", data={"username": user["username"], "password": user["password"]}).json()["access_token"]
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_token_carries_user_id_version_and_jti(client, test_user):
+    payload = jwt.decode(login(client, test_user), SECRET_KEY, algorithms=[ALGORITHM])
+
+    assert payload["sub"] == test_user["username"]
+    assert isinstance(payload["uid"], int)
+    assert payload["ver"] == 0
+    assert len(payload["jti"]) == 32
+
+
+def test_logout_revokes_only_current_token(client, test_user):
+    first, second = login(client, test_user), login(client, test_user)
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(first)).status_code == 200
+
+    assert client.post("/logout", headers=bearer(first)).status_code == 204
+
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(first)).status_code == 401
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(second)).status_code == 200
+
+
+def test_logout_everywhere_revokes_all_tokens(client, test_user):
+    first, second = login(client, test_user), login(client, test_user)
+
+    assert client.post("/logout?everywhere=true", headers=bearer(first)).status_code == 204
+
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(second)).status_code == 401
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(login(client, test_user))).status_code == 200
+
+
+def test_revocations_survive_reload_from_database(client, test_user):
+    first, second = login(client, test_user), login(client, test_user)
+    client.post("/logout", headers=bearer(first))
+    third = login(client, test_user)
+    client.post("/logout?everywhere=true", headers=bearer(third))
+
+    # Как в свежем процессе: список пуст, пока не загружен из базы
+    revocation_list.clear()
+    token_cache.clear()
+    with engine.connect() as connection:
+        assert revocation_list.load(connection)
+
+    assert revocation_list.stats() == {"tokens": 1, "users": 1}
+    payload = jwt.decode(second, SECRET_KEY, algorithms=[ALGORITHM])
+    assert revocation_list.is_revoked(payload)
+
+
+def test_revocations_loaded_at_startup_without_refresh(client, test_user, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    import tests.conftest as conftest
+
+    token = login(client, test_user)
+    client.post("/logout", headers=bearer(token))
+    revocation_list.clear()
+    token_cache.clear()
+
+    # Перезапуск процесса с AUTH_REVOCATION_REFRESH=0: список все равно загружается до первого запроса
+    monkeypatch.setattr(main, "AUTH_REVOCATION_LOAD", True)
+    monkeypatch.setattr(main, "AUTH_REVOCATION_REFRESH", 0)
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "async_engine", getattr(conftest, "async_engine", None))
+    with TestClient(main.app) as restarted:
+        assert restarted.post("/tasks", json={"title": "Задача"}, headers=bearer(token)).status_code == 401
+
+
+def test_refresh_loads_before_first_sleep(client, test_user):
+    import asyncio
+
+    token = login(client, test_user)
+    client.post("/logout", headers=bearer(token))
+    revocation_list.clear()
+    changes = []
+
+    async def first_pass():
+        # Интервал в час: все, что успело загрузиться за секунду, загружено до первой паузы
+        refresher = asyncio.create_task(revocation_list.run_refresh(engine, 3600, lambda: changes.append(True)))
+        for _ in range(100):
+            if changes:
+                break
+            await asyncio.sleep(0.01)
+        refresher.cancel()
+
+    asyncio.run(first_pass())
+
+    assert changes == [True]
+    assert revocation_list.is_revoked(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+
+
+def test_stateless_mode_skips_users_lookup(client, test_user, app_engine, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+    token = login(client, test_user)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/tasks", json={"title": "Задача"}, headers=bearer(token))
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert statements
+    assert not any("FROM users" in statement for statement in statements)
+
+
+def test_stateless_mode_honours_revocation_list(client, test_user, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+    token = login(client, test_user)
+
+    client.post("/logout", headers=bearer(token))
+
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(token)).status_code == 401
+
+
+def test_stateless_mode_checks_legacy_tokens_in_database(client, test_user, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+    legacy = jwt.encode({"sub": "deleted_user", "exp": datetime.utcnow() + timedelta(minutes=5)}, SECRET_KEY, algorithm=ALGORITHM)
+
+    assert client.post("/tasks", json={"title": "Задача"}, headers=bearer(legacy)).status_code == 401
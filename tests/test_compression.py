@@ -0,0 +1,132 @@
+import asyncio
+import json
+import zlib
+import msgpack
+import pytest
+import compression
+from compression import CompressionMiddleware, negotiate
+from response_cache import response_cache
+
+
+@pytest.fixture
+def tasks(authorized_client):
+    items = [{"title": f"Задача {i}", "description": "Длинное описание задачи. " * 10, "priority": i % 5 + 1} for i in range(20)]
+    authorized_client.post("/tasks/batch", json={"items": items})
+    return authorized_client.get("/tasks").json()
+
+
+def test_large_list_is_gzipped(authorized_client, tasks):
+    plain = authorized_client.get("/tasks", headers={"Accept-Encoding": "identity"})
+    response = authorized_client.get("/tasks", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(plain.content) / 4
+    assert response.json() == plain.json()
+    assert "Accept-Encoding" in response.headers["vary"]
+    # Сжатое представление получает слабый тег, с ним тоже приходит 304
+    assert response.headers["etag"] == "W/" + plain.headers["etag"]
+    assert authorized_client.get("/tasks", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli не установлен")
+def test_brotli_preferred_over_gzip(authorized_client, tasks):
+    response = authorized_client.get("/tasks", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert len(response.json()) == len(tasks)
+
+
+def test_small_response_is_not_compressed(authorized_client, tasks):
+    response = authorized_client.get(f"/tasks/{tasks[0]['id']}", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json()["id"] == tasks[0]["id"]
+
+
+def test_stream_is_compressed_without_length(authorized_client, tasks):
+    response = authorized_client.get("/tasks", params={"stream": True}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert [json.loads(line)["id"] for line in response.text.split("\n") if line] == [task["id"] for task in tasks]
+
+
+def test_negotiate():
+    assert negotiate("gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("gzip, br", ("br", "gzip")) == "br"
+    assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("gzip;q=0", ("br", "gzip")) is None
+    assert negotiate("*", ("br", "gzip")) == "br"
+    assert negotiate("*, br;q=0", ("br", "gzip")) == "gzip"
+    assert negotiate("identity", ("br", "gzip")) is None
+    assert negotiate(None, ("br", "gzip")) is None
+
+
+def test_chunks_are_flushed_as_they_arrive():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for line in (b'{"id":1}\n', b'{"id":2}\n'):
+            await send({"type": "http.response.body", "body": line, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024, available=("gzip",))(scope, None, send))
+
+    start, *bodies = sent
+    assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+    decompressor = zlib.decompressobj(31)
+    # Каждый кусок разжимается сразу, до конца ответа
+    assert [decompressor.decompress(body["body"]) for body in bodies] == [b'{"id":1}\n', b'{"id":2}\n', b""]
+    assert [body["more_body"] for body in bodies] == [True, True, False]
+    assert decompressor.eof
+
+
+def test_event_stream_is_not_compressed():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n", "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=0, available=("gzip",))(scope, None, send))
+
+    assert b"content-encoding" not in dict(sent[0]["headers"])
+    assert sent[1]["body"] == b"data: 1\n\n"
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_msgpack_matches_json(authorized_client, tasks, monkeypatch, cached):
+    monkeypatch.setattr(response_cache, "enabled", cached)
+    expected = authorized_client.get("/tasks", params={"sort_by": "title"})
+    for _ in range(2):
+        response = authorized_client.get("/tasks", params={"sort_by": "title"}, headers={"Accept": "application/msgpack"})
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == expected.json()
+    assert "Accept" in response.headers["vary"]
+    assert response.headers["etag"] != expected.headers["etag"]
+    # JSON из кэша не подменяется MessagePack и наоборот
+    assert authorized_client.get("/tasks", params={"sort_by": "title"}).json() == expected.json()
+
+
+def test_msgpack_with_fields(authorized_client, tasks):
+    response = authorized_client.get("/tasks", params={"fields": "id,title", "limit": 3}, headers={"Accept": "application/x-msgpack"})
+
+    assert msgpack.unpackb(response.content) == [{"id": task["id"], "title": task["title"]} for task in tasks[:3]]
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_json_preferred_by_quality(authorized_client, tasks):
+    response = authorized_client.get("/tasks", headers={"Accept": "application/json, application/msgpack;q=0.5"})
+
+    assert response.headers["content-type"] == "application/json"
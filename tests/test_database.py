@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+import database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pragmas(engine) -> dict:
+    with engine.connect() as connection:
+        return {name: connection.execute(text(f"PRAGMA {name}")).scalar() for name in ("journal_mode", "synchronous", "busy_timeout")}
+
+
+def test_sqlite_pragmas(tmp_path):
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+
+    # synchronous: 1 - NORMAL
+    assert pragmas(engine) == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": database.SQLITE_BUSY_TIMEOUT}
+    engine.dispose()
+
+
+def test_sqlite_pragmas_follow_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SQLITE_WAL", False)
+    monkeypatch.setattr(database, "SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setattr(database, "SQLITE_BUSY_TIMEOUT", 1234)
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+
+    assert pragmas(engine) == {"journal_mode": "delete", "synchronous": 2, "busy_timeout": 1234}
+    engine.dispose()
+
+
+def test_memory_sqlite_has_no_pool_options():
+    assert database.engine_options("sqlite://") == {"connect_args": {"check_same_thread": False, "timeout": database.SQLITE_BUSY_TIMEOUT / 1000}}
+    assert "pool_size" not in database.engine_options("sqlite:///file.db", pooled=False)
+
+
+def test_pool_options_from_environment(tmp_path):
+    # Настройки читаются при импорте database, поэтому проверяются в отдельном интерпретаторе
+    env = {**os.environ, "DB_POOL_SIZE": "3", "DB_MAX_OVERFLOW": "7", "DB_POOL_TIMEOUT": "2.5", "DB_POOL_RECYCLE": "600",
+           "DB_POOL_PRE_PING": "0", "SQLITE_BUSY_TIMEOUT": "750"}
+    code = f"""import json, database
+engine = database.create_db_engine({f"sqlite:///{tmp_path / 'pool.db'}"!r})
+pool = engine.pool
+print(json.dumps([type(pool).__name__, pool.size(), pool._max_overflow, pool._timeout, pool._recycle, pool._pre_ping,
+                  database.engine_options(engine.url)["connect_args"]["timeout"]]))"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+    assert json.loads(result.stdout) == [QueuePool.__name__, 3, 7, 2.5, 600, False, 0.75]
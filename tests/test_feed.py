@@ -0,0 +1,141 @@
+import asyncio
+from events import TaskChange
+from feed import ChangeFeed, EVICTED, RESET, change_feed, events_stream, sse
+from rate_limit import route_class
+
+
+def task(task_id, status="в ожидании", priority=1):
+    return {"id": task_id, "title": f"Задача {task_id}", "description": None, "status": status, "priority": priority}
+
+
+def test_websocket_receives_changes(authorized_client):
+    with authorized_client.websocket_connect("/tasks/feed/ws") as websocket:
+        created = authorized_client.post("/tasks", json={"title": "Задача", "status": "в ожидании", "priority": 1}).json()
+        authorized_client.put(f"/tasks/{created['id']}", json={"title": "Другая", "description": None, "status": "в работе", "priority": 2})
+        authorized_client.delete(f"/tasks/{created['id']}")
+
+        messages = [websocket.receive_json() for _ in range(3)]
+
+    assert [message["kind"] for message in messages] == ["created", "updated", "deleted"]
+    assert [message["seq"] for message in messages] == [1, 2, 3]
+    assert {message["task_id"] for message in messages} == {created["id"]}
+    assert messages[1]["task"]["title"] == "Другая"
+    assert messages[2]["task"]["title"] == "Другая"
+
+
+def test_websocket_resumes_from_seq(authorized_client):
+    for title in ("Первая", "Вторая", "Третья"):
+        authorized_client.post("/tasks", json={"title": title})
+
+    with authorized_client.websocket_connect("/tasks/feed/ws?since=1") as websocket:
+        missed = [websocket.receive_json() for _ in range(2)]
+
+    assert [message["seq"] for message in missed] == [2, 3]
+    assert [message["task"]["title"] for message in missed] == ["Вторая", "Третья"]
+
+
+def test_websocket_filters_by_status(authorized_client):
+    with authorized_client.websocket_connect("/tasks/feed/ws?status=в работе") as websocket:
+        authorized_client.post("/tasks", json={"title": "Не подходит", "status": "в ожидании"})
+        authorized_client.post("/tasks", json={"title": "Подходит", "status": "в работе"})
+
+        message = websocket.receive_json()
+
+    assert message["task"]["title"] == "Подходит"
+    assert message["seq"] == 2
+
+
+def test_reset_when_resume_point_is_lost():
+    async def scenario():
+        feed = ChangeFeed(buffer_size=2)
+        feed.publish([TaskChange("created", task_id, None, task(task_id)) for task_id in (1, 2, 3)])
+        # Событие 1 уже вытеснено из буфера
+        lost = [event async for event in _take(events_stream(feed, 0, None, None, 1), 1)]
+        # Номер из будущего - сервер перезапущен
+        restarted = [event async for event in _take(events_stream(feed, 10, None, None, 1), 1)]
+        resumed = [event async for event in _take(events_stream(feed, 1, None, None, 1), 2)]
+        return lost, restarted, resumed, feed.subscribers
+
+    lost, restarted, resumed, subscribers = asyncio.run(scenario())
+
+    assert lost == [{"seq": 3, "kind": RESET}]
+    assert restarted == [{"seq": 3, "kind": RESET}]
+    assert [event["seq"] for event in resumed] == [2, 3]
+    assert subscribers == 0
+
+
+def test_filter_sees_task_leaving_selection():
+    async def scenario():
+        feed = ChangeFeed()
+        stream = events_stream(feed, None, "в работе", None, 1)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        feed.publish([TaskChange("updated", 1, task(1, "в работе"), task(1, "выполнено"))])
+        event = await first
+        await stream.aclose()
+        return event
+
+    event = asyncio.run(scenario())
+
+    assert event["kind"] == "updated"
+    assert event["after"]["status"] == "выполнено"
+
+
+def test_slow_subscriber_is_evicted():
+    async def scenario():
+        feed = ChangeFeed(queue_size=2)
+        stream = events_stream(feed, None, None, None, 1)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        # Подписчик ничего не читает, пока публикуются пять событий
+        feed.publish([TaskChange("created", task_id, None, task(task_id)) for task_id in range(1, 6)])
+        await asyncio.sleep(0)
+        received = [await first] + [event async for event in stream]
+        return received, feed.subscribers, feed.evictions
+
+    received, subscribers, evictions = asyncio.run(scenario())
+
+    assert [event["kind"] for event in received] == [EVICTED]
+    assert subscribers == 0
+    assert evictions == 1
+
+
+def test_publish_survives_closed_subscriber_loop():
+    feed = ChangeFeed()
+
+    async def subscribe():
+        feed.subscribe()
+
+    asyncio.run(subscribe())
+    feed.publish([TaskChange("created", 1, None, task(1))])
+
+    assert feed.subscribers == 0
+    assert feed.seq == 1
+
+
+def test_sse_format():
+    event = {"seq": 7, "kind": "created", "task_id": 3, "before": None, "after": task(3)}
+
+    assert sse(event) == 'id: 7\nevent: created\ndata: {"seq":7,"kind":"created","task_id":3,"task":{"id":3,"title":"Задача 3","description":null,"status":"в ожидании","priority":1}}\n\n'
+    # У evicted нет id, чтобы Last-Event-ID остался на последнем доставленном событии
+    assert sse({"seq": None, "kind": EVICTED}) == 'event: evicted\ndata: {"seq":null,"kind":"evicted"}\n\n'
+
+
+def test_feed_has_own_rate_limit_class():
+    assert route_class("GET", "/tasks/feed", b"") == "feed"
+
+
+def test_writes_without_subscribers_are_buffered(authorized_client):
+    authorized_client.post("/tasks", json={"title": "Задача"})
+
+    assert change_feed.seq == 1
+    assert change_feed.subscribers == 0
+
+
+async def _take(stream, count):
+    async for event in stream:
+        yield event
+        count -= 1
+        if not count:
+            break
+    await stream.aclose()
@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.fixture
+def task(authorized_client):
+    return authorized_client.post("/tasks", json={"title": "Задача", "description": "Описание"}).json()
+
+
+def test_task_not_modified(authorized_client, task):
+    response = authorized_client.get(f"/tasks/{task['id']}")
+    etag = response.headers["ETag"]
+
+    cached = authorized_client.get(f"/tasks/{task['id']}", headers={"If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+
+def test_task_etag_changes_on_update(authorized_client, task):
+    etag = authorized_client.get(f"/tasks/{task['id']}").headers["ETag"]
+
+    authorized_client.put(f"/tasks/{task['id']}", json={"title": "Новое название"})
+    response = authorized_client.get(f"/tasks/{task['id']}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["title"] == "Новое название"
+
+
+def test_task_etag_differs_for_reused_id(authorized_client, task):
+    etag = authorized_client.get(f"/tasks/{task['id']}").headers["ETag"]
+
+    authorized_client.delete(f"/tasks/{task['id']}")
+    # SQLite без AUTOINCREMENT выдает новой задаче id удаленной, у обеих version=1
+    created = authorized_client.post("/tasks", json={"title": "Другая задача"}).json()
+    response = authorized_client.get(f"/tasks/{created['id']}", headers={"If-None-Match": etag})
+
+    assert created["id"] == task["id"]
+    assert response.status_code == 200
+    assert response.json()["title"] == "Другая задача"
+
+
+def test_batch_update_bumps_task_version(authorized_client, task):
+    etag = authorized_client.get(f"/tasks/{task['id']}").headers["ETag"]
+
+    authorized_client.patch("/tasks/batch", json={"items": [{"id": task["id"], "title": "Пакетно"}]})
+
+    assert authorized_client.get(f"/tasks/{task['id']}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_task_if_modified_since(authorized_client, task):
+    last_modified = authorized_client.get(f"/tasks/{task['id']}").headers["Last-Modified"]
+
+    response = authorized_client.get(f"/tasks/{task['id']}", headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("write", ["create", "update", "delete"])
+def test_list_etag_changes_on_write(authorized_client, task, write):
+    etag = authorized_client.get("/tasks").headers["ETag"]
+    assert authorized_client.get("/tasks", headers={"If-None-Match": etag}).status_code == 304
+
+    if write == "create":
+        authorized_client.post("/tasks", json={"title": "Еще одна"})
+    elif write == "update":
+        authorized_client.put(f"/tasks/{task['id']}", json={"title": "Новое название"})
+    else:
+        authorized_client.delete(f"/tasks/{task['id']}")
+
+    response = authorized_client.get("/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_list_etag_depends_on_query(authorized_client, task):
+    plain = authorized_client.get("/tasks").headers["ETag"]
+    sorted_etag = authorized_client.get("/tasks?sort_by=title").headers["ETag"]
+
+    assert plain != sorted_etag
+    assert authorized_client.get("/tasks?sort_by=title", headers={"If-None-Match": plain}).status_code == 200
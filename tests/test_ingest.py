@@ -0,0 +1,171 @@
+import json
+import time
+import pytest
+import crud
+import main
+from ingest import Ingestor
+from models import Task
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def ingestor(monkeypatch, tmp_path):
+    # Пакет пишется по трем задачам или по drain: таймер заведомо дольше теста
+    ingestor = Ingestor(TestingSessionLocal, batch_size=3, flush_ms=60000, max_queue=5, id_block=10, journal_path=str(tmp_path / "journal.jsonl"), enabled=True)
+    monkeypatch.setattr(main, "ingestor", ingestor)
+    return ingestor
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_create_is_accepted_and_written_on_drain(authorized_client, ingestor):
+    response = authorized_client.post("/tasks", json={"title": "В очереди", "priority": 2})
+
+    assert response.status_code == 202
+    task = response.json()
+    assert task["title"] == "В очереди"
+    assert task["creation_time"]
+    assert authorized_client.get(f"/tasks/{task['id']}").status_code == 404
+    assert "ingest_queue_depth 1" in authorized_client.get("/metrics").text
+
+    authorized_client.portal.call(ingestor.drain)
+
+    written = authorized_client.get(f"/tasks/{task['id']}")
+    assert written.status_code == 200
+    assert written.json() == task
+    assert authorized_client.get("/tasks/stats").json()["total"] == 1
+    assert ingestor.depth == 0
+
+
+def test_full_batch_is_group_committed(authorized_client, ingestor):
+    ids = [authorized_client.post("/tasks", json={"title": f"Задача {i}"}).json()["id"] for i in range(3)]
+
+    wait_for(lambda: ingestor.flushed == 3)
+
+    assert ingestor.flushes == 1
+    assert [task["id"] for task in authorized_client.get("/tasks").json()] == ids
+
+
+def test_queue_limit_returns_503(authorized_client, ingestor):
+    ingestor.batch_size = 100
+    for i in range(5):
+        assert authorized_client.post("/tasks", json={"title": f"Задача {i}"}).status_code == 202
+
+    response = authorized_client.post("/tasks", json={"title": "Лишняя"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    authorized_client.portal.call(ingestor.drain)
+    assert len(authorized_client.get("/tasks").json()) == 5
+
+
+def test_journal_is_replayed_once(client, ingestor, test_db):
+    test_db.add(Task(id=7, title="Уже записана", status="в ожидании", priority=1))
+    test_db.commit()
+    with open(ingestor.journal_path, "w", encoding="utf-8") as journal:
+        for task_id in (7, 8):
+            journal.write(json.dumps({"id": task_id, "title": f"Из журнала {task_id}", "description": None, "status": "в ожидании", "priority": 1, "creation_time": "2024-01-02T03:04:05"}, ensure_ascii=False) + "\n")
+        journal.write('{"id": 9, "title": "Обор')
+
+    assert ingestor.replay() == 1
+    assert ingestor.replay() == 0
+    assert client.get("/tasks/8").json()["title"] == "Из журнала 8"
+    assert client.get("/tasks/7").json()["title"] == "Уже записана"
+    with open(ingestor.journal_path, encoding="utf-8") as journal:
+        assert journal.read() == ""
+
+
+def test_replay_skips_rows_the_database_rejects(client, ingestor, test_db):
+    with open(ingestor.journal_path, "w", encoding="utf-8") as journal:
+        for task_id, priority in ((7, 1), (8, 10 ** 20), (9, 2)):
+            journal.write(json.dumps({"id": task_id, "title": f"Из журнала {task_id}", "description": None, "status": "в ожидании", "priority": priority, "creation_time": "2024-01-02T03:04:05"}, ensure_ascii=False) + "\n")
+
+    assert ingestor.replay() == 2
+    assert ingestor.dropped == 1
+    assert client.get("/tasks/7").status_code == client.get("/tasks/9").status_code == 200
+    assert client.get("/tasks/8").status_code == 404
+    with open(ingestor.journal_path, encoding="utf-8") as journal:
+        assert journal.read() == ""
+
+
+def test_flushed_tasks_are_not_replayed(authorized_client, ingestor):
+    ids = [authorized_client.post("/tasks", json={"title": f"Задача {i}"}).json()["id"] for i in range(4)]
+    wait_for(lambda: ingestor.flushed == 3)
+    assert authorized_client.delete(f"/tasks/{ids[0]}").status_code == 200
+
+    # Процесс упал, четвертая задача осталась только в журнале
+    restarted = Ingestor(TestingSessionLocal, journal_path=ingestor.journal_path)
+    assert restarted.replay() == 1
+    assert authorized_client.get(f"/tasks/{ids[0]}").status_code == 404
+    assert authorized_client.get(f"/tasks/{ids[3]}").status_code == 200
+
+
+def test_journal_is_compacted(authorized_client, ingestor):
+    ingestor.journal_max_bytes = 1
+    ids = [authorized_client.post("/tasks", json={"title": f"Задача {i}"}).json()["id"] for i in range(4)]
+    wait_for(lambda: ingestor.flushed == 3)
+
+    with open(ingestor.journal_path, encoding="utf-8") as journal:
+        assert [json.loads(line)["id"] for line in journal] == [ids[3]]
+    authorized_client.post("/tasks", json={"title": "После сжатия"})
+    with open(ingestor.journal_path, encoding="utf-8") as journal:
+        assert len(journal.readlines()) == 2
+    authorized_client.portal.call(ingestor.drain)
+
+
+def test_rejected_rows_are_dropped_from_batch(authorized_client, ingestor, monkeypatch):
+    from sqlalchemy.exc import IntegrityError
+    create_tasks = crud.create_tasks
+
+    def strict_create_tasks(db, rows):
+        if any(row["title"] == "Сломанная" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("constraint failed"))
+        return create_tasks(db, rows)
+
+    monkeypatch.setattr(crud, "create_tasks", strict_create_tasks)
+    ids = [authorized_client.post("/tasks", json={"title": title}).json()["id"] for title in ("Первая", "Сломанная", "Третья")]
+    wait_for(lambda: ingestor.dropped + ingestor.flushed == 3)
+
+    assert (ingestor.flushed, ingestor.dropped) == (2, 1)
+    assert [task["id"] for task in authorized_client.get("/tasks").json()] == [ids[0], ids[2]]
+    assert 'ingest_tasks_total{result="dropped"} 1' in authorized_client.get("/metrics").text
+
+
+def test_unavailable_database_is_retried_until_stop_timeout(authorized_client, ingestor, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    def unavailable(db, rows):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    ingestor.retry_delay = 0.01
+    ingestor.stop_timeout = 0.2
+    monkeypatch.setattr(crud, "create_tasks", unavailable)
+    authorized_client.post("/tasks", json={"title": "Подождет"})
+    authorized_client.portal.call(ingestor.stop)
+
+    assert ingestor.errors > 1
+    assert ingestor.depth == 1
+    with open(ingestor.journal_path, encoding="utf-8") as journal:
+        assert json.loads(journal.readline())["title"] == "Подождет"
+
+
+def test_id_blocks_start_above_existing_tasks(authorized_client, ingestor, test_db):
+    direct = authorized_client.post("/tasks/batch", json={"items": [{"title": "А"}, {"title": "Б"}]}).json()
+    first = crud.allocate_ids(test_db, 10)
+
+    assert first > max(item["id"] for item in direct["items"])
+    assert crud.allocate_ids(test_db, 10) == first + 10
+
+
+def test_batch_create_uses_id_blocks(authorized_client, ingestor):
+    queued = authorized_client.post("/tasks", json={"title": "В очереди"}).json()
+    direct = authorized_client.post("/tasks/batch", json={"items": [{"title": "Сразу"}]}).json()
+
+    assert direct["items"][0]["id"] == queued["id"] + 1
+    authorized_client.portal.call(ingestor.drain)
+    assert len(authorized_client.get("/tasks").json()) == 2
@@ -0,0 +1,110 @@
+import re
+import pytest
+from sqlalchemy import create_engine, text
+import metrics
+
+
+@pytest.fixture
+def registry(app_engine):
+    # Движок тестов создается в conftest, поэтому подписываем его на события так же, как main подписывает рабочий
+    metrics.instrument_engine(app_engine)
+    metrics.registry.clear()
+    return metrics
+
+
+def test_request_latency_by_route_and_status(authorized_client, registry):
+    task_id = authorized_client.post("/tasks", json={"title": "Задача"}).json()["id"]
+    authorized_client.get(f"/tasks/{task_id}")
+    authorized_client.get("/tasks/999999")
+
+    assert registry.REQUEST_SECONDS.count(("POST", "/tasks", 200)) == 1
+    assert registry.REQUEST_SECONDS.count(("GET", "/tasks/{task_id}", 200)) == 1
+    assert registry.REQUEST_SECONDS.count(("GET", "/tasks/{task_id}", 404)) == 1
+
+
+def test_sql_queries_counted_per_request(authorized_client, registry):
+    authorized_client.get("/tasks")
+
+    labels = ("GET", "/tasks")
+    assert registry.REQUEST_SQL_QUERIES.count(labels) == 1
+    # версия коллекции и сама выборка
+    assert registry.REQUEST_SQL_QUERIES.sum(labels) == 2
+    assert registry.SQL_QUERIES.value(("SELECT",)) >= 2
+
+
+def test_bcrypt_timed_on_login(client, test_user, registry):
+    client.post("/login", data={"username": test_user["username"], "password": test_user["password"]})
+
+    assert registry.BCRYPT_SECONDS.count(("verify",)) == 1
+    assert registry.BCRYPT_SECONDS.sum(("verify",)) > 0
+
+
+def test_pool_checkout_and_queries_timed(registry):
+    engine = create_engine("sqlite://")
+    registry.instrument_engine(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert registry.POOL_WAIT_SECONDS.count() == 1
+    assert registry.SQL_SECONDS.count(("SELECT",)) == 1
+
+
+def test_pool_stays_timed_after_dispose(registry):
+    engine = create_engine("sqlite://")
+    registry.instrument_engine(engine)
+    # Так делает serve.preload перед fork
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert engine.pool._do_get._timed
+    assert registry.POOL_WAIT_SECONDS.count() == 1
+
+
+def test_failed_queries_do_not_leak_start_times(registry):
+    from sqlalchemy.exc import OperationalError
+
+    engine = create_engine("sqlite://")
+    registry.instrument_engine(engine)
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing"))
+        connection.execute(text("SELECT 1"))
+
+        assert connection.info["query_started"] == []
+    assert registry.SQL_SECONDS.count(("SELECT",)) == 1
+
+
+def test_metrics_endpoint_prometheus_format(authorized_client, registry):
+    authorized_client.get("/tasks")
+    response = authorized_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/tasks",status="200",le="+Inf"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/tasks",status="200"} 1' in body
+    assert "# TYPE db_pool_checkout_wait_seconds histogram" in body
+    assert 'token_cache_requests_total{result="hit"}' in body
+    assert "response_cache_size 0" in body
+    assert re.search(r"^hashing_pool_rejected_total \d+$", body, re.M)
+
+
+def test_unknown_path_grouped(client, registry):
+    client.get("/no/such/path")
+
+    assert registry.REQUEST_SECONDS.count(("GET", "other", 404)) == 1
+
+
+def test_basic_mode_skips_sql(authorized_client, registry, monkeypatch):
+    middleware = authorized_client.app.middleware_stack
+    while not isinstance(middleware, metrics.MetricsMiddleware):
+        middleware = middleware.app
+    monkeypatch.setattr(middleware, "mode", "basic")
+
+    authorized_client.get("/tasks")
+
+    assert registry.REQUEST_SECONDS.count(("GET", "/tasks", 200)) == 1
+    assert registry.REQUEST_SQL_QUERIES.count(("GET", "/tasks")) == 0
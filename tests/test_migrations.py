@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+import migrations
+import stats
+from models import Base
+
+
+@pytest.fixture
+def migration_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def silent(message):
+    pass
+
+
+def schema_snapshot(engine):
+    inspector = inspect(engine)
+    return {
+        table: ({column["name"] for column in inspector.get_columns(table)}, {index["name"] for index in inspector.get_indexes(table)})
+        for table in Base.metadata.tables
+    }
+
+
+def test_upgrade_matches_models(migration_engine, tmp_path):
+    migrations.upgrade(migration_engine, log=silent)
+
+    models_engine = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    Base.metadata.create_all(models_engine)
+    assert schema_snapshot(migration_engine) == schema_snapshot(models_engine)
+    migrations.check_schema(migration_engine)
+
+
+def test_check_schema_rejects_outdated_database(migration_engine):
+    with pytest.raises(migrations.SchemaOutdated):
+        migrations.check_schema(migration_engine)
+
+    migrations.upgrade(migration_engine, "0001", log=silent)
+    with pytest.raises(migrations.SchemaOutdated):
+        migrations.check_schema(migration_engine)
+
+
+def test_downgrade_steps_and_base(migration_engine):
+    migrations.upgrade(migration_engine, log=silent)
+
+    migrations.downgrade(migration_engine, "-1", log=silent)
+    with migration_engine.connect() as connection:
+        assert migrations.current(connection) == migrations.load_migrations()[-2].revision
+
+    migrations.downgrade(migration_engine, "base", log=silent)
+    assert set(inspect(migration_engine).get_table_names()) == {migrations.VERSION_TABLE}
+    with migration_engine.connect() as connection:
+        assert migrations.current(connection) is None
+
+
+def test_upgrade_legacy_database_keeps_rows_searchable(migration_engine):
+    with migration_engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE tasks (id INTEGER NOT NULL, title VARCHAR, description VARCHAR, status VARCHAR, creation_time DATETIME, priority INTEGER, PRIMARY KEY (id))")
+        connection.exec_driver_sql("CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR, hashed_password VARCHAR, PRIMARY KEY (id))")
+        connection.exec_driver_sql("INSERT INTO tasks (title, description, status, priority) VALUES ('Старая задача', 'из прошлой версии', 'в ожидании', 1)")
+
+    migrations.upgrade(migration_engine, log=silent)
+
+    with migration_engine.connect() as connection:
+        assert connection.execute(text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'старая'")).scalars().all() == [1]
+        assert migrations.current(connection) == migrations.head()
+
+
+def test_upgrade_fills_task_stats(migration_engine):
+    migrations.upgrade(migration_engine, "0005", log=silent)
+    with migration_engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO tasks (title, status, priority, creation_time) VALUES ('А', 'в работе', 1, '2024-01-02 10:00:00'), ('Б', 'в работе', 2, '2024-01-02 11:00:00'), ('В', 'выполнено', 2, '2024-01-03 09:00:00')")
+
+    migrations.upgrade(migration_engine, log=silent)
+
+    with Session(migration_engine) as db:
+        assert stats.read(db) == {"total": 3, "by_status": {"в работе": 2, "выполнено": 1}, "by_priority": {"1": 1, "2": 2}, "by_day": {"2024-01-02": 2, "2024-01-03": 1}}
+        assert stats.reconcile(db) == 0
+
+
+def test_upgrade_normalizes_legacy_datetimes(migration_engine):
+    migrations.upgrade(migration_engine, "0007", log=silent)
+    with migration_engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO tasks (title, creation_time, updated_at) VALUES ('А', '2025-05-21 20:19:25', '2025-05-21 20:19:25'), ('Б', '2025-05-21 20:19:25.123456', NULL)")
+
+    migrations.upgrade(migration_engine, log=silent)
+
+    with migration_engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT creation_time, updated_at FROM tasks ORDER BY id").all() == [
+            ("2025-05-21 20:19:25.000000", "2025-05-21 20:19:25.000000"), ("2025-05-21 20:19:25.123456", None)]
@@ -0,0 +1,127 @@
+import base64
+import json
+import pytest
+
+
+@pytest.fixture
+def many_tasks(authorized_client):
+    created = []
+    for i in range(7):
+        task = {"title": f"Задача {i % 3}", "description": "Описание", "status": ["в ожидании", "в работе", "завершено"][i % 3], "priority": i % 2 + 1}
+        created.append(authorized_client.post("/tasks", json=task).json())
+    return created
+
+
+def collect_pages(client, url, limit):
+    path, _, query = url.partition("?")
+    base_params = dict(pair.split("=") for pair in query.split("&") if pair)
+    seen = []
+    cursor = None
+    while True:
+        params = {**base_params, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(path, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        seen.extend(page)
+        # Зациклившийся курсор отдает одни и те же строки бесконечно
+        assert len(seen) <= 1000
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("query", ["/tasks", "/tasks?sort_by=title&order=asc", "/tasks?sort_by=title&order=desc", "/tasks?sort_by=status&order=desc", "/tasks?sort_by=creation_time&order=asc", "/tasks?top_n=5"])
+def test_pages_match_full_listing(authorized_client, many_tasks, query):
+    full = authorized_client.get(query).json()
+    paged = collect_pages(authorized_client, query, limit=2)
+
+    assert [task["id"] for task in paged] == [task["id"] for task in full]
+
+
+@pytest.mark.parametrize("query", ["/tasks?sort_by=creation_time&order=asc", "/tasks?sort_by=creation_time&order=desc", "/tasks?top_n=10"])
+def test_pages_over_legacy_creation_time(authorized_client, test_db, query):
+    import importlib
+    from tests.conftest import engine
+
+    if engine.dialect.name != "sqlite":
+        pytest.skip("формат хранения дат важен только для SQLite")
+    # Строки старой версии: CURRENT_TIMESTAMP без дробной части, по две задачи в одну секунду
+    with engine.begin() as connection:
+        for i in range(6):
+            stamp = f"2025-05-21 20:19:{20 + i // 2:02d}"
+            connection.exec_driver_sql("INSERT INTO tasks (title, status, priority, version, creation_time, updated_at) VALUES (?, 'в ожидании', 1, 1, ?, ?)",
+                                       (f"Старая {i}", stamp, stamp))
+        importlib.import_module("migrations.versions.0008_datetime_format").upgrade(connection)
+
+    full = authorized_client.get(query).json()
+    paged = collect_pages(authorized_client, query, limit=1)
+
+    assert len(full) == 6
+    assert [task["id"] for task in paged] == [task["id"] for task in full]
+
+
+def test_top_n_pagination_respects_n(authorized_client, many_tasks):
+    paged = collect_pages(authorized_client, "/tasks?top_n=3", limit=2)
+
+    assert len(paged) == 3
+    assert [task["priority"] for task in paged] == [1, 1, 1]
+
+
+def test_cursor_from_other_sort_rejected(authorized_client, many_tasks):
+    response = authorized_client.get("/tasks?sort_by=title&limit=2")
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = authorized_client.get("/tasks", params={"sort_by": "status", "limit": 2, "cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Курсор не соответствует параметрам сортировки"
+
+
+def test_invalid_cursor(authorized_client):
+    response = authorized_client.get("/tasks?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Недопустимый курсор"
+
+
+@pytest.mark.parametrize("payload", [
+    '{"k": null, "o": "asc", "v": [1], "n": 1e999}',
+    '{"k": null, "o": "asc", "v": [1e999]}',
+    '{"k": null, "o": "asc", "v": [-1e999]}',
+    '{"k": null, "o": "asc", "v": [100000000000000000000000]}',
+    '{"k": null, "o": "asc", "v": [1], "n": 100000000000000000000000}',
+])
+def test_cursor_out_of_range(authorized_client, payload):
+    cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    response = authorized_client.get("/tasks", params={"limit": 2, "cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Недопустимый курсор"
+
+
+def test_invalid_limit(authorized_client):
+    response = authorized_client.get("/tasks?limit=0")
+
+    assert response.status_code == 400
+    assert "limit должен быть от 1 до" in response.json()["detail"]
+
+
+def test_stream_ndjson(authorized_client, many_tasks):
+    full = authorized_client.get("/tasks?sort_by=title&order=desc").json()
+
+    response = authorized_client.get("/tasks?sort_by=title&order=desc&stream=true")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    assert streamed == full
+
+
+def test_stream_top_n_limited(authorized_client, many_tasks):
+    response = authorized_client.get("/tasks?top_n=2&stream=true")
+
+    assert len(response.text.splitlines()) == 2
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import event
+from tests.conftest import engine
+
+# EXPLAIN QUERY PLAN есть только в SQLite
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="планы запросов проверяются на SQLite")
+
+EXPECTED_INDEX = {
+    "title": "ix_tasks_title",
+    "status": "ix_tasks_status_id",
+    "creation_time": "ix_tasks_creation_time_id",
+    "top_n": "ix_tasks_top_n",
+}
+
+COMBINATIONS = [({"sort_by": sort_by, "order": order}, sort_by) for sort_by in ("title", "status", "creation_time") for order in ("asc", "desc")]
+COMBINATIONS.append(({"top_n": 5}, "top_n"))
+
+
+@pytest.fixture
+def task_selects(app_engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "FROM tasks" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(app_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(app_engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def seeded(authorized_client):
+    items = [{"title": f"Задача {i}", "status": ["в ожидании", "в работе"][i % 2], "priority": i % 3 + 1} for i in range(6)]
+    authorized_client.post("/tasks/batch", json={"items": items})
+
+
+def query_plan(test_db, statement, parameters):
+    rows = test_db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(plan, index_name):
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert any(f"USING INDEX {index_name}" in step or f"USING COVERING INDEX {index_name}" in step for step in plan), plan
+
+
+@pytest.mark.parametrize("params,sort_key", COMBINATIONS)
+def test_full_listing_uses_index(authorized_client, seeded, task_selects, test_db, params, sort_key):
+    task_selects.clear()
+    authorized_client.get("/tasks", params=params)
+
+    assert_uses_index(query_plan(test_db, *task_selects[-1]), EXPECTED_INDEX[sort_key])
+
+
+@pytest.mark.parametrize("params,sort_key", COMBINATIONS)
+def test_keyset_page_uses_index(authorized_client, seeded, task_selects, test_db, params, sort_key):
+    cursor = authorized_client.get("/tasks", params={**params, "limit": 2}).headers["X-Next-Cursor"]
+    task_selects.clear()
+    authorized_client.get("/tasks", params={**params, "limit": 2, "cursor": cursor})
+
+    plan = query_plan(test_db, *task_selects[-1])
+    assert_uses_index(plan, EXPECTED_INDEX[sort_key])
+    assert any(step.startswith("SEARCH") for step in plan), plan
+
+
+def test_default_order_walks_primary_key(authorized_client, seeded, task_selects, test_db):
+    cursor = authorized_client.get("/tasks", params={"limit": 2}).headers["X-Next-Cursor"]
+    task_selects.clear()
+    authorized_client.get("/tasks", params={"limit": 2, "cursor": cursor})
+
+    plan = query_plan(test_db, *task_selects[-1])
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert any("INTEGER PRIMARY KEY" in step for step in plan), plan
@@ -0,0 +1,95 @@
+import pytest
+from rate_limit import MemoryBackend, Policy, rate_limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "policies", {"auth": Policy(2, 60), "search": Policy(2, 60), "write": Policy(3, 60), "read": Policy(5, 60)})
+    return rate_limiter
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    policy = Policy(2, 10)
+
+    assert [backend.take("k", policy).allowed for _ in range(3)] == [True, True, False]
+    denied = backend.take("k", policy)
+    assert denied.retry_after == pytest.approx(5)
+
+    clock.now += 5
+    assert backend.take("k", policy).allowed
+    assert not backend.take("k", policy).allowed
+
+
+def test_login_limited_by_ip(client, test_user, limiter):
+    form = {"username": test_user["username"], "password": "wrong"}
+    statuses = [client.post("/login", data=form).status_code for _ in range(3)]
+
+    assert statuses == [401, 401, 429]
+    response = client.post("/login", data=form)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.headers["RateLimit-Remaining"] == "0"
+    assert response.json()["detail"] == "Слишком много запросов, попробуйте позже"
+
+
+def test_rate_limit_headers_on_success(client, limiter):
+    response = client.get("/tasks")
+
+    assert response.status_code == 200
+    assert response.headers["RateLimit-Limit"] == "5"
+    assert response.headers["RateLimit-Remaining"] == "4"
+    assert response.headers["RateLimit-Policy"] == "5;w=60"
+    assert "Retry-After" not in response.headers
+
+
+def test_authenticated_user_has_own_budget(authorized_client, limiter):
+    for _ in range(3):
+        assert authorized_client.post("/tasks", json={"title": "Задача"}).status_code == 200
+    assert authorized_client.post("/tasks", json={"title": "Задача"}).status_code == 429
+
+    # Тот же IP без токена - другой клиент
+    assert authorized_client.get("/tasks", headers={"Authorization": ""}).status_code == 200
+    assert authorized_client.delete("/tasks/1", headers={"Authorization": ""}).status_code == 401
+
+
+def test_forged_token_falls_back_to_ip(client, limiter):
+    for i in range(5):
+        client.get("/tasks", headers={"Authorization": f"Bearer forged{i}"})
+
+    assert client.get("/tasks", headers={"Authorization": "Bearer forged-again"}).status_code == 429
+
+
+def test_search_has_separate_budget(client, limiter):
+    for _ in range(2):
+        client.get("/tasks", params={"search": "отчет"})
+
+    assert client.get("/tasks", params={"search": "отчет"}).status_code == 429
+    assert client.get("/tasks").status_code == 200
+
+
+def test_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "concurrency", 2)
+
+    assert rate_limiter.acquire("user:a")
+    assert rate_limiter.acquire("user:a")
+    assert not rate_limiter.acquire("user:a")
+    assert rate_limiter.acquire("user:b")
+    rate_limiter.release("user:a")
+    assert rate_limiter.acquire("user:a")
+
+
+def test_disabled_limiter_adds_nothing(client):
+    response = client.get("/tasks")
+
+    assert "RateLimit-Limit" not in response.headers
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from sqlalchemy.pool import NullPool
+from database import Base, DB_ASYNC, async_url, create_async_db_engine, create_db_engine
+from models import Task
+from replicas import ReplicaSet, replica_set
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def sqlite_replica(path, title):
+    # Отдельный файл SQLite вместо настоящей реплики; в нем одна задача, по которой видно, откуда пришло чтение
+    url = f"sqlite:///{path}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(Task.__table__.insert().values(title=title, status="в ожидании", priority=1, version=1))
+    if DB_ASYNC:
+        engine.dispose()
+        return create_async_db_engine(async_url(url), poolclass=NullPool)
+    return engine
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def local_set(tmp_path, clock):
+    replicas = ReplicaSet(sticky_seconds=5, clock=clock)
+    replicas.add("a", create_db_engine(f"sqlite:///{tmp_path / 'a.db'}"))
+    replicas.add("b", create_db_engine(f"sqlite:///{tmp_path / 'b.db'}"))
+    return replicas
+
+
+@pytest.fixture
+def app_replicas(tmp_path):
+    replica_set.clear()
+    replica_set.add("replica0", sqlite_replica(tmp_path / "r0.db", "С реплики 0"))
+    replica_set.add("replica1", sqlite_replica(tmp_path / "r1.db", "С реплики 1"))
+    yield replica_set
+    replica_set.clear()
+
+
+def test_round_robin(local_set):
+    assert [local_set.route().name for _ in range(4)] == ["a", "b", "a", "b"]
+
+
+def test_unhealthy_replica_skipped(local_set, tmp_path):
+    local_set.add("broken", create_db_engine(f"sqlite:///{tmp_path / 'missing' / 'c.db'}"))
+
+    asyncio.run(local_set.check())
+
+    assert [replica.healthy for replica in local_set.replicas] == [True, True, False]
+    assert {local_set.route().name for _ in range(6)} == {"a", "b"}
+
+
+def test_all_replicas_down_reads_primary(local_set):
+    for replica in local_set.replicas:
+        replica.healthy = False
+
+    assert local_set.route() is None
+
+
+def test_sticky_window_after_write(local_set, clock):
+    local_set.note_write("alice")
+
+    assert local_set.route("alice") is None
+    assert local_set.route("bob") is not None
+    assert local_set.recently_written()
+
+    clock.now += 6
+    assert local_set.route("alice") is not None
+    assert not local_set.recently_written()
+
+
+def test_reads_go_to_replicas(client, app_replicas):
+    titles = [client.get("/tasks").json()[0]["title"] for _ in range(2)]
+
+    assert sorted(titles) == ["С реплики 0", "С реплики 1"]
+
+
+def test_read_your_writes(authorized_client, app_replicas):
+    task = authorized_client.post("/tasks", json={"title": "Моя задача"}).json()
+
+    assert [t["title"] for t in authorized_client.get("/tasks").json()] == ["Моя задача"]
+    assert authorized_client.get(f"/tasks/{task['id']}").status_code == 200
+
+    anonymous = authorized_client.get("/tasks", headers={"Authorization": ""}).json()
+    assert anonymous[0]["title"].startswith("С реплики")
+
+
+def test_writes_go_to_primary(authorized_client, app_replicas, test_db):
+    authorized_client.post("/tasks", json={"title": "В основную базу"})
+
+    assert test_db.query(Task).filter(Task.title == "В основную базу").count() == 1
@@ -0,0 +1,127 @@
+import pytest
+from response_cache import response_cache
+
+
+@pytest.fixture
+def cache():
+    response_cache.enabled = True
+    yield response_cache
+    response_cache.enabled = False
+
+
+@pytest.fixture
+def tasks(authorized_client):
+    items = [
+        {"title": "Отчет по проекту", "priority": 1},
+        {"title": "Купить молоко", "priority": 2},
+        {"title": "Позвонить клиенту", "priority": 3},
+    ]
+    return [authorized_client.post("/tasks", json=item).json() for item in items]
+
+
+def test_repeated_query_served_from_cache(authorized_client, tasks, cache):
+    first = authorized_client.get("/tasks", params={"sort_by": "title"})
+    second = authorized_client.get("/tasks", params={"sort_by": "title"})
+
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cached_body_matches_uncached(authorized_client, tasks, cache):
+    cached = authorized_client.get("/tasks", params={"top_n": 2}).content
+    cache.enabled = False
+
+    assert authorized_client.get("/tasks", params={"top_n": 2}).content == cached
+
+
+def test_equivalent_params_share_entry(authorized_client, tasks, cache):
+    authorized_client.get("/tasks")
+    authorized_client.get("/tasks", params={"order": "desc"})
+
+    assert cache.stats()["hits"] == 1
+
+
+def test_cached_page_keeps_cursor(authorized_client, tasks, cache):
+    cursor = authorized_client.get("/tasks", params={"limit": 2}).headers["X-Next-Cursor"]
+
+    assert authorized_client.get("/tasks", params={"limit": 2}).headers["X-Next-Cursor"] == cursor
+
+
+def test_update_invalidates_entry_with_task(authorized_client, tasks, cache):
+    authorized_client.get("/tasks")
+
+    authorized_client.put(f"/tasks/{tasks[0]['id']}", json={"title": "Отчет сдан"})
+    response = authorized_client.get("/tasks")
+
+    assert response.json()[0]["title"] == "Отчет сдан"
+    assert cache.stats()["hits"] == 0
+
+
+def test_unrelated_search_survives_write(authorized_client, tasks, cache):
+    authorized_client.get("/tasks", params={"search": "молоко"})
+    authorized_client.get("/tasks", params={"search": "отчет"})
+
+    authorized_client.post("/tasks", json={"title": "Черновик отчета"})
+
+    assert len(authorized_client.get("/tasks", params={"search": "молоко"}).json()) == 1
+    assert len(authorized_client.get("/tasks", params={"search": "отчет"}).json()) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_top_n_ignores_rows_below_cutoff(authorized_client, tasks, cache):
+    authorized_client.get("/tasks", params={"top_n": 2})
+
+    authorized_client.post("/tasks", json={"title": "Потом", "priority": 5})
+    authorized_client.get("/tasks", params={"top_n": 2})
+    authorized_client.post("/tasks", json={"title": "Срочно", "priority": 1})
+    response = authorized_client.get("/tasks", params={"top_n": 2})
+
+    assert [task["title"] for task in response.json()] == ["Срочно", "Отчет по проекту"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_delete_and_batch_writes_invalidate(authorized_client, tasks, cache):
+    authorized_client.get("/tasks")
+    authorized_client.delete(f"/tasks/{tasks[1]['id']}")
+    assert len(authorized_client.get("/tasks").json()) == 2
+
+    authorized_client.post("/tasks/batch", json={"items": [{"title": "Из пакета"}]})
+    assert len(authorized_client.get("/tasks").json()) == 3
+    assert cache.stats()["hits"] == 0
+
+
+def test_lru_eviction(authorized_client, tasks, cache, monkeypatch):
+    monkeypatch.setattr(cache.backend, "maxsize", 2)
+
+    for sort_by in ("title", "status", "creation_time"):
+        authorized_client.get("/tasks", params={"sort_by": sort_by})
+    authorized_client.get("/tasks", params={"sort_by": "title"})
+
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["size"] == 2
+    assert stats["hits"] == 0
+
+
+def test_write_bypassing_cache_is_detected(authorized_client, tasks, cache):
+    from sqlalchemy import update
+    import crud
+    from models import Task
+    from tests.conftest import TestingSessionLocal
+
+    authorized_client.get("/tasks")
+    # Так пишет другой процесс или ручная правка: данные и версия меняются, но invalidate этого процесса не вызывается
+    with TestingSessionLocal() as db:
+        db.execute(update(Task).where(Task.id == tasks[0]["id"]).values(title="Правка мимо кэша"))
+        crud.bump_collection_version(db)
+        db.commit()
+    response = authorized_client.get("/tasks")
+
+    assert response.json()[0]["title"] == "Правка мимо кэша"
+    assert cache.stats()["hits"] == 0
+
+    authorized_client.get("/tasks")
+    assert cache.stats()["hits"] == 1
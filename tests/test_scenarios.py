@@ -87,7 +87,7 @@ def test_multiple_tasks_management(client):
     assert search_response.status_code == 200
     
     search_results = search_response.json()
-    assert len(search_results) == 1
+    assert len(search_results) == 2
     
     for task_id in task_ids:
         task_data = client.get(f"/tasks/{task_id}", headers=headers).json()
@@ -0,0 +1,90 @@
+import json
+import pytest
+from sqlalchemy import event, select
+import serialization
+
+
+TASKS = [
+    {"title": "Отчет \"квартал\" \\ итог", "description": "Строка\nс переносом", "priority": 2},
+    {"title": "Купить молоко", "status": "в работе", "priority": 1},
+    {"title": "Позвонить клиенту", "description": " \u0001", "priority": 3},
+]
+QUERIES = [{}, {"sort_by": "title", "order": "desc"}, {"top_n": 2}, {"search": "отчет"}, {"limit": 2}, {"sort_by": "creation_time", "stream": True}]
+
+
+@pytest.fixture
+def tasks(authorized_client):
+    return [authorized_client.post("/tasks", json=task).json() for task in TASKS]
+
+
+@pytest.mark.parametrize("params", QUERIES)
+def test_fast_path_matches_models(authorized_client, tasks, monkeypatch, params):
+    expected = authorized_client.get("/tasks", params=params)
+    monkeypatch.setattr(serialization, "FAST_JSON", True)
+    fast = authorized_client.get("/tasks", params=params)
+
+    assert fast.content == expected.content
+    assert fast.headers["content-type"] == expected.headers["content-type"]
+    assert fast.headers.get("X-Next-Cursor") == expected.headers.get("X-Next-Cursor")
+
+
+def test_stdlib_fallback_matches_orjson(authorized_client, tasks, test_db, monkeypatch):
+    rows = test_db.execute(select(*serialization.TASK_COLUMNS)).all()
+    expected = serialization.dump_task_rows(rows)
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert serialization.dump_task_rows(rows) == expected
+
+
+@pytest.mark.parametrize("params", QUERIES)
+@pytest.mark.parametrize("fast", [False, True])
+def test_fields_project_full_response(authorized_client, tasks, monkeypatch, params, fast):
+    monkeypatch.setattr(serialization, "FAST_JSON", fast)
+    full = authorized_client.get("/tasks", params=params)
+    projected = authorized_client.get("/tasks", params={**params, "fields": "title,id"})
+
+    assert projected.status_code == 200
+    assert projected.headers.get("X-Next-Cursor") == full.headers.get("X-Next-Cursor")
+    if params.get("stream"):
+        lines = [json.loads(line) for line in projected.text.split("\n") if line]
+        expected = [{"id": task["id"], "title": task["title"]} for task in (json.loads(line) for line in full.text.split("\n") if line)]
+        assert lines == expected
+    else:
+        assert projected.json() == [{"id": task["id"], "title": task["title"]} for task in full.json()]
+
+
+def test_fields_pages_follow_cursor(authorized_client, tasks):
+    first = authorized_client.get("/tasks", params={"sort_by": "title", "limit": 2, "fields": "status"})
+    second = authorized_client.get("/tasks", params={"sort_by": "title", "limit": 2, "fields": "status", "cursor": first.headers["X-Next-Cursor"]})
+
+    assert first.json() == [{"status": "в работе"}, {"status": "в ожидании"}]
+    assert second.json() == [{"status": "в ожидании"}]
+
+
+def test_fields_select_only_requested_columns(authorized_client, tasks, app_engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        authorized_client.get("/tasks", params={"fields": "id,title"})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+    selects = [statement for statement in statements if "FROM tasks" in statement]
+    assert selects and all("description" not in statement for statement in selects)
+
+
+@pytest.mark.parametrize("fields", ["", "id,secret", "hashed_password", ","])
+def test_fields_rejects_unknown(authorized_client, fields):
+    response = authorized_client.get("/tasks", params={"fields": fields})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Недопустимые поля")
+
+
+def test_projection_models_are_cached():
+    assert serialization.select_fields("title, id,title") == ("id", "title")
+    assert serialization.projection_adapter(("id", "title")) is serialization.projection_adapter(("id", "title"))
@@ -0,0 +1,113 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from serve import Supervisor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="python -m serve работает только там, где есть fork")
+
+
+def test_health_endpoints(client):
+    live = client.get("/health/live")
+    ready = client.get("/health/ready")
+
+    assert live.status_code == ready.status_code == 200
+    assert live.json() == ready.json() == {"status": "ok", "pid": os.getpid()}
+
+
+def test_not_ready_without_database(client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    import crud
+
+    def ping(db):
+        raise OperationalError("SELECT 1", {}, Exception("нет соединения"))
+
+    monkeypatch.setattr(crud, "ping", ping)
+
+    assert client.get("/health/ready").status_code == 503
+    assert client.get("/health/live").status_code == 200
+
+
+def test_local_state_warnings(monkeypatch):
+    import rate_limit
+    import replicas
+    import top_n
+    from serve import local_state_warnings
+
+    monkeypatch.setattr(replicas, "DB_REPLICA_URLS", [])
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_REDIS_URL", "redis://localhost")
+    monkeypatch.setattr(top_n, "TOP_N_INDEX", top_n.VERIFIED)
+    assert len(local_state_warnings()) == 1
+
+    monkeypatch.setattr(replicas, "DB_REPLICA_URLS", ["sqlite:///replica.db"])
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT", True)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_REDIS_URL", None)
+    monkeypatch.setattr(top_n, "TOP_N_INDEX", top_n.LOCAL)
+    warnings = local_state_warnings()
+    assert len(warnings) == 4
+    assert any("RATE_LIMIT_REDIS_URL" in warning for warning in warnings)
+    assert any("TOP_N_INDEX=local" in warning for warning in warnings)
+
+
+def test_preload_keeps_pool_metrics(monkeypatch):
+    import main
+    from database import engine
+    from serve import preload
+
+    # Рабочую базу не трогаем: без миграции и проверки схемы preload только загружает зависимости и сбрасывает пул
+    monkeypatch.setattr(main, "AUTO_MIGRATE", False)
+    monkeypatch.setattr(main, "SCHEMA_CHECK", False)
+    preload()
+
+    assert engine.pool._do_get._timed
+
+
+def test_supervisor_replaces_exited_worker():
+    supervisor = Supervisor(lambda slot: None, workers=1, graceful_timeout=1)
+    supervisor.spawn(0)
+    first = next(iter(supervisor.workers))
+    deadline = time.monotonic() + 5
+    while first in supervisor.workers and time.monotonic() < deadline:
+        supervisor.reap()
+        time.sleep(0.01)
+
+    assert len(supervisor.workers) == 1
+    assert first not in supervisor.workers
+    assert [slot for slot, _ in supervisor.workers.values()] == [0]
+
+    supervisor.stopping = True
+    supervisor.shutdown()
+    assert supervisor.workers == {}
+
+
+def test_workers_are_recycled_and_stop_gracefully(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'serve.db'}", "AUTO_MIGRATE": "1"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "serve", "--port", str(port), "--workers", "1", "--max-requests", "2", "--max-requests-jitter", "0", "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        pids = set()
+        deadline = time.monotonic() + 20
+        # Новое соединение на каждый запрос: воркер, отслуживший два запроса, заменяется новым
+        while len(pids) < 2 and time.monotonic() < deadline:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/health/ready", headers={"Connection": "close"}, timeout=1)
+                pids.add(response.json()["pid"])
+            except httpx.TransportError:
+                time.sleep(0.05)
+        assert len(pids) == 2
+    finally:
+        process.send_signal(signal.SIGTERM)
+        code = process.wait(timeout=15)
+
+    assert code == 0
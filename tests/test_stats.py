@@ -0,0 +1,66 @@
+from sqlalchemy import update
+from models import Task, TaskStat
+import stats
+
+
+def test_stats_empty(client):
+    response = client.get("/tasks/stats")
+
+    assert response.status_code == 200
+    assert response.json() == {"total": 0, "by_status": {}, "by_priority": {}, "by_day": {}}
+
+
+def test_stats_follow_single_writes(authorized_client):
+    first = authorized_client.post("/tasks", json={"title": "Первая", "status": "в ожидании", "priority": 1}).json()
+    second = authorized_client.post("/tasks", json={"title": "Вторая", "status": "в ожидании", "priority": 2}).json()
+    authorized_client.put(f"/tasks/{first['id']}", json={"title": "Первая", "description": None, "status": "выполнено", "priority": 2})
+    authorized_client.delete(f"/tasks/{second['id']}")
+
+    data = authorized_client.get("/tasks/stats").json()
+
+    assert data["total"] == 1
+    assert data["by_status"] == {"выполнено": 1}
+    assert data["by_priority"] == {"2": 1}
+    assert data["by_day"] == {first["creation_time"][:10]: 1}
+
+
+def test_stats_follow_batch_writes(authorized_client):
+    created = authorized_client.post("/tasks/batch", json={"items": [{"title": "А", "priority": 1}, {"title": "Б", "priority": 1}, {"title": "В", "priority": 3}]}).json()
+    ids = [item["id"] for item in created["items"]]
+    authorized_client.patch("/tasks/batch", json={"items": [{"id": ids[0], "title": "А", "status": "в работе", "priority": 3}]})
+    authorized_client.request("DELETE", "/tasks/batch", json={"ids": [ids[1]]})
+
+    data = authorized_client.get("/tasks/stats").json()
+
+    assert data["total"] == 2
+    assert data["by_status"] == {"в работе": 1, "в ожидании": 1}
+    assert data["by_priority"] == {"3": 2}
+    assert sum(data["by_day"].values()) == 2
+
+
+def test_reconcile_repairs_drift(authorized_client, test_db):
+    authorized_client.post("/tasks", json={"title": "Через API", "priority": 1})
+    # Запись в обход crud и испорченный счетчик
+    test_db.add(Task(title="В обход API", status="в работе", priority=5))
+    test_db.execute(update(TaskStat).where(TaskStat.dimension == "priority", TaskStat.bucket == "1").values(count=7))
+    test_db.commit()
+
+    assert stats.reconcile(test_db) == 5
+    assert stats.read(test_db) == authorized_client.get("/tasks/stats").json()
+    data = authorized_client.get("/tasks/stats").json()
+    assert data["total"] == 2
+    assert data["by_status"] == {"в ожидании": 1, "в работе": 1}
+    assert data["by_priority"] == {"1": 1, "5": 1}
+    assert stats.reconcile(test_db) == 0
+
+
+def test_counters_are_upserted(test_db):
+    from sqlalchemy.dialects import mysql
+
+    stats._add(test_db, "status", "в работе", 2)
+    stats._add(test_db, "status", "в работе", -1)
+    test_db.commit()
+
+    assert test_db.get(TaskStat, ("status", "в работе")).count == 1
+    statement = str(stats.upsert("mysql", "status", "в работе", 1).compile(dialect=mysql.dialect()))
+    assert "ON DUPLICATE KEY UPDATE count = (task_stats.count + VALUES(count))" in statement
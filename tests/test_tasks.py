@@ -242,7 +242,7 @@ def test_search_tasks(authorized_client):
     response = authorized_client.get("/tasks?search=проект")
     assert response.status_code == 200
     tasks = response.json()
-    assert len(tasks) == 2
+    assert len(tasks) == 3
     response = authorized_client.get("/tasks?search=клиент")
     assert response.status_code == 200
     tasks = response.json()
@@ -268,3 +268,157 @@ def test_combined_filter(authorized_client):
     assert len(tasks) == 3
     statuses = [task["status"] for task in tasks]
     assert statuses == ["в ожидании", "в работе", "завершено"]
+
+
+def test_search_without_prefix(authorized_client):
+    authorized_client.post("/tasks", json={"title": "Встреча с клиентом", "description": "Обсудить проект", "status": "в ожидании", "priority": 1})
+    authorized_client.post("/tasks", json={"title": "Клиент", "description": None, "status": "в ожидании", "priority": 1})
+
+    response = authorized_client.get("/tasks?search=клиент&prefix=false")
+
+    assert [task["title"] for task in response.json()] == ["Клиент"]
+
+
+def test_search_ranked_by_relevance(authorized_client):
+    authorized_client.post("/tasks", json={"title": "Отчет", "description": "Собрать данные по дизайну", "status": "в ожидании", "priority": 1})
+    authorized_client.post("/tasks", json={"title": "Дизайн", "description": "Дизайн главной страницы, дизайн макетов", "status": "в ожидании", "priority": 1})
+
+    response = authorized_client.get("/tasks?search=дизайн&prefix=false")
+
+    assert [task["title"] for task in response.json()] == ["Дизайн"]
+    response = authorized_client.get("/tasks?search=дизайн")
+    assert [task["title"] for task in response.json()] == ["Дизайн", "Отчет"]
+
+
+def test_search_index_follows_updates_and_deletes(authorized_client):
+    created = authorized_client.post("/tasks", json={"title": "Старое название", "description": None, "status": "в ожидании", "priority": 1}).json()
+
+    authorized_client.put(f"/tasks/{created['id']}", json={"title": "Новое название", "description": None, "status": "в ожидании", "priority": 1})
+    assert authorized_client.get("/tasks?search=старое").json() == []
+    assert len(authorized_client.get("/tasks?search=новое").json()) == 1
+
+    authorized_client.delete(f"/tasks/{created['id']}")
+    assert authorized_client.get("/tasks?search=новое").json() == []
+
+
+def test_search_without_words(authorized_client, task_data):
+    authorized_client.post("/tasks", json=task_data)
+
+    response = authorized_client.get("/tasks?search=%21%21")
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_batch_create(authorized_client):
+    items = [{"title": f"Пакетная задача {i}", "priority": i} for i in range(1, 4)]
+
+    response = authorized_client.post("/tasks/batch", json={"items": items})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 3
+    assert [item["status"] for item in body["items"]] == ["created"] * 3
+    ids = [item["id"] for item in body["items"]]
+    assert [authorized_client.get(f"/tasks/{task_id}").json()["title"] for task_id in ids] == [item["title"] for item in items]
+
+
+def test_batch_create_atomic_rejects_whole_batch(authorized_client):
+    items = [{"title": "Хорошая задача"}, {"description": "Без заголовка"}]
+
+    response = authorized_client.post("/tasks/batch", json={"items": items})
+
+    assert response.status_code == 400
+    assert [item["status"] for item in response.json()["items"]] == ["skipped", "invalid"]
+    assert authorized_client.get("/tasks").json() == []
+
+
+def test_batch_create_partial(authorized_client):
+    items = [{"title": "Хорошая задача"}, {"priority": "не число"}]
+
+    response = authorized_client.post("/tasks/batch", json={"items": items, "atomic": False})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert body["items"][1]["status"] == "invalid"
+    assert len(authorized_client.get("/tasks").json()) == 1
+
+
+def test_batch_update_and_delete(authorized_client):
+    ids = [item["id"] for item in authorized_client.post("/tasks/batch", json={"items": [{"title": "A"}, {"title": "B"}]}).json()["items"]]
+
+    response = authorized_client.patch("/tasks/batch", json={"items": [{"id": task_id, "title": "Обновлено", "status": "завершено"} for task_id in ids]})
+    assert response.status_code == 200
+    assert {task["status"] for task in authorized_client.get("/tasks").json()} == {"завершено"}
+
+    response = authorized_client.request("DELETE", "/tasks/batch", json={"ids": ids + [999999], "atomic": False})
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["items"]] == ["deleted", "deleted", "not_found"]
+    assert authorized_client.get("/tasks").json() == []
+
+
+def test_batch_update_atomic_missing_task(authorized_client):
+    created = authorized_client.post("/tasks", json={"title": "A"}).json()
+
+    response = authorized_client.patch("/tasks/batch", json={"items": [{"id": created["id"], "title": "B"}, {"id": 999999, "title": "C"}]})
+
+    assert response.status_code == 400
+    assert [item["status"] for item in response.json()["items"]] == ["skipped", "not_found"]
+    assert authorized_client.get(f"/tasks/{created['id']}").json()["title"] == "A"
+
+
+def test_batch_update_keeps_missing_fields(authorized_client):
+    first = authorized_client.post("/tasks", json={"title": "A", "description": "Описание", "status": "в работе", "priority": 3}).json()
+    second = authorized_client.post("/tasks", json={"title": "B", "priority": 2}).json()
+
+    items = [{"id": first["id"], "title": "A2"}, {"id": second["id"], "title": "B2", "priority": 5}]
+    assert authorized_client.patch("/tasks/batch", json={"items": items}).status_code == 200
+
+    updated = {task["id"]: task for task in authorized_client.get("/tasks").json()}
+    assert (updated[first["id"]]["title"], updated[first["id"]]["description"], updated[first["id"]]["status"], updated[first["id"]]["priority"]) == ("A2", "Описание", "в работе", 3)
+    assert (updated[second["id"]]["title"], updated[second["id"]]["priority"]) == ("B2", 5)
+    assert authorized_client.get("/tasks/stats").json()["by_priority"] == {"3": 1, "5": 1}
+
+
+def test_batch_update_rejects_duplicate_ids(authorized_client):
+    created = authorized_client.post("/tasks", json={"title": "A"}).json()
+    items = [{"id": created["id"], "title": "B", "status": "в работе"}, {"id": created["id"], "title": "C", "status": "завершено"}]
+
+    response = authorized_client.patch("/tasks/batch", json={"items": items})
+    assert response.status_code == 400
+    assert [item["status"] for item in response.json()["items"]] == ["skipped", "invalid"]
+
+    response = authorized_client.patch("/tasks/batch", json={"items": items, "atomic": False})
+    assert [item["status"] for item in response.json()["items"]] == ["updated", "invalid"]
+    assert authorized_client.get(f"/tasks/{created['id']}").json()["title"] == "B"
+    assert authorized_client.get("/tasks/stats").json()["by_status"] == {"в работе": 1}
+
+
+def test_batch_delete_rejects_duplicate_ids(authorized_client):
+    created = authorized_client.post("/tasks", json={"title": "A"}).json()
+
+    response = authorized_client.request("DELETE", "/tasks/batch", json={"ids": [created["id"], created["id"]]})
+    assert response.status_code == 400
+    assert [item["status"] for item in response.json()["items"]] == ["skipped", "invalid"]
+
+    response = authorized_client.request("DELETE", "/tasks/batch", json={"ids": [created["id"], created["id"]], "atomic": False})
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert body["items"][1]["detail"] == "id уже есть в пакете (элемент 0)"
+    assert authorized_client.get("/tasks").json() == []
+
+
+def test_batch_update_invalid_id(authorized_client):
+    items = [{"id": "abc", "title": "A"}, {"id": [1], "title": "B"}, {"id": 5, "title": None}]
+
+    response = authorized_client.patch("/tasks/batch", json={"items": items, "atomic": False})
+
+    assert response.status_code == 200
+    assert [(item["id"], item["status"]) for item in response.json()["items"]] == [(None, "invalid"), (None, "invalid"), (5, "invalid")]
+
+
+def test_batch_unauthorized(client):
+    response = client.post("/tasks/batch", json={"items": [{"title": "A"}]})
+
+    assert response.status_code == 401
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+import crud
+from events import TaskChange
+import top_n
+from models import Task
+from top_n import TopIndex, top_index
+
+
+@pytest.fixture
+def tasks(authorized_client):
+    items = [{"title": f"Задача {i}", "priority": i % 3} for i in range(8)]
+    return authorized_client.post("/tasks/batch", json={"items": items}).json()
+
+
+def sql_top(client, k, monkeypatch):
+    monkeypatch.setattr(top_index, "mode", top_n.SQL)
+    return client.get(f"/tasks?top_n={k}").json()
+
+
+@pytest.mark.parametrize("mode", [top_n.LOCAL, top_n.VERIFIED])
+def test_index_matches_sql(authorized_client, tasks, monkeypatch, mode):
+    monkeypatch.setattr(top_index, "capacity", 5)
+    monkeypatch.setattr(top_index, "mode", mode)
+    rng = random.Random(1)
+    ids = [item["id"] for item in tasks["items"]]
+
+    for step in range(30):
+        action = rng.choice(["create", "update", "delete"])
+        if action == "create":
+            created = authorized_client.post("/tasks", json={"title": f"Новая {step}", "priority": rng.randint(0, 3)}).json()
+            ids.append(created["id"])
+        elif action == "update" and ids:
+            authorized_client.put(f"/tasks/{rng.choice(ids)}", json={"title": "Изменена", "description": None, "status": "в работе", "priority": rng.randint(0, 3)})
+        elif ids:
+            authorized_client.delete(f"/tasks/{ids.pop(rng.randrange(len(ids)))}")
+        k = rng.randint(1, 5)
+        monkeypatch.setattr(top_index, "mode", mode)
+        indexed = authorized_client.get(f"/tasks?top_n={k}").json()
+        assert indexed == sql_top(authorized_client, k, monkeypatch), (step, action)
+
+    assert top_index.hits > 0
+
+
+def test_local_mode_does_not_query_database(authorized_client, tasks, app_engine, monkeypatch):
+    monkeypatch.setattr(top_index, "mode", top_n.LOCAL)
+    authorized_client.get("/tasks?top_n=3")
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        response = authorized_client.get("/tasks?top_n=3")
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert statements == []
+
+
+def test_verified_mode_sees_writes_of_other_workers(authorized_client, tasks, test_db, monkeypatch):
+    monkeypatch.setattr(top_index, "mode", top_n.VERIFIED)
+    authorized_client.get("/tasks?top_n=3")
+    # Запись другого процесса: в базе есть, события здесь нет
+    test_db.add(Task(title="Из другого воркера", priority=-1))
+    crud.bump_collection_version(test_db)
+    test_db.commit()
+
+    response = authorized_client.get("/tasks?top_n=3")
+
+    assert response.json()[0]["title"] == "Из другого воркера"
+    assert "ETag" in response.headers
+
+
+def test_top_n_beyond_capacity_falls_back_to_sql(authorized_client, tasks, monkeypatch):
+    expected = sql_top(authorized_client, 8, monkeypatch)
+    monkeypatch.setattr(top_index, "capacity", 3)
+    monkeypatch.setattr(top_index, "mode", top_n.LOCAL)
+
+    assert authorized_client.get("/tasks?top_n=8").json() == expected
+    assert top_index.hits == 0
+
+
+def test_incomplete_index_refuses_rows_past_its_tail(test_db):
+    now = datetime(2024, 1, 1)
+    test_db.add_all([Task(title=str(i), priority=i, creation_time=now) for i in range(1, 5)])
+    test_db.commit()
+    index = TopIndex(capacity=2, mode=top_n.LOCAL)
+    assert index.rebuild(test_db)
+    assert not index.complete
+
+    # Задача с приоритетом 3 в базе есть, но в индекс не попала: новая задача с приоритетом 5 не может встать сразу за хвостом
+    row = {"id": 99, "title": "99", "description": None, "status": "в ожидании", "priority": 5, "creation_time": now + timedelta(days=1)}
+    index.apply([TaskChange("created", 99, after=row)])
+
+    assert [task[0] for task in index.top(2)] == [1, 2]
+    assert index.top(3) is None
+
+
+def test_index_serves_field_projection(authorized_client, tasks, monkeypatch):
+    expected = authorized_client.get("/tasks?top_n=4&fields=id,priority").json()
+    monkeypatch.setattr(top_index, "mode", top_n.LOCAL)
+
+    assert authorized_client.get("/tasks?top_n=4&fields=priority,id").json() == expected
+    assert top_index.hits == 1
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    # LRU-кэш "токен -> пользователь" с TTL. Запись никогда не живет дольше exp самого токена,
+    # поэтому просроченный токен из кэша не достать, даже если TTL еще не истек.
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, clock=time.monotonic, wall_clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._entries = OrderedDict()
+        self._tokens_by_username = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= self._clock():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def peek(self, token: str):
+        # Как get, но без учета в статистике и без сдвига в LRU: для проверок вне get_current_user
+        entry = self._entries.get(token)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return entry[1]
+
+    def put(self, token: str, user, exp: float):
+        if self.maxsize <= 0:
+            return
+        now = self._clock()
+        expires_at = min(now + self.ttl, now + (exp - self._wall_clock()))
+        if expires_at <= now:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, user)
+            self._tokens_by_username.setdefault(user.username, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, token: str):
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+
+    def invalidate_user(self, username: str):
+        with self._lock:
+            for token in list(self._tokens_by_username.get(username, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_username.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "hit_rate": self.hits / total if total else 0.0}
+
+    def _remove(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_username.get(user.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_username[user.username]
@@ -0,0 +1,144 @@
+import os
+import threading
+from bisect import bisect_left
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import crud
+import events
+import pagination
+from serialization import TASK_COLUMNS, TASK_FIELDS
+
+# Индекс в памяти для GET /tasks?top_n=K: задачи упорядочены как ORDER BY priority, creation_time DESC, id,
+# хранятся первые TOP_N_CAPACITY. Индекс ведут события записей (events), заполняется при старте.
+# TOP_N_INDEX:
+#   sql (по умолчанию) - индекса нет, каждый запрос идет в базу;
+#   local - ответ только из памяти, без запросов к базе и без ETag/Last-Modified. Верно, пока пишет один процесс;
+#   verified - перед ответом версия коллекции сверяется с базой (тот же запрос, что и для ETag); если писал
+#              другой процесс, индекс перестраивается. Подходит для нескольких воркеров
+TOP_N_INDEX = os.getenv("TOP_N_INDEX", "sql")
+TOP_N_CAPACITY = int(os.getenv("TOP_N_CAPACITY", "1000"))
+
+SQL = "sql"
+LOCAL = "local"
+VERIFIED = "verified"
+
+COLUMNS = pagination.ordering(pagination.TOP_N_KEY)
+_PRIORITY, _CREATION_TIME, _ID = (TASK_FIELDS.index(name) for name in ("priority", "creation_time", "id"))
+
+
+def _key(row: tuple):
+    return pagination.position(COLUMNS, (row[_PRIORITY], row[_CREATION_TIME], row[_ID]))
+
+
+class TopIndex:
+    def __init__(self, capacity: int = 1000, mode: str = SQL):
+        self.capacity = capacity
+        self.mode = mode
+        # Отсортированные ключи и строки (кортежи в порядке TASK_FIELDS) - параллельные списки для bisect
+        self._keys = []
+        self._rows = []
+        # complete - в индексе все задачи таблицы, а не только первые capacity
+        self.complete = False
+        self.ready = False
+        # Версия коллекции, которой соответствует индекс: растет на каждый commit с изменениями задач
+        self.version = None
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != SQL
+
+    def __len__(self):
+        return len(self._rows)
+
+    def top(self, k: int, version: Optional[int] = None) -> Optional[list]:
+        # None - индекс ответить не может: не заполнен, отстал от базы или в нем меньше k задач
+        with self._lock:
+            if not self.ready or (version is not None and version != self.version) or (k > len(self._rows) and not self.complete):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._rows[:k]
+
+    def rebuild(self, db: Session) -> bool:
+        # Версия и строки читаются в одной транзакции. Если во время чтения прошла запись, результат
+        # может ее не содержать - тогда он отбрасывается, и перестройка повторится при следующем запросе
+        with self._lock:
+            writes = self.writes
+        version, _ = crud.get_collection_version(db)
+        rows = [tuple(row) for row in db.execute(select(*TASK_COLUMNS).order_by(*pagination.order_by(COLUMNS)).limit(self.capacity + 1))]
+        # Строки без приоритета или даты в Python не упорядочить так же, как в базе
+        if any(row[_PRIORITY] is None or row[_CREATION_TIME] is None for row in rows):
+            return False
+        with self._lock:
+            if self.writes != writes:
+                return False
+            self.complete = len(rows) <= self.capacity
+            self._rows = rows[:self.capacity]
+            self._keys = [_key(row) for row in self._rows]
+            self.version = version
+            self.ready = True
+        return True
+
+    def apply(self, changes):
+        # Подписчик events: один вызов - один commit, поэтому версия растет на единицу, как в collection_versions
+        with self._lock:
+            self.writes += 1
+            if not self.ready:
+                return
+            self.version += 1
+            for change in changes:
+                if change.before is not None:
+                    self._remove(tuple(change.before[field] for field in TASK_FIELDS))
+                if change.after is not None:
+                    row = tuple(change.after[field] for field in TASK_FIELDS)
+                    if row[_PRIORITY] is None or row[_CREATION_TIME] is None:
+                        self.ready = False
+                        return
+                    self._insert(row)
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._rows = []
+            self.complete = False
+            self.ready = False
+            self.version = None
+            self.writes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _insert(self, row: tuple):
+        key = _key(row)
+        # За последней задачей неполного индекса могут быть задачи, которых в нем нет, - туда вставлять нельзя
+        if not self.complete and (not self._keys or not key < self._keys[-1]):
+            return
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._rows.insert(index, row)
+        if len(self._rows) > self.capacity:
+            self._keys.pop()
+            self._rows.pop()
+            self.complete = False
+
+    def _remove(self, row: tuple):
+        if row[_PRIORITY] is None or row[_CREATION_TIME] is None:
+            return
+        key = _key(row)
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._rows[index][_ID] == row[_ID]:
+            del self._keys[index]
+            del self._rows[index]
+
+
+def warm(sessions) -> bool:
+    with sessions() as db:
+        return top_index.rebuild(db)
+
+
+top_index = TopIndex(capacity=TOP_N_CAPACITY, mode=TOP_N_INDEX)
+events.subscribe(top_index.apply)